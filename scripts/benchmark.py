@@ -0,0 +1,288 @@
+"""
+Script to benchmark the per-message hot paths on synthetic payloads in the formats
+published by the AtomS3, without network nor screen (matplotlib uses the Agg backend).
+
+The import time of the main modules is measured too, in new interpreters, since
+it is paid at every start of the scripts.
+
+Results are written as JSON. With --compare, they are compared to a previous run
+and the script exits with an error if a case got slower than the threshold.
+"""
+
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+from loguru import logger
+
+from thermocam import synthetic
+from thermocam.core import CameraCore, parse_settings
+from thermocam.frame import ENCODINGS, decode_frame, encode_frame
+from thermocam.roi import InterestingArea, InterestingPixels
+from thermocam.videomaker import VideoMaker
+
+
+# modules whose import time is measured
+IMPORTS = ["thermocam", "thermocam.protocol", "thermocam.core", "thermocam.handler"]
+
+
+class FakeMsg:
+    """Object with topic and payload to mimick real MQTT message
+    """
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+def measure(func, args, number, warmup=10):
+    """
+    Time the calls of a function, one per argument (cycling through them)
+
+    Parameters
+    ----------
+    func : callable
+    args : list
+        arguments of the calls
+    number : int
+        number of timed calls
+    warmup : int, optional
+        number of calls before timing, default is 10
+
+    Returns
+    -------
+    dict
+        mean, median, 95th percentile and minimum time of a call, in µs
+    """
+    for i in range(warmup):
+        func(args[i % len(args)])
+    times = np.empty(number)
+    for i in range(number):
+        arg = args[i % len(args)]
+        start = time.perf_counter()
+        func(arg)
+        times[i] = time.perf_counter() - start
+    return _stats(times)
+
+
+def _stats(times):
+    """Return the statistics of the timed calls (times in seconds)
+    """
+    times = times*1e6
+    return {"mean": float(times.mean()), "median": float(np.median(times)),
+            "p95": float(np.percentile(times, 95)), "min": float(times.min()),
+            "calls": len(times)}
+
+
+def import_time(module, number):
+    """
+    Time the import of a module, each time in a new interpreter
+
+    Parameters
+    ----------
+    module : str
+    number : int
+        number of timed imports
+
+    Returns
+    -------
+    dict
+        mean, median, 95th percentile and minimum time of an import, in µs
+    """
+    code = (f"import time; start = time.perf_counter(); import {module}; "
+            "print(time.perf_counter() - start)")
+    env = dict(os.environ, MPLBACKEND="Agg")
+    times = np.empty(number)
+    for i in range(number):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                             check=True, env=env)
+        times[i] = float(out.stdout)
+    return _stats(times)
+
+
+def cases(directory, n_payloads=16):
+    """
+    Create the benchmark cases on synthetic data
+
+    Parameters
+    ----------
+    directory : pathlib.Path
+        directory for the files written by the benchmarked objects
+    n_payloads : int, optional
+        number of different payloads of each kind, default is 16
+
+    Returns
+    -------
+    dict
+        maps the case names to (function, list of arguments)
+    """
+    # GUI modules are imported after selecting the backend
+    from thermocam.handler import ThermoHandler
+    from thermocam.visualization import Display
+
+    rng = np.random.default_rng(0)
+    frames = [synthetic.frame_data(0.5*i, rng) for i in range(n_payloads)]
+    pixels = rng.integers(0, [24, 32], size=(10, 2))
+    area = (4, 6, 8, 10)
+    images = [synthetic.image_payload(d) for d in frames]
+    pix_msgs = [synthetic.pixels_payload(d, pixels).decode() for d in frames]
+    area_msgs = [synthetic.area_payload(d, area).decode() for d in frames]
+    settings = [synthetic.settings_payload(rate=r) for r in (0.5, 1, 2, 4, 8)]
+    decoded = [decode_frame(p) for p in images]
+
+    def topic(suffix):
+        return f"/singlecameras/camera1/{suffix}"
+
+    start = datetime.now()
+    display = Display()
+    display_blit = Display(blit=True)
+    display_lut = Display(blit=True, lut=True)
+    pix = InterestingPixels()
+    pix_plot = InterestingPixels()
+    area_obj = InterestingArea()
+    area_obj.a = np.array([area])
+    area_plot = InterestingArea()
+    area_plot.a = np.array([area])
+
+    video = VideoMaker(directory=directory)
+    video.start_video()
+    display.canvas.draw()
+
+    core = CameraCore(save=False)
+    gui = ThermoHandler(save=False, queue_size=0)
+    gui.handle_message(FakeMsg(topic("area/current"), " ".join(map(str, area)).encode()))
+
+    encoded = {e: [encode_frame(d, e) for d in frames] for e in ENCODINGS[1:]}
+
+    return {
+        "decode_frame": (decode_frame, images),
+        **{f"decode_frame {e}": (decode_frame, payloads) for e, payloads in encoded.items()},
+        "encode_frame deflate": (lambda d: encode_frame(d, "deflate"), frames),
+        "Display.update_image": (display.update_image, decoded),
+        "Display.update_image (blit)": (display_blit.update_image, decoded),
+        "Display.update_image (blit, lut)": (display_lut.update_image, decoded),
+        "InterestingPixels.update_data": (lambda m: pix.update_data(m, None, start), pix_msgs),
+        "InterestingPixels.update_data (plot)":
+            (lambda m: pix_plot.update_data(m, display.ax_pixels, start), pix_msgs),
+        "InterestingArea.update_data": (lambda m: area_obj.update_data(m, None, start),
+                                        area_msgs),
+        "InterestingArea.update_data (plot)":
+            (lambda m: area_plot.update_data(m, display.ax_area, start), area_msgs),
+        "VideoMaker.add_frame": (lambda _: video.add_frame(display._fig,
+                                                           display.img_dimensions()),
+                                 [None]),
+        "VideoMaker.render": (video.render, decoded),
+        "parse_settings": (parse_settings, settings),
+        "CameraCore.handle_message settings":
+            (core.handle_message, [FakeMsg(topic("settings/current"), p) for p in settings]),
+        "CameraCore.handle_message image":
+            (core.handle_message, [FakeMsg(topic("image"), p) for p in images]),
+        "CameraCore.handle_message pixels/data":
+            (core.handle_message, [FakeMsg(topic("pixels/data"), p.encode()) for p in pix_msgs]),
+        "CameraCore.handle_message area/data":
+            (core.handle_message, [FakeMsg(topic("area/data"), p.encode()) for p in area_msgs]),
+        "ThermoHandler.handle_message settings":
+            (gui.handle_message, [FakeMsg(topic("settings/current"), p) for p in settings]),
+        "ThermoHandler.handle_message image":
+            (gui.handle_message, [FakeMsg(topic("image"), p) for p in images]),
+        "ThermoHandler.handle_message pixels/data":
+            (gui.handle_message, [FakeMsg(topic("pixels/data"), p.encode()) for p in pix_msgs]),
+        "ThermoHandler.handle_message area/data":
+            (gui.handle_message, [FakeMsg(topic("area/data"), p.encode()) for p in area_msgs]),
+    }, video
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare the median times of a run with a previous one
+
+    Parameters
+    ----------
+    results, baseline : dict
+        results of the two runs, as written to JSON
+    threshold : float
+        maximum allowed ratio between the new and the old median time
+
+    Returns
+    -------
+    list of str
+        cases slower than the threshold
+    """
+    slower = []
+    for name, new in results["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        ratio = new["median"]/old["median"]
+        logger.info(f"{name}: {old['median']:.1f} -> {new['median']:.1f} µs ({ratio:.2f}x)")
+        if ratio > threshold:
+            slower.append(name)
+    return slower
+
+
+def main():
+    """
+    Run the benchmarks and write the results
+    """
+    logger.remove(0)
+    logger.add(sys.stderr, level="INFO")
+
+    parser = argparse.ArgumentParser(description="Benchmark the per-message hot paths")
+    parser.add_argument("--number", type=int, default=200, help="Number of timed calls of "
+                        "each case (default: 200)")
+    parser.add_argument("--import-number", type=int, default=10, help="Number of timed "
+                        "imports of each module (default: 10)")
+    parser.add_argument("--filter", default="", help="Run only the cases whose name contains "
+                        "this string")
+    parser.add_argument("--output", default=None, help="JSON file for the results (default: "
+                        "benchmark_<date>.json in the current directory)")
+    parser.add_argument("--compare", default=None, help="JSON results of a previous run to "
+                        "compare with")
+    parser.add_argument("--threshold", type=float, default=1.25, help="With --compare, fail if "
+                        "a median time grows by more than this factor (default: 1.25)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # objects log every received message, keep only the warnings
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+        benchmarks, video = cases(directory)
+        results = {}
+        for name, (func, func_args) in benchmarks.items():
+            if args.filter in name:
+                results[name] = measure(func, func_args, args.number)
+        video.stop_video(wait=True)
+        for module in IMPORTS:
+            if args.filter in f"import {module}":
+                results[f"import {module}"] = import_time(module, args.import_number)
+        logger.remove()
+        logger.add(sys.stderr, level="INFO")
+
+    for name, r in results.items():
+        logger.info(f"{name:45s} median {r['median']:9.1f} µs, p95 {r['p95']:9.1f} µs")
+
+    out = {"date": datetime.now().isoformat(), "python": platform.python_version(),
+           "numpy": np.__version__, "matplotlib": matplotlib.__version__,
+           "machine": platform.platform(), "results": results}
+    output = args.output or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(out, f, indent=2)
+    logger.info(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            slower = compare(out, json.load(f), args.threshold)
+        if slower:
+            logger.error(f"Slower than {args.threshold}x: {', '.join(slower)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
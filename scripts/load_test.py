@@ -0,0 +1,93 @@
+"""
+Script to load the receiver with many simulated cameras publishing at high rate,
+and report the achieved ingest rate, the processing latency of the messages and
+the dropped or coalesced frames.
+
+By default messages are delivered in-process to the MQTT callbacks of the
+receiver (no broker needed); with --host they go through a real broker.
+"""
+
+import argparse
+import json
+import sys
+import paho.mqtt.client as mqtt
+from loguru import logger
+
+from thermocam.callbacks import MQTTCallbacks
+from thermocam.core import CameraCore
+from thermocam.frame import ENCODINGS
+from thermocam.ingest import IngestQueue
+from thermocam.loadgen import LoadGenerator, SimulatedCamera
+from thermocam.registry import CameraRegistry
+
+
+def main():
+    """
+    Parse the options, run the load and print the report
+    """
+    logger.remove(0)
+    logger.add(sys.stderr, level="WARNING")
+
+    parser = argparse.ArgumentParser(description="Load the receiver with simulated cameras")
+    parser.add_argument("--cameras", type=int, default=10, help="Number of simulated cameras "
+                        "(default: 10)")
+    parser.add_argument("--rate", type=float, default=8., help="Frames per second of each "
+                        "camera (default: 8)")
+    parser.add_argument("--pixels", type=int, default=5, help="Number of pixels whose data is "
+                        "published with each frame (default: 5)")
+    parser.add_argument("--area", type=int, nargs=2, default=(8, 8), metavar=("W", "H"),
+                        help="Size of the area whose data is published with each frame "
+                        "(default: 8 8)")
+    parser.add_argument("--encoding", default="float32", choices=ENCODINGS, help="Encoding of "
+                        "the image payloads (default: float32, as published by the firmware)")
+    parser.add_argument("--duration", type=float, default=10., help="Duration of the load in "
+                        "seconds (default: 10)")
+    parser.add_argument("--queue", type=int, default=0, help="If not 0, messages go through an "
+                        "ingest queue of this size, drained by a separate thread as the GUI "
+                        "timer does (default: 0, processed on delivery)")
+    parser.add_argument("--drain-interval", type=float, default=50., help="Interval in ms "
+                        "between two drains of the queue (default: 50 ms)")
+    parser.add_argument("--save", action="store_true", help="Save the output txt files")
+    parser.add_argument("--host", default=None, help="Publish the messages to this MQTT broker "
+                        "and receive them from it (default: in-process delivery)")
+    parser.add_argument("--port", type=int, default=1883, help="MQTT broker port (default: 1883)")
+    parser.add_argument("--json", default=None, help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    handler = CameraRegistry(lambda cam_id: CameraCore(cam_id, args.save))
+    if args.queue:
+        handler.queue = IngestQueue(args.queue)
+    cbs = MQTTCallbacks(handler)
+    cameras = [SimulatedCamera(f"load{i}", args.rate, args.pixels, tuple(args.area), seed=i,
+                               encoding=args.encoding)
+               for i in range(args.cameras)]
+
+    publisher = receiver = None
+    if args.host:
+        receiver = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        receiver.on_connect = cbs.on_connect
+        receiver.on_message = cbs.on_message
+        receiver.connect(args.host, args.port, 60)
+        receiver.loop_start()
+        publisher = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        publisher.connect(args.host, args.port, 60)
+        publisher.loop_start()
+
+    load = LoadGenerator(handler, cameras, cbs, publisher, args.drain_interval/1e3)
+    try:
+        report = load.run(args.duration, settle=2. if args.host else 0.)
+    finally:
+        for client in (publisher, receiver):
+            if client is not None:
+                client.loop_stop()
+                client.disconnect()
+        handler.close_files()
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
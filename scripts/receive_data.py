@@ -1,16 +1,21 @@
 """
 Script to receive and plot the thermocamera data sent by the AtomS3 
+
+With --headless no GUI is created (and matplotlib is not imported): data is only
+processed, saved and recorded.
 """
 
 import argparse
 import sys
 import time
-import matplotlib.pyplot as plt
 import paho.mqtt.client as mqtt
 from loguru import logger
 
-from thermocam.handler import ThermoHandler
 from thermocam.callbacks import MQTTCallbacks
+from thermocam.capture import CaptureWriter
+from thermocam.core import CameraCore
+from thermocam.registry import CameraRegistry
+from thermocam.timing import Timing
 
 
 # MQTT_SERVER = "test.mosquitto.org"
@@ -36,6 +41,49 @@ def level_filter(levels):
     return is_level
 
 
+def throughput(handler):
+    """
+    Return the number of received messages and frames
+
+    Parameters
+    ----------
+    handler : thermocam.core.CameraCore or thermocam.registry.CameraRegistry
+
+    Returns
+    -------
+    messages, frames : int
+    """
+    cams = handler.cameras.values() if isinstance(handler, CameraRegistry) else [handler]
+    messages = sum(sum(cam.router.counts.values()) for cam in cams)
+    frames = sum(cam.frames for cam in cams)
+    return messages, frames
+
+
+def run_headless(handler, interval):
+    """
+    Keep processing messages (on the MQTT network thread) until interrupted, logging
+    the throughput every interval seconds
+
+    Parameters
+    ----------
+    handler : thermocam.core.CameraCore or thermocam.registry.CameraRegistry
+    interval : float
+        time between two throughput logs, in seconds
+    """
+    last_messages, last_frames = throughput(handler)
+    last_time = time.monotonic()
+    while True:
+        time.sleep(interval)
+        handler.flush_files()
+        messages, frames = throughput(handler)
+        now = time.monotonic()
+        dt = now - last_time
+        logger.info(f"Throughput: {(messages-last_messages)/dt:.1f} msg/s, "
+                    f"{(frames-last_frames)/dt:.1f} frames/s "
+                    f"(total {messages} messages, {frames} frames)")
+        last_messages, last_frames, last_time = messages, frames, now
+
+
 def main():
     logger.remove(0)
     logger.add(sys.stderr, filter=level_filter(["WARNING", "ERROR", "INFO"]))
@@ -44,11 +92,103 @@ def main():
     parser.add_argument("--save", default="y",choices=["y", "n"], help="Save output txt files with"
                         "pixels data and area data")
 
+    parser.add_argument("--blit", action="store_true", help="Redraw only the thermal image "
+                        "for each frame, refreshing the live plots once per second")
+
+    parser.add_argument("--lut", action="store_true", help="Color the thermal image with a "
+                        "lookup table at its size on the screen, instead of letting matplotlib "
+                        "normalize, colormap and resample it at every draw")
+    parser.add_argument("--smooth", action="store_true", help="With --lut, upsample the "
+                        "thermal image with bilinear interpolation")
+    parser.add_argument("--camera", default="camera1", help="Identifier of the camera in the "
+                        "MQTT topics (default: camera1)")
+    parser.add_argument("--all-cameras", action="store_true", help="Receive data from all the "
+                        "cameras with a single connection and show their images on a tiled "
+                        "overview")
+
+    parser.add_argument("--archive", action="store_true", help="Store all the received frames "
+                        "in a memory-mapped archive (in thermocam_out/archive)")
+    parser.add_argument("--video-source", default="figure", choices=["figure", "data"],
+                        help="Record the video from the figure or directly from the thermal "
+                        "data (always from the data in headless mode)")
+    parser.add_argument("--flush-interval", type=float, default=5., help="Maximum time in "
+                        "seconds the data is buffered before being written to file (default: 5 s)")
+    parser.add_argument("--rotate-mb", type=float, default=100., help="Start a new output file "
+                        "when the current one reaches this size in MB (default: 100 MB)")
+    parser.add_argument("--rotate-hours", type=float, default=None, help="Start a new output "
+                        "file when the current one is older than this")
+    parser.add_argument("--compress", choices=["gzip", "zstd"], default=None, help="Compress "
+                        "the output files once they are closed")
+    parser.add_argument("--roi-source", default="device", choices=["device", "frame"],
+                        help="Take the pixels and area data from the device messages or "
+                        "compute it from the received frames (default: device)")
+    parser.add_argument("--areas", default=None, help="File with named areas, one per line "
+                        "as 'name x y width height', whose data is computed from the frames")
+    parser.add_argument("--masks", default=None, help=".npz file with regions of arbitrary "
+                        "shape (names and 24x32 masks), whose data is computed from the frames")
+    parser.add_argument("--capture", default=None, help="Write all the received messages to "
+                        "this capture file, to be replayed with replay_session.py")
+    parser.add_argument("--timing", action="store_true", help="Measure the duration of each "
+                        "processing stage from the message arrival (can be toggled on the GUI "
+                        "with the 't' key)")
+    parser.add_argument("--timing-interval", type=float, default=10., help="Time in seconds "
+                        "between two logged summaries of the timing (default: 10 s)")
+    parser.add_argument("--stats-threshold", type=float, default=None, help="Temperature "
+                        "above which the time of each pixel is counted in the per-pixel "
+                        "statistics of the session (default: not counted)")
+    parser.add_argument("--series-capacity", type=int, default=10000, help="Maximum number "
+                        "of samples of each pixel and area kept for the plots (default: 10000)")
+    parser.add_argument("--series-window", type=float, default=None, help="Maximum age in "
+                        "seconds of the samples kept for the plots (default: no limit)")
+    parser.add_argument("--headless", action="store_true", help="Do not show any GUI: only "
+                        "process, save and record the received data")
+    parser.add_argument("--record", action="store_true", help="In headless mode, record a video "
+                        "of the thermal images of each camera")
+    parser.add_argument("--stats-interval", type=float, default=10., help="In headless mode, "
+                        "time in seconds between two throughput logs (default: 10 s)")
+
     args = parser.parse_args()
     save = True if args.save == "y" else False
-
-    handler = ThermoHandler(save)
-    mqtt_cbs = MQTTCallbacks(handler)
+    writer_options = {"flush_interval": args.flush_interval,
+                      "max_bytes": int(args.rotate_mb*1e6),
+                      "max_age": args.rotate_hours*3600 if args.rotate_hours else None,
+                      "compress": args.compress}
+    # options of the state of each camera
+    options = {"archive": args.archive, "writer_options": writer_options,
+               "roi_source": args.roi_source, "areas_file": args.areas,
+               "masks_file": args.masks, "stats_threshold": args.stats_threshold,
+               "series_capacity": args.series_capacity, "series_window": args.series_window}
+
+    def timing(cam_id):
+        return Timing(args.timing, args.timing_interval, cam_id)
+
+    if args.headless:
+        def new_camera(cam_id):
+            cam = CameraCore(cam_id, save, timing=timing(cam_id), **options)
+            if args.record:
+                cam.video.start_video()
+            return cam
+
+        if args.all_cameras:
+            handler = CameraRegistry(new_camera)
+        else:
+            handler = new_camera(args.camera)
+    else:
+        # GUI modules are imported only when needed
+        import matplotlib.pyplot as plt
+        from thermocam.handler import ThermoHandler
+        from thermocam.visualization import OverviewDisplay
+
+        if args.all_cameras:
+            handler = CameraRegistry(lambda cam_id: CameraCore(cam_id, save,
+                                                               timing=timing(cam_id), **options),
+                                     overview=OverviewDisplay())
+        else:
+            handler = ThermoHandler(save, blit=args.blit, lut=args.lut, smooth=args.smooth,
+                                    camera_id=args.camera, timing=timing(args.camera), **options)
+            handler.video.source = args.video_source
+    capture = CaptureWriter(args.capture) if args.capture else None
+    mqtt_cbs = MQTTCallbacks(handler, capture)
 
     try:
         client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
@@ -58,10 +198,14 @@ def main():
 
         handler.client = client
 
-        client.publish("/singlecameras/camera1/info_request", "1")
+        if not args.all_cameras:
+            client.publish(handler.topic("info_request"), "1")
         time.sleep(0.5)
         client.loop_start()
-        plt.show()
+        if args.headless:
+            run_headless(handler, args.stats_interval)
+        else:
+            plt.show()
 
     except OSError as e:
         if e.errno == 101:
@@ -69,12 +213,22 @@ def main():
         else:
             logger.error(f"Connection failed: {e}")
     except KeyboardInterrupt:
-        plt.close("all")
+        if not args.headless:
+            plt.close("all")
         logger.info("Shutting down...")
     finally:
         client.loop_stop()
         client.disconnect()
         handler.close_files()
+        if capture is not None:
+            capture.close()
+        cams = handler.cameras.values() if args.all_cameras else [handler]
+        for cam in cams:
+            if cam.video.filming:
+                cam.video.stop_video(wait=True)
+                logger.info(f"Video of {cam.camera_id}: {cam.video.metrics()}")
+        if handler.queue is not None:
+            logger.info(f"Ingest queue: {handler.queue.stats()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+"""
+Script to replay a capture of received MQTT messages (see receive_data.py --capture)
+without any network, to reproduce what was received and measure the processing
+throughput on real data.
+
+By default the messages are processed without GUI; with --gui they are shown as
+if they were received live (on the overview of all the cameras with --all-cameras).
+"""
+
+import argparse
+import sys
+import threading
+from loguru import logger
+
+from thermocam.capture import replay
+from thermocam.core import CameraCore
+from thermocam.registry import CameraRegistry
+
+
+def main():
+    """
+    Parse the options and replay the capture
+    """
+    logger.remove(0)
+    logger.add(sys.stderr, level="INFO")
+
+    parser = argparse.ArgumentParser(description="Replay a capture of thermal camera messages")
+    parser.add_argument("capture", help="Capture file written by receive_data.py --capture")
+    parser.add_argument("--speed", type=float, default=1., help="Replay speed relative to the "
+                        "capture, e.g. 10 is ten times faster (default: 1, real time)")
+    parser.add_argument("--fast", action="store_true", help="Replay the messages as fast as "
+                        "possible")
+    parser.add_argument("--save", action="store_true", help="Save the output txt files")
+    parser.add_argument("--all-cameras", action="store_true", help="Replay the messages of all "
+                        "the cameras in the capture (default: only the camera of --camera)")
+    parser.add_argument("--camera", default="camera1", help="Identifier of the camera to replay "
+                        "(default: camera1)")
+    parser.add_argument("--gui", action="store_true", help="Show the replayed data on the GUI")
+    args = parser.parse_args()
+    speed = None if args.fast else args.speed
+
+    if args.gui:
+        # GUI modules are imported only when needed
+        import matplotlib.pyplot as plt
+        from thermocam.handler import ThermoHandler
+        from thermocam.visualization import OverviewDisplay
+
+        if args.all_cameras:
+            handler = CameraRegistry(lambda cam_id: CameraCore(cam_id, args.save),
+                                     overview=OverviewDisplay())
+        else:
+            handler = ThermoHandler(args.save, camera_id=args.camera)
+        # messages are fed to the queue as by the MQTT network thread
+        thread = threading.Thread(target=lambda: logger.info(
+            f"Replay: {replay(args.capture, handler, speed)}"), daemon=True)
+        thread.start()
+        plt.show()
+    else:
+        if args.all_cameras:
+            handler = CameraRegistry(lambda cam_id: CameraCore(cam_id, args.save))
+        else:
+            handler = CameraCore(args.camera, args.save)
+        stats = replay(args.capture, handler, speed)
+        frames = (sum(cam.frames for cam in handler.cameras.values()) if args.all_cameras
+                  else handler.frames)
+        logger.info(f"Replayed {stats['messages']} messages ({frames} frames) in "
+                    f"{stats['seconds']:.2f} s: {stats['rate']:.1f} msg/s")
+    handler.close_files()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,18 @@
 """
     Script to send from command line camera settings to AtomS3
+
+    With --cameras, the settings are sent to many cameras over one connection, and
+    the script waits until each of them publishes the new settings, sending them
+    again to the ones that do not confirm in time.
 """
 
 import argparse
+import sys
 from loguru import logger
 import paho.mqtt.client as mqtt
 
-from thermocam.settings import CameraSettings
+from thermocam.fleet import FleetPush, discover, summary
+from thermocam.protocol import CameraSettings
 
 
 def valid_em(v):
@@ -34,6 +40,41 @@ def valid_em(v):
     return val
 
 
+def push_fleet(client, settings, args):
+    """
+    Send the settings to the cameras of the options and log the summary
+
+    Parameters
+    ----------
+    client : paho.mqtt.client.Client
+        connected client, with its network loop running
+    settings : thermocam.protocol.CameraSettings
+    args : argparse.Namespace
+        parsed options
+
+    Returns
+    -------
+    dict
+        results of the push (see FleetPush.run)
+    """
+    patterns = [c for c in args.cameras if any(ch in c for ch in "*?[")]
+    cameras = [c for c in args.cameras if c not in patterns]
+    if patterns:
+        found = discover(client, patterns, args.discover_time)
+        logger.info(f"Cameras matching {' '.join(patterns)}: {', '.join(found) or 'none'}")
+        cameras += [c for c in found if c not in cameras]
+    if not cameras:
+        logger.error("No camera to configure")
+        return {}
+
+    logger.info(f"Sending the settings to {len(cameras)} cameras")
+    push = FleetPush(client, settings, args.timeout, args.retries, args.backoff)
+    results = push.run(cameras)
+    for line in summary(results):
+        logger.info(line)
+    return results
+
+
 def main():
     """
     Parse settings from command line and publish them to the MQTT server
@@ -56,6 +97,20 @@ def main():
     parser.add_argument("--mode", type=float,choices=[0, 1], default=0, help="Readout mode: 0 for"
                         " chess pattern (default), 1 for TV interleave")
 
+    parser.add_argument("--cameras", nargs="+", default=None, help="Identifiers of the cameras "
+                        "to configure, glob patterns (e.g. 'lab*') are matched against the "
+                        "cameras that published their current settings. Without this option, "
+                        "the settings are sent to camera1 without waiting for confirmation")
+    parser.add_argument("--discover-time", type=float, default=2., help="With --cameras, time "
+                        "in seconds to collect the cameras matching the patterns (default: 2 s)")
+    parser.add_argument("--timeout", type=float, default=20., help="With --cameras, time in "
+                        "seconds to wait for the confirmation of the cameras (default: 20 s)")
+    parser.add_argument("--retries", type=int, default=2, help="With --cameras, number of "
+                        "times the settings are sent again to the cameras that did not confirm "
+                        "(default: 2)")
+    parser.add_argument("--backoff", type=float, default=2., help="With --cameras, factor by "
+                        "which the timeout grows at each retry (default: 2)")
+
     args = parser.parse_args()
 
     settings = CameraSettings()
@@ -71,18 +126,27 @@ def main():
         client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
         client.connect(args.host, args.port, 60)
 
-        # Publish message
-        result = client.publish("/singlecameras/camera1/settings", settings.publish_form())
-        result.wait_for_publish()
+        if args.cameras is None:
+            # Publish message
+            result = client.publish("/singlecameras/camera1/settings", settings.publish_form())
+            result.wait_for_publish()
 
-        logger.info("Published")
+            logger.info("Published")
+        else:
+            client.loop_start()
+            results = push_fleet(client, settings, args)
+            client.loop_stop()
 
         client.disconnect()
+        if args.cameras is not None and not (results and all(r["applied"]
+                                                            for r in results.values())):
+            sys.exit(1)
     except OSError as e:
         if e.errno == 101:
             logger.error("Network is unreachable, check internet connection or try later :(")
         else:
             logger.error(f"Connection failed: {e}")
 
+
 if __name__ == "__main__":
     main()
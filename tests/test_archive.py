@@ -0,0 +1,42 @@
+"""
+Test for module archive
+"""
+
+from datetime import datetime, timedelta
+import numpy as np
+
+from thermocam.archive import ArchiveReader, FrameArchive
+from thermocam.frame import decode_frame
+
+
+def test_archive(tmp_path):
+    """
+    Check frames are archived across growth and rollover and read back by time range
+    """
+    start = datetime(2025, 1, 1)
+    archive = FrameArchive("test", tmp_path, chunk=4, max_bytes=10*3072)
+    values = np.float32(np.random.rand(25, 32*24)*30)
+    for i, v in enumerate(values):
+        archive.append(decode_frame(v.tobytes(), start + timedelta(seconds=i)))
+    archive.close()
+
+    reader = ArchiveReader("test", tmp_path)
+    assert len(reader.segments) == 3, "Segments not rolled over"
+    assert len(reader) == 25, "Wrong number of archived frames"
+
+    chunks = reader.between(start + timedelta(seconds=8), start + timedelta(seconds=12))
+    frames = np.concatenate([f for _, f in chunks])
+    assert len(frames) == 4, "Wrong frames in time range"
+    assert (frames.reshape(4, -1) == values[8:12]).all(), "Wrong archived values"
+
+
+def test_unclosed(tmp_path):
+    """
+    Check frames can be read from an archive that was not closed
+    """
+    archive = FrameArchive("test", tmp_path, chunk=8)
+    for _ in range(3):
+        archive.append(decode_frame(np.zeros(768, dtype=np.float32).tobytes()))
+    archive._flush()
+
+    assert len(ArchiveReader("test", tmp_path)) == 3, "Wrong number of archived frames"
@@ -0,0 +1,57 @@
+"""
+Test for module capture
+"""
+
+import time
+import numpy as np
+
+from thermocam.capture import CaptureWriter, read_capture, replay
+from thermocam.core import CameraCore
+
+
+class FakeMsg:
+    """Object with topic and payload to mimick real MQTT message
+    """
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+def test_capture_replay(tmp_path):
+    """
+    Check captured messages are read back unchanged and replayed to a handler,
+    both as fast as possible and with the captured timing
+    """
+    path = tmp_path / "session.cap"
+    image = np.float32(np.random.rand(32*24)*30).tobytes()
+    t0 = time.time()
+    with CaptureWriter(path) as capture:
+        for i in range(5):
+            capture.write(FakeMsg("/singlecameras/camera1/image", image), t0 + 0.1*i)
+        capture.write(FakeMsg("/singlecameras/camera1/pixels/data", b"1 2 3.00"), t0 + 0.5)
+
+    messages = list(read_capture(path))
+    assert [m.topic.rsplit("/", 1)[1] for m in messages] == ["image"]*5 + ["data"]
+    assert messages[0].payload == image
+    assert messages[-1].time == t0 + 0.5
+
+    cam = CameraCore(save=False)
+    stats = replay(path, cam, speed=None)
+    assert stats["messages"] == 6
+    assert cam.frames == 5, "Frames not replayed"
+    assert cam.single_pixels.out_data() == " (1, 2), 3.0"
+
+    stats = replay(path, CameraCore(save=False), speed=5.)
+    assert stats["seconds"] >= 0.1, "Captured timing not respected"
+
+    # interrupted capture: the complete messages are still read
+    with open(path, "ab") as f:
+        f.write(b"\x00\x01")
+    assert len(list(read_capture(path))) == 6
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as d:
+        test_capture_replay(Path(d))
@@ -0,0 +1,110 @@
+"""
+Test for module core
+"""
+
+import subprocess
+import sys
+import numpy as np
+
+from thermocam.core import CameraCore, parse_settings
+
+
+class FakeMsg:
+    """Object with topic and payload to mimick real MQTT message
+    """
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+def test_no_gui():
+    """
+    Check the core can be used without importing pyplot
+    """
+    code = "import sys, thermocam.core; assert 'matplotlib.pyplot' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_core():
+    """
+    Check frames and ROI data are processed without GUI
+    """
+    cam = CameraCore("camera3", save=False)
+    values = np.float32(np.random.rand(32*24)*30)
+    cam.handle_message(FakeMsg("/singlecameras/camera3/image", values.tobytes()))
+    cam.handle_message(FakeMsg("/singlecameras/camera3/pixels/data", b"1 2 3.00,4 5 6.00"))
+    cam.handle_message(FakeMsg("/singlecameras/camera3/settings/current",
+                               b"rate: 8.00 shift: 8.00 emissivity: 0.95 mode: 1"))
+
+    assert cam.frames == 1, "Frame not decoded"
+    assert cam.single_pixels.out_data() == " (1, 2), 3.0, (4, 5), 6.0", "Pixels data not stored"
+    assert cam.current_settings == parse_settings(b"rate: 8 shift: 8 emissivity: 0.95 mode: 1")
+    assert cam.topic("area") == "/singlecameras/camera3/area"
+
+
+def test_roi_from_frame():
+    """
+    Check pixels and area data are computed from the frames, ignoring the device data
+    """
+    cam = CameraCore("camera3", save=False, roi_source="frame")
+    cam.handle_message(FakeMsg("/singlecameras/camera3/pixels/current", b"1 2,4 5"))
+    cam.handle_message(FakeMsg("/singlecameras/camera3/area/current", b"2 3 4 5"))
+    values = np.float32(np.random.rand(32*24)*30)
+    cam.handle_message(FakeMsg("/singlecameras/camera3/image", values.tobytes()))
+    cam.handle_message(FakeMsg("/singlecameras/camera3/pixels/data", b"1 2 3.00,4 5 6.00"))
+    cam.handle_message(FakeMsg("/singlecameras/camera3/area/data",
+                               b"max: 1.00 min: 1.00 avg: 1.00 x: 2 y: 3 w: 4 h: 5"))
+
+    data = cam.frame.data
+    series = cam.single_pixels.pixels_data[(4, 5)]["series"]
+    assert len(series) == 1, "Device data not ignored"
+    assert series.last() == data[4, 5]
+    area = cam.area.area_data[str(cam.area.a)]["series"]
+    assert len(area) == 1, "Device data not ignored"
+    block = data[2:6, 3:8]
+    assert np.isclose(area.last(cam.area.AVG), block.mean())
+    assert area.last(cam.area.MIN) == block.min()
+    assert area.last(cam.area.MAX) == block.max()
+    assert area.times()[0] == (cam.frame.time - cam.start_time).total_seconds()
+
+
+def test_roi_out_of_frame():
+    """
+    Check pixels and areas out of the frame are ignored, and do not break the
+    processing of the next frames
+    """
+    cam = CameraCore("camera3", save=False, roi_source="frame")
+    cam.handle_message(FakeMsg("/singlecameras/camera3/pixels/current", b"30 40,4 5"))
+    cam.handle_message(FakeMsg("/singlecameras/camera3/area/current", b"2 3 4 5"))
+    cam.handle_message(FakeMsg("/singlecameras/camera3/area/current", b"30 40 5 5"))
+    values = np.float32(np.random.rand(32*24)*30)
+    for _ in range(2):
+        cam.handle_message(FakeMsg("/singlecameras/camera3/image", values.tobytes()))
+
+    assert cam.single_pixels.p.tolist() == [[4, 5]], "Pixel out of the frame not ignored"
+    assert cam.area.a.tolist() == [[2, 3, 4, 5]], "Previous area not retained"
+    assert len(cam.single_pixels.pixels_data[(4, 5)]["series"]) == 2
+
+
+def test_series_capacity():
+    """
+    Check the retention of the series is set on the pixels and areas of the camera
+    """
+    cam = CameraCore("camera3", save=False, roi_source="frame", series_capacity=2)
+    cam.handle_message(FakeMsg("/singlecameras/camera3/pixels/current", b"1 2"))
+    cam.handle_message(FakeMsg("/singlecameras/camera3/area/current", b"2 3 4 5"))
+    values = np.float32(np.random.rand(32*24)*30)
+    for _ in range(3):
+        cam.handle_message(FakeMsg("/singlecameras/camera3/image", values.tobytes()))
+
+    assert len(cam.single_pixels.pixels_data[(1, 2)]["series"]) == 2
+    assert len(cam.area.area_data[str(cam.area.a)]["series"]) == 2
+    assert cam.areas.capacity == cam.masks.capacity == 2
+
+
+if __name__ == "__main__":
+    test_no_gui()
+    test_core()
+    test_roi_from_frame()
+    test_roi_out_of_frame()
+    test_series_capacity()
@@ -0,0 +1,89 @@
+"""
+Test for module fleet
+"""
+
+import threading
+
+from thermocam import synthetic
+from thermocam.fleet import FleetPush, discover, summary
+from thermocam.protocol import CameraSettings
+
+
+class FakeMsg:
+    """Object with topic, payload and retain flag to mimick real MQTT message
+    """
+    def __init__(self, topic, payload, retain=False):
+        self.topic = topic
+        self.payload = payload
+        self.retain = retain
+
+
+class FakeFleet:
+    """
+    Client connected to a broker with simulated cameras: each camera publishes its
+    current settings some time after receiving new ones, unless it ignores them
+    """
+    def __init__(self, retained, ignore, delay=0.02):
+        self.retained = retained    # camera id -> current settings payload
+        self.ignore = ignore        # camera id -> number of pushes it ignores
+        self.delay = delay
+        self.callbacks = {}
+
+    def message_callback_add(self, sub, callback):
+        self.callbacks[sub] = callback
+
+    def message_callback_remove(self, sub):
+        self.callbacks.pop(sub, None)
+
+    def _deliver(self, msg):
+        for callback in list(self.callbacks.values()):
+            callback(self, None, msg)
+
+    def subscribe(self, sub):
+        for cam, payload in self.retained.items():
+            self._deliver(FakeMsg(f"/singlecameras/{cam}/settings/current", payload, True))
+
+    def unsubscribe(self, sub):
+        pass
+
+    def publish(self, topic, payload):
+        cam = topic.split("/")[2]
+        if self.ignore.get(cam, 0):
+            self.ignore[cam] -= 1
+            return
+        r, s, e, m = payload.split()
+        current = synthetic.settings_payload(2**(int(r) - 1), float(s), float(e), int(m))
+        threading.Timer(self.delay, self._deliver,
+                        [FakeMsg(f"/singlecameras/{cam}/settings/current", current)]).start()
+
+
+def test_fleet_push():
+    """
+    Check the cameras are confirmed only by the settings published after the push,
+    and the ones that do not answer get the settings again
+    """
+    settings = CameraSettings()
+    settings.rate = 8
+    requested = synthetic.settings_payload(8., 8., 0.95, 0)
+    old = synthetic.settings_payload(2., 8., 0.95, 0)
+    client = FakeFleet({"lab1": old, "lab2": old, "lab3": requested, "other": old},
+                       {"lab2": 1, "lab3": 10})
+
+    cameras = discover(client, ["lab*"], wait=0.)
+    assert cameras == ["lab1", "lab2", "lab3"]
+
+    results = FleetPush(client, settings, timeout=0.2, retries=1).run(cameras)
+    assert results["lab1"]["applied"] and results["lab1"]["attempts"] == 1
+    assert 0 < results["lab1"]["seconds"] < 0.2
+    assert results["lab2"]["applied"] and results["lab2"]["attempts"] == 2
+    # the retained settings of lab3 match, but they were published before the push
+    assert not results["lab3"]["applied"] and results["lab3"]["attempts"] == 2
+    lines = summary(results)
+    assert len(lines) == 3 and "NOT applied" in lines[2]
+
+    assert settings.matches({"rate": 8., "shift": 8., "emissivity": 0.95, "mode": 0.})
+    assert not settings.matches({"rate": 8., "shift": 8., "emissivity": 0.9, "mode": 0.})
+
+
+if __name__ == "__main__":
+    test_fleet_push()
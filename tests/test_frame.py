@@ -0,0 +1,84 @@
+"""
+Test for module frame
+"""
+
+import numpy as np
+import pytest
+
+from thermocam import synthetic
+from thermocam.core import CameraCore
+from thermocam.frame import ENCODINGS, FrameError, decode_frame, encode_frame
+from thermocam.loadgen import FakeMessage, SimulatedCamera
+
+
+def test_decode():
+    """
+    Check the frame is decoded with the same layout used by the AtomS3
+    """
+    values = np.float32(np.random.rand(32*24)*30)
+    frame = decode_frame(values.tobytes())
+
+    assert frame.data.dtype == np.float32, "Frame is not float32"
+    assert (frame.image == values.reshape(24, 32).T).all(), "Frame has wrong layout"
+    assert frame.pixel(3, 7) == values.reshape(24, 32)[3, 7], "Wrong pixel coordinates"
+    assert not frame.data.flags.writeable, "Frame should be read-only"
+
+
+def test_invalid():
+    """
+    Check that payloads with wrong size or non finite values are rejected
+    """
+    with pytest.raises(FrameError):
+        decode_frame(b"")
+    with pytest.raises(FrameError):
+        decode_frame(np.zeros(767, dtype=np.float32).tobytes())
+
+    values = np.zeros(768, dtype=np.float32)
+    values[10] = np.nan
+    with pytest.raises(FrameError):
+        decode_frame(values.tobytes())
+
+    data = synthetic.frame_data()
+    packed = encode_frame(data, "deflate")
+    for payload in (packed[:-5], packed + b"1", b"Z" + b"\x00"*100, b"C" + b"\x00"*10):
+        with pytest.raises(FrameError):
+            decode_frame(payload)
+    with pytest.raises(ValueError):
+        encode_frame(data, "jpeg")
+    with pytest.raises(ValueError):
+        encode_frame(data + 400., "centi")
+
+
+def test_encodings():
+    """
+    Check every encoding is decoded back within its precision, and that the
+    compact ones are recognized on the ingest path
+    """
+    data = synthetic.frame_data(2., np.random.default_rng(2))
+    tolerance = {"float32": 0., "float16": 0.02, "centi": 0.005, "deflate": 0.005}
+    sizes = {}
+    for encoding in ENCODINGS:
+        payload = encode_frame(data, encoding)
+        sizes[encoding] = len(payload)
+        frame = decode_frame(payload)
+        assert frame.data.dtype == np.float32 and not frame.data.flags.writeable
+        assert np.abs(frame.data - data).max() <= tolerance[encoding] + 1e-6, encoding
+    assert sizes["deflate"] < sizes["float16"] < sizes["float32"]
+
+    # a uniform frame compresses well, a random one falls back to centi
+    assert len(encode_frame(np.full((24, 32), 25.), "deflate")) < 100
+    noise = np.random.default_rng(0).uniform(-300, 300, (24, 32))
+    assert encode_frame(noise, "deflate")[:1] == b"C"
+
+    for encoding in ENCODINGS:
+        cam = SimulatedCamera("enc", n_pixels=0, area=None, seed=3, encoding=encoding)
+        core = CameraCore("enc", save=False)
+        for topic, payload in cam.frame(0.):
+            core.handle_message(FakeMessage(topic, payload))
+        assert core.frames == 1, f"{encoding} frame not decoded"
+
+
+if __name__ == "__main__":
+    test_decode()
+    test_invalid()
+    test_encodings()
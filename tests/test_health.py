@@ -0,0 +1,92 @@
+"""
+Test for module health
+"""
+
+import math
+
+from thermocam.core import CameraCore
+from thermocam.health import IngestHealth
+from thermocam.ingest import IngestQueue
+from thermocam.loadgen import FakeMessage
+from thermocam.settings import ControlPanel
+from thermocam import synthetic
+
+
+def test_health():
+    """
+    Check rate, jitter, gaps and online status at a low configured rate
+    """
+    health = IngestHealth(max_dead_time=2.)
+    assert not health.is_online(0.)
+    health.set_rate(0.5)
+    for t in (0., 2., 4., 6., 12.):   # two frames are missing before the last one
+        health.frame(t)
+    assert health.gaps == 1 and health.missed == 2
+    assert math.isclose(health.fps(), 4/12)
+    assert health.jitter() > 0
+    # at 0.5 Hz the camera is still online 3 s after the last frame
+    assert health.is_online(15.) and not health.is_online(17.)
+
+    assert health.check(b"ok") and health.check(b"ko") and not health.check(b"??")
+    status = health.status(13.)
+    assert status["ok"] == status["ko"] == 1 and status["rate"] == 0.5
+
+
+def test_same_timestamps():
+    """
+    Check the frame rate is unknown, not an error, if all the frames arrived at
+    the same time
+    """
+    health = IngestHealth()
+    for _ in range(3):
+        health.frame(5.)
+    assert math.isnan(health.fps())
+    assert health.status(5.)["online"]
+
+
+def test_camera_health():
+    """
+    Check the health of a camera is updated by the received messages and shown on
+    the control panel
+    """
+    cam = CameraCore(save=False)
+    cam.handle_message(FakeMessage("/singlecameras/camera1/settings/current",
+                                   synthetic.settings_payload(rate=8.)))
+    image = synthetic.image_payload(synthetic.frame_data(0.))
+    for _ in range(3):
+        cam.handle_message(FakeMessage("/singlecameras/camera1/image", image))
+        cam.handle_message(FakeMessage("/singlecameras/camera1/check", b"ok"))
+    assert cam.is_online()
+    status = cam.health.status()
+    assert status["rate"] == 8. and status["ok"] == 3 and status["gaps"] == 0
+
+    panel = ControlPanel()
+    panel.fig.canvas.draw()
+    panel.show_health(status)
+    assert panel.check_text.get_text() == "OK/KO: 3/0"
+    assert panel._state.get_text() == "ONLINE"
+
+
+def test_coalesced_health():
+    """
+    Check the images coalesced by the ingest queue are counted, and the invalid
+    ones are not
+    """
+    cam = CameraCore(save=False)
+    cam.queue = IngestQueue()
+    image = synthetic.image_payload(synthetic.frame_data(0.))
+    for _ in range(4):
+        cam.queue.put(FakeMessage("/singlecameras/camera1/image", image))
+    for msg in cam.queue.drain():
+        cam.handle_message(msg)
+    assert cam.frames == 1 and cam.health.frames == 4
+
+    cam.handle_message(FakeMessage("/singlecameras/camera1/image", b"invalid"))
+    assert cam.health.frames == 4
+
+
+if __name__ == "__main__":
+    test_health()
+    test_same_timestamps()
+    test_camera_health()
+    test_coalesced_health()
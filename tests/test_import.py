@@ -0,0 +1,45 @@
+"""
+Test the import of the package: no side effects and no heavy dependency for the
+modules used without GUI
+"""
+
+import json
+import subprocess
+import sys
+
+# modules that must not be imported by each module
+HEAVY = {
+    "thermocam": {"numpy", "matplotlib", "cv2"},
+    "thermocam.protocol": {"numpy", "matplotlib", "cv2"},
+    "thermocam.fleet": {"numpy", "matplotlib", "cv2"},
+    "thermocam.core": {"matplotlib", "cv2"},
+    "thermocam.registry": {"matplotlib", "cv2"},
+    "thermocam.callbacks": {"matplotlib", "cv2"},
+}
+
+
+def imported(module, home):
+    """Return the top-level modules loaded by importing a module in a new interpreter
+    """
+    code = f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         check=True, env={"HOME": str(home), "PYTHONPATH": ":".join(sys.path)})
+    return {name.split(".")[0] for name in json.loads(out.stdout)}
+
+
+def test_import(tmp_path):
+    """
+    Check importing the modules does not create any directory nor load GUI or
+    OpenCV modules
+    """
+    for module, heavy in HEAVY.items():
+        loaded = imported(module, tmp_path)
+        assert not loaded & heavy, f"{module} imports {loaded & heavy}"
+    assert not any(tmp_path.iterdir()), "Output directories created on import"
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as d:
+        test_import(Path(d))
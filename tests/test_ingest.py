@@ -0,0 +1,36 @@
+"""
+Test for module ingest
+"""
+
+from thermocam.ingest import IngestQueue
+
+
+class FakeMsg:
+    """Object with topic and payload to mimick real MQTT message
+    """
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+def test_coalescing():
+    """
+    Check that only the newest image is kept, while data messages are kept in order
+    """
+    q = IngestQueue(maxsize=3)
+
+    q.put(FakeMsg("/singlecameras/camera1/image", b"1"))
+    for i in range(4):
+        q.put(FakeMsg("/singlecameras/camera1/pixels/data", f"1 2 {i}.00"))
+    q.put(FakeMsg("/singlecameras/camera1/image", b"2"))
+
+    msgs = q.drain()
+    assert [m.payload for m in msgs] == ["1 2 1.00", "1 2 2.00", "1 2 3.00", b"2"], \
+        "Wrong messages drained"
+    assert q.stats() == {"enqueued": 6, "coalesced": 1, "dropped": 1, "queued": 0}, \
+        "Wrong counters"
+    assert not q.drain(), "Queue should be empty"
+
+
+if __name__ == "__main__":
+    test_coalescing()
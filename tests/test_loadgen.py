@@ -0,0 +1,40 @@
+"""
+Test for module loadgen
+"""
+
+import math
+
+from thermocam.callbacks import MQTTCallbacks
+from thermocam.core import CameraCore
+from thermocam.ingest import IngestQueue
+from thermocam.loadgen import LoadGenerator, SimulatedCamera
+from thermocam.registry import CameraRegistry
+
+
+def test_load():
+    """
+    Check the messages of the simulated cameras are processed and measured, with
+    and without ingest queue
+    """
+    for queue in (False, True):
+        handler = CameraRegistry(lambda cam_id: CameraCore(cam_id, save=False))
+        if queue:
+            handler.queue = IngestQueue(64)
+        cameras = [SimulatedCamera(f"load{i}", rate=20., n_pixels=3, seed=i) for i in range(3)]
+        load = LoadGenerator(handler, cameras, MQTTCallbacks(handler), drain_interval=0.02)
+        report = load.run(0.3)
+
+        assert set(handler.cameras) == {"load0", "load1", "load2"}
+        assert report["frames_published"] >= 3
+        assert (report["frames_processed"] + report.get("coalesced", 0)
+                == report["frames_published"]), "Frames lost"
+        assert report["processed"] == len(load.latencies) > 0
+        assert report["latency_p50"] <= report["latency_max"]
+        cam = handler.cameras["load0"]
+        assert len(cam.single_pixels.p) == 3, "Current pixels not delivered"
+
+        assert math.isnan(load.report(0.)["processed_rate"]), "Rate not NaN without duration"
+
+
+if __name__ == "__main__":
+    test_load()
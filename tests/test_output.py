@@ -0,0 +1,36 @@
+"""
+Test for module output
+"""
+
+import gzip
+
+from thermocam.output import OutputWriter
+
+
+def test_buffered(tmp_path):
+    """
+    Check lines are buffered until the flush interval and written on close
+    """
+    writer = OutputWriter("pix", tmp_path, flush_interval=3600)
+    writer.write("a,1\n")
+    writer.write("b,2\n")
+    assert writer.path.read_text() == "", "Lines written before the flush"
+    writer.close()
+    assert writer.path.read_text() == "a,1\nb,2\n", "Lines not written on close"
+
+
+def test_rotation(tmp_path):
+    """
+    Check files are rotated by size and closed segments are compressed
+    """
+    writer = OutputWriter("area", tmp_path, flush_interval=0, max_bytes=20, compress="gzip")
+    lines = [f"line {i:04d}\n" for i in range(10)]
+    for line in lines:
+        writer.write(line)
+    writer.close()
+
+    segments = sorted(tmp_path.glob("area_*.txt.gz"))
+    assert len(segments) == 5, "Files not rotated"
+    assert not list(tmp_path.glob("*.txt")), "Segments not compressed"
+    content = "".join(gzip.open(p, "rt").read() for p in segments)
+    assert sorted(content.splitlines(keepends=True)) == lines, "Lines lost"
@@ -0,0 +1,63 @@
+"""
+Test for module pixelstats
+"""
+
+from datetime import datetime, timedelta
+import numpy as np
+
+from thermocam.core import CameraCore
+from thermocam.frame import ThermalFrame
+from thermocam.loadgen import FakeMessage
+from thermocam.pixelstats import PixelStats
+
+
+def test_pixel_stats(tmp_path):
+    """
+    Check the running statistics match the ones of the whole stack of frames,
+    and that they are saved and reset
+    """
+    rng = np.random.default_rng(0)
+    data = np.float32(rng.normal(30., 5., (50, 24, 32)))
+    start = datetime(2025, 1, 1)
+    stats = PixelStats(threshold=30.)
+    for i, d in enumerate(data):
+        stats.update(ThermalFrame(d, start + timedelta(seconds=i)))
+
+    assert stats.count == 50
+    assert np.allclose(stats.mean, data.mean(0, dtype=np.float64))
+    assert np.allclose(stats.map("std"), data.std(0, ddof=1, dtype=np.float64))
+    assert np.array_equal(stats.min, data.min(0)) and np.array_equal(stats.max, data.max(0))
+    # one second for each frame after the first one above the threshold
+    assert np.array_equal(stats.above, (data[1:] > 30.).sum(0))
+
+    stats.save(tmp_path / "stats.npz")
+    with np.load(tmp_path / "stats.npz") as saved:
+        assert saved["count"] == 50 and saved["threshold"] == 30.
+        assert np.array_equal(saved["max"], stats.max)
+
+    stats.reset()
+    assert stats.count == 0 and stats.start is None and not stats.above.any()
+    assert not stats.map("std").any()
+
+
+def test_camera_stats(tmp_path):
+    """
+    Check the received frames are added to the statistics of the camera
+    """
+    cam = CameraCore(save=False)
+    image = np.float32(np.full((24, 32), 25.)).tobytes()
+    for _ in range(3):
+        cam.handle_message(FakeMessage("/singlecameras/camera1/image", image))
+    assert cam.stats.count == 3
+    assert np.all(cam.stats.mean == 25.)
+
+    cam.save_stats(tmp_path)
+    assert len(list(tmp_path.glob("stats_camera1_*.npz"))) == 1
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as d:
+        test_pixel_stats(Path(d))
+        test_camera_stats(Path(d))
@@ -2,23 +2,34 @@
 Test script receive_data.py
 
 Usage: run this script and then run receive_data to visually check
-it plots what expected
+it plots what expected. The encoding of the images (see thermocam.frame.ENCODINGS)
+can be given as argument, default is float32 as published by the AtomS3
 """
 
+import sys
 import time
 import numpy as np
 import paho.mqtt.client as mqtt
 from loguru import logger
 
+from thermocam.frame import encode_frame
+
 # MQTT_SERVER = "test.mosquitto.org"
 MQTT_SERVER = "broker.emqx.io"
 
 class DummyCamera:
     """
     Object to generate and publish data that mimics what the AtomS3 publishes
+
+    Parameters
+    ----------
+    encoding : str, optional
+        encoding of the images, one of thermocam.frame.ENCODINGS, default is
+        "float32" (as published by the AtomS3)
     """
 
-    def __init__(self):
+    def __init__(self, encoding="float32"):
+        self.encoding = encoding
         self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
         self.client.connect(MQTT_SERVER, 1883, 60)
 
@@ -37,9 +48,8 @@ class DummyCamera:
         """ Publish image
         """
         # generate random image
-        values = np.random.rand((32*24))*30
-        values = np.float32(values)
-        img = values.tobytes()
+        values = np.random.rand(24, 32)*30
+        img = encode_frame(values, self.encoding)
         self.client.publish("/singlecameras/camera1/image", img)
 
     def empty(self):
@@ -48,13 +58,18 @@ class DummyCamera:
         self.client.publish("/singlecameras/camera1/image", "")
 
 
-def manual_test_loop():
+def manual_test_loop(encoding="float32"):
     """Start a publishing loop
 
     Publishes dummy data every 0.5 seconds
+
+    Parameters
+    ----------
+    encoding : str, optional
+        encoding of the images, default is "float32"
     """
 
-    camera = DummyCamera()
+    camera = DummyCamera(encoding)
 
     logger.info("Starting dummy camera publish loop. Press CTRL+C to stop.")
     try:
@@ -68,4 +83,4 @@ def manual_test_loop():
 
 
 if __name__ == "__main__":
-    manual_test_loop()
+    manual_test_loop(*sys.argv[1:2])
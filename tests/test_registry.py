@@ -0,0 +1,73 @@
+"""
+Test for module registry
+"""
+
+import numpy as np
+
+from thermocam.core import CameraCore
+from thermocam.registry import CameraRegistry, camera_id
+from thermocam.timing import Timing
+from thermocam.visualization import OverviewDisplay
+
+
+class FakeMsg:
+    """Object with topic and payload to mimick real MQTT message
+    """
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+def test_camera_id():
+    """
+    Check the camera identifier is extracted from the topic
+    """
+    assert camera_id("/singlecameras/camera7/pixels/data") == "camera7"
+    assert camera_id("/othercameras/camera7/image") is None
+
+
+def test_registry():
+    """
+    Check each camera gets its own state, created when it first publishes
+    """
+    registry = CameraRegistry(lambda cam_id: CameraCore(cam_id, save=False))
+
+    for cam in ("camera1", "camera2"):
+        values = np.float32(np.random.rand(32*24)*30)
+        registry.handle_message(FakeMsg(f"/singlecameras/{cam}/image", values.tobytes()))
+        registry.handle_message(FakeMsg(f"/singlecameras/{cam}/area/current", b"1 2 3 4"))
+        registry.handle_message(FakeMsg(f"/singlecameras/{cam}/area/data",
+                                        b"max: 10.50 min: 9.00 avg: 8.50 x: 1 y: 2 w: 3 h: 4"))
+        assert (registry.cameras[cam].frame.image == values.reshape(24, 32).T).all(), \
+            "Frame not stored for the right camera"
+
+    assert set(registry.cameras) == {"camera1", "camera2"}, "Cameras not created"
+    assert registry.cameras["camera2"].area.out_data() == "1, 2, 3, 4, 8.5, 9.0, 10.5"
+    registry.close_files()
+
+
+def test_registry_overview():
+    """
+    Check that the overview is updated only with new frames, and that the files
+    of the cameras are flushed by a timer
+    """
+    registry = CameraRegistry(lambda cam_id: CameraCore(cam_id, save=False,
+                                                        timing=Timing(True, log_interval=0.)),
+                              overview=OverviewDisplay())
+    values = np.float32(np.random.rand(32*24)*30)
+    updates = []
+    registry.overview.update = lambda cam_id, frame: updates.append(frame)
+    registry.handle_message(FakeMsg("/singlecameras/camera1/image", values.tobytes()))
+    registry.handle_message(FakeMsg("/singlecameras/camera1/image", b"invalid"))
+    assert updates == [registry.cameras["camera1"].frame], "Overview not updated once"
+    assert registry.cameras["camera1"].timing.histograms
+
+    for func, args, kwargs in registry.timer.callbacks:
+        func(*args, **kwargs)
+    assert not registry.cameras["camera1"].timing.histograms, "Timing not logged"
+
+
+if __name__ == "__main__":
+    test_camera_id()
+    test_registry()
+    test_registry_overview()
@@ -0,0 +1,91 @@
+"""
+Test for module roi
+"""
+
+from datetime import datetime, timedelta
+import numpy as np
+
+from thermocam.frame import ThermalFrame
+from thermocam.roi import AreaSet, MaskSet
+
+
+def test_area_set(tmp_path):
+    """
+    Check the data of the named areas matches a direct computation, and that
+    areas can be saved, loaded and removed
+    """
+    areas = AreaSet()
+    areas.add("chip", 2, 3, 4, 5)
+    areas.add("pixel", 23, 31, 1, 1)
+    areas.add("all", 0, 0, 24, 32)
+    try:
+        areas.add("outside", 20, 0, 5, 1)
+        assert False, "Area outside the image accepted"
+    except ValueError:
+        pass
+
+    start = datetime.now()
+    for i in range(3):
+        data = np.float32(np.random.rand(24, 32)*30)
+        areas.update_from_frame(ThermalFrame(data, start + timedelta(seconds=i)), None, start)
+        for name, (x, y, w, h) in areas.areas.items():
+            block = data[x:x+w, y:y+h]
+            series = areas.regions_data[name]["series"]
+            assert np.isclose(series.last(areas.AVG), block.mean())
+            assert series.last(areas.MIN) == block.min()
+            assert series.last(areas.MAX) == block.max()
+    assert len(areas.regions_data["chip"]["series"]) == 3
+    assert areas.at(3, 4) == "all"
+    assert areas.out_data().startswith(" chip, ")
+
+    f = tmp_path / "areas.txt"
+    areas.save(f)
+    with open(f, "a", encoding="utf-8") as out:
+        out.write("# comment\nbroken 1 2\n")
+    loaded = AreaSet()
+    loaded.load(f)
+    assert loaded.areas == areas.areas
+
+    loaded.remove("all")
+    assert loaded.at(3, 4) == "chip"
+    assert len(loaded) == 2
+
+
+def test_mask_set(tmp_path):
+    """
+    Check the data of weighted and drawn masks matches a direct computation, and
+    that masks can be saved and loaded
+    """
+    masks = MaskSet()
+    weights = np.zeros((24, 32))
+    weights[5:8, 10:20] = np.random.rand(3, 10) + 0.1
+    masks.add("weighted", weights)
+    # square with corners on pixel edges: pixels 2..5 x 3..6
+    masks.add_polygon("square", [(1.5, 2.5), (5.5, 2.5), (5.5, 6.5), (1.5, 6.5)])
+    name = masks.add_circle(None, 12, 16, 2)
+    assert name == "roi3"
+    assert masks.masks["square"].sum() == 16
+    assert masks.masks[name].sum() == 13
+
+    data = np.float32(np.random.rand(24, 32)*30)
+    avg, min_T, max_T = masks.stats(data)
+    assert np.isclose(avg[0], (weights*data).sum()/weights.sum())
+    assert np.isclose(avg[1], data[2:6, 3:7].mean())
+    assert min_T[1] == data[2:6, 3:7].min()
+    assert max_T[2] == data[masks.masks[name] > 0].max()
+    assert masks.at(12, 16) == name
+
+    f = tmp_path / "masks.npz"
+    masks.save(f)
+    loaded = MaskSet()
+    loaded.load(f)
+    assert list(loaded.masks) == list(masks.masks)
+    assert np.allclose(loaded.stats(data), masks.stats(data))
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as d:
+        test_area_set(Path(d))
+        test_mask_set(Path(d))
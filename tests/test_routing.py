@@ -0,0 +1,38 @@
+"""
+Test for module routing
+"""
+
+from thermocam.routing import TopicRouter
+
+
+class FakeMsg:
+    """Object with topic and payload to mimick real MQTT message
+    """
+    def __init__(self, topic, payload=b"1"):
+        self.topic = topic
+        self.payload = payload
+
+
+def test_dispatch():
+    """
+    Check messages reach their route and are counted, and that unknown topics are ignored
+    """
+    router = TopicRouter()
+    received = []
+    router.add_route("image", lambda msg: received.append("image"))
+    router.add_route("temps", lambda msg: received.append("temps"))
+
+    assert router.dispatch(FakeMsg("/singlecameras/camera1/image"))
+    assert router.dispatch(FakeMsg("/singlecameras/camera1/temps"))
+    assert not router.dispatch(FakeMsg("/singlecameras/camera1/check"))
+    assert not router.dispatch(FakeMsg("/singlecameras/camera2/image"))
+    assert received == ["image", "temps"], "Messages not dispatched to the right route"
+    assert router.counts["image"] == 1 and router.counts["check"] == 1, "Wrong counters"
+    assert router.unrouted() == {"check": 1, "/singlecameras/camera2/image": 1}
+
+    router.remove_route("image")
+    assert not router.dispatch(FakeMsg("/singlecameras/camera1/image"))
+
+
+if __name__ == "__main__":
+    test_dispatch()
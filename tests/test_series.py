@@ -0,0 +1,57 @@
+"""
+Test for module series
+"""
+
+import numpy as np
+
+from thermocam.series import MinMaxEnvelope, TimeSeries
+
+
+def test_circular():
+    """
+    Check only the last samples are retained, in order
+    """
+    s = TimeSeries(columns=2, capacity=5)
+    for t in range(12):
+        s.append(float(t), t*10., -t)
+
+    assert len(s) == 5, "Wrong number of retained samples"
+    assert (s.times() == np.arange(7, 12)).all(), "Wrong retained times"
+    assert (s.values(1) == -np.arange(7, 12)).all(), "Wrong retained values"
+    assert s.last(0) == 110., "Wrong last value"
+    assert s.limits() == (7., 11., -11., 110.), "Wrong limits"
+
+
+def test_window():
+    """
+    Check samples older than the window are not returned
+    """
+    s = TimeSeries(capacity=100, window=2.5)
+    for t in range(10):
+        s.append(float(t), 1.)
+
+    assert (s.times() == [7., 8., 9.]).all(), "Wrong retained times"
+
+
+def test_envelope():
+    """
+    Check the envelope stays bounded by the axes width and keeps extremes
+    """
+    env = MinMaxEnvelope(width=50)
+    values = np.random.rand(20000)
+    for t, v in enumerate(values):
+        env.add(t*0.125, v)
+
+    x, y = env.xy()
+    assert len(env) <= 2*50 + 1, "Too many bins"
+    assert y.max() == values.max() and y.min() == values.min(), "Extremes lost"
+    assert (np.diff(x) >= 0).all(), "Bins not in order"
+
+    env.trim(1000.)
+    assert env.xy()[0][0] + env.bin > 1000., "Old bins not removed"
+
+
+if __name__ == "__main__":
+    test_circular()
+    test_window()
+    test_envelope()
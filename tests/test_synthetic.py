@@ -0,0 +1,38 @@
+"""
+Test for module synthetic
+"""
+
+import json
+import numpy as np
+
+from thermocam import synthetic
+from thermocam.core import parse_settings
+from thermocam.frame import decode_frame
+from thermocam.roi import InterestingArea, InterestingPixels
+
+
+def test_payloads():
+    """
+    Check the synthetic payloads are decoded as the ones published by the AtomS3
+    """
+    data = synthetic.frame_data(1., np.random.default_rng(1))
+    frame = decode_frame(synthetic.image_payload(data))
+    assert (frame.data == data).all(), "Wrong image payload"
+
+    pixels = InterestingPixels()
+    msg = synthetic.pixels_payload(data, [(1, 2), (23, 31)]).decode()
+    pixels.update_data(msg, None, frame.time)
+    assert np.isclose(pixels.pixels_data[(23, 31)]["series"].last(), data[23, 31], atol=0.01)
+
+    area = InterestingArea()
+    area.handle_mqtt("2 3 4 5")
+    area.update_data(synthetic.area_payload(data, (2, 3, 4, 5)).decode(), None, frame.time)
+    assert np.isclose(area.area_data[str(area.a)]["series"].last(area.MAX),
+                      data[2:6, 3:8].max(), atol=0.1)
+
+    assert parse_settings(synthetic.settings_payload(rate=0.5, mode=0))["rate"] == 0.5
+    assert json.loads(synthetic.temps_payload(data))["tmax"] == round(float(data.max()), 2)
+
+
+if __name__ == "__main__":
+    test_payloads()
@@ -0,0 +1,64 @@
+"""
+Test for module timing
+"""
+
+import math
+import numpy as np
+
+from thermocam.core import CameraCore
+from thermocam.loadgen import FakeMessage
+from thermocam.timing import Histogram, Timing
+
+
+def test_histogram():
+    """
+    Check the percentiles are within a bin of the exact ones
+    """
+    hist = Histogram()
+    assert math.isnan(hist.percentile(50))
+    samples = np.random.default_rng(0).uniform(1e-4, 1e-2, 1000)
+    for s in samples:
+        hist.add(s)
+    assert hist.count == 1000
+    assert math.isclose(hist.mean(), samples.mean())
+    assert hist.max == samples.max()
+    for p in (50, 95, 99):
+        exact = np.percentile(samples, p)
+        assert exact <= hist.percentile(p) <= exact*10**(1/hist.bins_per_decade)
+    assert hist.percentile(100) == samples.max()
+    hist.add(0.)    # samples out of range go to the first and last bin
+    hist.add(1e9)
+    assert hist.counts[0] == hist.counts[-1] == 1
+
+
+def test_camera_timing():
+    """
+    Check the stages are recorded only when the timing is enabled, and that
+    toggling it clears the histograms
+    """
+    image = np.float32(np.random.rand(32*24)*30).tobytes()
+    cam = CameraCore(save=False)
+    cam.handle_message(FakeMessage("/singlecameras/camera1/image", image))
+    assert not cam.timing.histograms
+
+    cam.timing.toggle()
+    for _ in range(5):
+        cam.handle_message(FakeMessage("/singlecameras/camera1/image", image))
+    summary = cam.timing.summary()
+    assert {"queue", "handle", "total", "decode", "roi", "video"} <= summary.keys()
+    assert summary["decode"]["count"] == 5
+    assert summary["total"]["max"] >= summary["handle"]["p50"] > 0
+    assert len(cam.timing.text(3).splitlines()) == 3
+
+    cam.timing.toggle()
+    assert not cam.timing.enabled and not cam.timing.histograms
+
+    timing = Timing(True, log_interval=0.)
+    timing.record("stage", 1e-3)
+    timing.tick()
+    assert not timing.histograms, "Histograms not cleared after logging"
+
+
+if __name__ == "__main__":
+    test_histogram()
+    test_camera_timing()
@@ -0,0 +1,84 @@
+"""
+Test for module videomaker
+"""
+
+import numpy as np
+
+from thermocam.frame import decode_frame
+from thermocam.videomaker import VideoMaker
+
+
+def test_render():
+    """
+    Check thermal frames are rendered with the video size and the colormap extremes
+    """
+    video = VideoMaker(size=(240, 320), timestamp=False, scale_bar=False)
+    values = np.float32(np.random.rand(32*24)*30)
+    values[0], values[1] = 0., 30.
+    img = video.render(decode_frame(values.tobytes()))
+
+    assert img.shape == (320, 240, 3) and img.dtype == np.uint8, "Wrong video frame format"
+    assert (img[0, 0] == video._lut[0]).all(), "Coldest pixel has wrong color"
+    assert (img[10, 0] == video._lut[255]).all(), "Hottest pixel has wrong color"
+
+
+def test_writer_thread(tmp_path):
+    """
+    Check frames are written by the writer thread and dropped when the queue is full
+    """
+    video = VideoMaker(size=(240, 320), queue_size=2, overflow="drop_newest",
+                       directory=tmp_path)
+    frame = decode_frame(np.float32(np.random.rand(32*24)*30).tobytes())
+
+    video.start_video()
+    for _ in range(50):
+        video.add_thermal(frame)
+    video.stop_video(wait=True)
+
+    metrics = video.metrics()
+    assert metrics["written"] + metrics["dropped"] == 50, "Frames lost"
+    assert metrics["queued"] == 0, "Queue not drained"
+    assert len(list(tmp_path.glob("*.mp4"))) == 1, "Video not saved"
+
+
+def test_writer_errors(tmp_path):
+    """
+    Check a frame that cannot be written does not stop the writer thread, and
+    that the metrics are the ones of the current video
+    """
+    video = VideoMaker(size=(240, 320), queue_size=2, overflow="block", directory=tmp_path)
+    frame = decode_frame(np.float32(np.random.rand(32*24)*30).tobytes())
+
+    video.start_video()
+    video.add_thermal(None)     # render fails
+    for _ in range(5):
+        video.add_thermal(frame)
+    video.stop_video(wait=True)
+    assert video.metrics()["written"] == 5 and video.metrics()["dropped"] == 1
+
+    video.start_video()
+    video.add_thermal(frame)
+    video.stop_video(wait=True)
+    assert video.metrics()["written"] == 1 and video.metrics()["dropped"] == 0
+
+
+def test_writer_overlap(tmp_path):
+    """
+    Check the writer of a stopped video does not change the metrics of the next one
+    """
+    video = VideoMaker(size=(240, 320), queue_size=8, overflow="block", directory=tmp_path)
+    frame = decode_frame(np.float32(np.random.rand(32*24)*30).tobytes())
+
+    video.start_video()
+    for _ in range(8):
+        video.add_thermal(frame)
+    video.stop_video()
+    previous = video._thread
+    video.start_video()
+    previous.join()
+    assert video.metrics()["written"] == 0 and video.metrics()["dropped"] == 0
+    video.stop_video(wait=True)
+
+
+if __name__ == "__main__":
+    test_render()
@@ -37,5 +37,46 @@ def test_display():
     assert (plotted==values.reshape(24,32).T).all(),"It's not plotting the right values"
     plt.show()
 
+def test_display_blit():
+    """
+    Check that in blit mode frames are drawn and render times are measured
+    """
+    fig = Display(blit=True)
+
+    for _ in range(3):
+        values = np.float32(np.random.rand((32*24)))
+        fig.update_image(FakeMsg(values.tobytes()))
+
+    plotted = fig.image.get_array()
+    assert (plotted==values.reshape(24,32).T).all(),"It's not plotting the right values"
+    assert len(fig.render_times) == 3, "Render times are not being measured"
+    plt.close("all")
+
+def test_display_lut():
+    """
+    Check that the lookup table gives the colors of the colormap, and that the
+    colorbar limits change only beyond the hysteresis
+    """
+    fig = Display(lut=True)
+    values = np.float32(np.random.rand((32*24))*30)
+    fig.update_image(FakeMsg(values.tobytes()))
+    fig.canvas.draw()
+
+    rgba, x0, y0, _ = fig.image.make_image(fig.canvas.get_renderer())
+    expected = fig.image.cmap(fig.image.norm(values.reshape(24,32).T), bytes=True)
+    # screen pixel at the center of each frame pixel
+    centers = fig.ax_img.transData.transform(np.argwhere(np.ones((32, 24)))[:, ::-1])
+    cols, rows = (centers - [x0, y0]).astype(int).T
+    assert (rgba[rows, cols] == expected.reshape(-1, 4)).all(), "Wrong colors"
+
+    low, high = fig.image.get_clim()
+    assert not fig.update_cbar(values.min() + 0.5, values.max() - 0.5)
+    assert fig.update_cbar(values.min(), values.max() + 5)
+    assert fig.update_cbar(values.min(), values.max(), force=True)
+    assert fig.image.get_clim() == (low, high)
+    plt.close("all")
+
 if __name__ == "__main__":
     test_display()
+    test_display_blit()
+    test_display_lut()
@@ -1,4 +1,7 @@
 """Init constructor for package
+
+Importing the package has no side effects: the output directories are created
+by the objects that write to them, when they first do.
 """
 
 from pathlib import Path
@@ -9,15 +12,9 @@ THERMOCAM_ROOT = Path(__file__).parent
 THERMOCAM_BASE = THERMOCAM_ROOT.parent
 
 THERMOCAM_OUT = Path().home() / 'thermocam_out'
-if not Path.exists(THERMOCAM_OUT):
-    Path.mkdir(THERMOCAM_OUT)
-
 THERMOCAM_VIDEO = THERMOCAM_OUT / 'videos'
-if not Path.exists(THERMOCAM_VIDEO):
-    Path.mkdir(THERMOCAM_VIDEO)
-
 THERMOCAM_DATA = THERMOCAM_OUT / 'data'
-if not Path.exists(THERMOCAM_DATA):
-    Path.mkdir(THERMOCAM_DATA)
+THERMOCAM_ARCHIVE = THERMOCAM_OUT / 'archive'
 
 MQTT_PATH = "/singlecameras/camera1/#"
+MQTT_PATH_ALL = "/singlecameras/+/#"
@@ -0,0 +1,243 @@
+"""
+Define the archive of raw thermal frames.
+
+Frames are appended to memory-mapped segment files: each segment is a pair of
+files, "<name>_<n>.frames" with the float32 frames (24x32 each) and
+"<name>_<n>.times" with their int64 timestamps (ns since epoch). The files are
+preallocated and grown by chunks, so that writing a frame is a single copy into
+the mapped memory; when a segment reaches its maximum size, a new one is started.
+
+Timestamps are non-decreasing, so time ranges are found with a binary search and
+the reader returns views on the mapped files (no data is copied).
+"""
+
+import bisect
+from pathlib import Path
+import numpy as np
+from loguru import logger
+
+from thermocam import THERMOCAM_ARCHIVE
+from thermocam.frame import FRAME_ROWS, FRAME_COLS
+
+_FRAME_BYTES = 4*FRAME_ROWS*FRAME_COLS
+_TIME_BYTES = 8
+
+
+def _segment_len(times):
+    """Return the number of frames written in a segment
+
+    Unused (preallocated) entries have timestamp 0 and follow the used ones, so
+    the number of frames is found with a binary search.
+
+    Parameters
+    ----------
+    times : np.ndarray
+        timestamps of the segment
+
+    Returns
+    -------
+    int
+    """
+    return bisect.bisect_left(range(len(times)), True, key=lambda i: times[i] == 0)
+
+
+class FrameArchive:
+    """
+    Append-only archive of the raw frames of a camera.
+
+    Parameters
+    ----------
+    name : str, optional
+        name of the archive (e.g. the camera identifier), default is "camera1"
+    directory : pathlib.Path, optional
+        directory of the segment files, default is "thermocam.THERMOCAM_ARCHIVE"
+    chunk : int, optional
+        number of frames the segment files are grown by when full, default is 4096
+        (about 12 MB)
+    max_bytes : int, optional
+        maximum size of the frames file of a segment before a new one is started,
+        default is 1 GB
+
+    Attributes
+    ----------
+    segment : int
+        number of the segment currently written
+    count : int
+        number of frames in the current segment
+    """
+
+    def __init__(self, name="camera1", directory=THERMOCAM_ARCHIVE, chunk=4096,
+                 max_bytes=1 << 30):
+        self.name = name
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.chunk = chunk
+        self.max_frames = max(max_bytes // _FRAME_BYTES, 1)
+        self._frames = None
+        self._times = None
+        self._last_time = 0
+
+        # continue after the last existing segment
+        segments = _list_segments(self.directory, name)
+        self.segment = segments[-1][0] + 1 if segments else 0
+        self.count = 0
+        self._open_segment()
+
+    def _paths(self):
+        """Return the paths of the files of the current segment
+        """
+        stem = self.directory / f"{self.name}_{self.segment:05d}"
+        return stem.with_suffix(".frames"), stem.with_suffix(".times")
+
+    def _open_segment(self):
+        """Create the files of a new segment
+        """
+        self.count = 0
+        self._map(min(self.chunk, self.max_frames))
+        logger.info(f"Archiving frames to {self._paths()[0]}")
+
+    def _map(self, capacity):
+        """(Re)map the files of the current segment with the given capacity
+
+        Parameters
+        ----------
+        capacity : int
+            number of frames
+        """
+        self._flush()
+        f_frames, f_times = self._paths()
+        for path, size in ((f_frames, _FRAME_BYTES), (f_times, _TIME_BYTES)):
+            with open(path, "ab") as f:
+                f.truncate(capacity*size)
+        self._frames = np.memmap(f_frames, dtype=np.float32, mode="r+",
+                                 shape=(capacity, FRAME_ROWS, FRAME_COLS))
+        self._times = np.memmap(f_times, dtype=np.int64, mode="r+", shape=(capacity,))
+
+    def _flush(self):
+        """Flush and release the mapped files
+        """
+        if self._frames is not None:
+            self._frames.flush()
+            self._times.flush()
+        self._frames = None
+        self._times = None
+
+    def append(self, frame):
+        """
+        Append a frame to the archive
+
+        Parameters
+        ----------
+        frame : thermocam.frame.ThermalFrame
+        """
+        if self.count == len(self._times):
+            if self.count >= self.max_frames:
+                self._close_segment()
+                self.segment += 1
+                self._open_segment()
+            else:
+                self._map(min(self.count + self.chunk, self.max_frames))
+
+        # timestamps must not decrease (e.g. after a clock adjustment)
+        t = max(int(frame.time.timestamp()*1e9), self._last_time)
+        self._frames[self.count] = frame.data
+        self._times[self.count] = t
+        self._last_time = t
+        self.count += 1
+
+    def _close_segment(self):
+        """Shrink the files of the current segment to the written frames
+        """
+        self._flush()
+        f_frames, f_times = self._paths()
+        for path, size in ((f_frames, _FRAME_BYTES), (f_times, _TIME_BYTES)):
+            with open(path, "r+b") as f:
+                f.truncate(self.count*size)
+
+    def close(self):
+        """Flush the archive and release its files
+        """
+        if self._frames is not None:
+            self._close_segment()
+
+
+def _list_segments(directory, name):
+    """Return the existing segments of an archive, sorted by number
+
+    Parameters
+    ----------
+    directory : pathlib.Path
+    name : str
+
+    Returns
+    -------
+    list of (int, pathlib.Path)
+        segment number and path of its frames file
+    """
+    segments = []
+    for path in Path(directory).glob(f"{name}_*.frames"):
+        try:
+            segments.append((int(path.stem.rsplit("_", 1)[1]), path))
+        except ValueError:
+            continue
+    return sorted(segments)
+
+
+class ArchiveReader:
+    """
+    Read-only access to the frames of an archive.
+
+    Parameters
+    ----------
+    name : str, optional
+        name of the archive, default is "camera1"
+    directory : pathlib.Path, optional
+        directory of the segment files, default is "thermocam.THERMOCAM_ARCHIVE"
+
+    Attributes
+    ----------
+    segments : list of (np.ndarray, np.ndarray)
+        timestamps and frames of each segment, mapped in memory
+    """
+
+    def __init__(self, name="camera1", directory=THERMOCAM_ARCHIVE):
+        self.segments = []
+        for _, path in _list_segments(directory, name):
+            times = np.memmap(path.with_suffix(".times"), dtype=np.int64, mode="r")
+            n = _segment_len(times)
+            if n == 0:
+                continue
+            frames = np.memmap(path, dtype=np.float32, mode="r",
+                               shape=(len(times), FRAME_ROWS, FRAME_COLS))
+            self.segments.append((times[:n], frames[:n]))
+        self._starts = [times[0] for times, _ in self.segments]
+
+    def __len__(self):
+        return sum(len(times) for times, _ in self.segments)
+
+    def between(self, start, stop):
+        """
+        Return the frames received in the time interval [start, stop)
+
+        Parameters
+        ----------
+        start, stop : datetime
+
+        Returns
+        -------
+        list of (np.ndarray, np.ndarray)
+            timestamps (ns since epoch) and frames of each segment in the interval;
+            they are views on the archive files
+        """
+        t0 = int(start.timestamp()*1e9)
+        t1 = int(stop.timestamp()*1e9)
+        out = []
+        # first segment that can contain t0
+        first = max(bisect.bisect_right(self._starts, t0) - 1, 0)
+        for times, frames in self.segments[first:]:
+            if times[0] >= t1:
+                break
+            i0, i1 = np.searchsorted(times, [t0, t1])
+            if i1 > i0:
+                out.append((times[i0:i1], frames[i0:i1]))
+        return out
@@ -5,8 +5,6 @@ Callbacks module for GUI interaction and MQTT message handling
 import numpy as np
 from loguru import logger
 
-from thermocam import MQTT_PATH
-
 
 class GUICallbacks():
     """ Defines all callback functions used by the GUI in the Display and ControlPanel
@@ -19,9 +17,18 @@ class GUICallbacks():
     Parameters
     ----------
     handler : thermocam.handler.ThermoHandler
+
+    Attributes
+    ----------
+    selector : matplotlib.widgets.PolygonSelector or None
+        widget used to draw a new polygon region, if one is being drawn
+    circle : np.ndarray or None
+        clicked points (center and edge) of a new circle region, if one is being drawn
     """
     def __init__(self, handler):
         self.h = handler
+        self.selector = None
+        self.circle = None
 
     def on_click(self, event):
         """
@@ -35,7 +42,12 @@ class GUICallbacks():
 
         Two clicks define a rectangular area. After the second click, the
         area is computed, drawn, and published over MQTT. A third click resets
-        the selection to allow defining a new area.
+        the selection to allow defining a new area. If the shift key is held
+        down on the second click, the area is instead added to the named areas
+        of the handler (not published).
+
+        A click with the shift key held down, when not selecting an area, removes
+        the named area containing the pixel.
 
         Clicks outside the image axes are ignored.
 
@@ -44,8 +56,12 @@ class GUICallbacks():
         event : matplotlib.backend_bases.MouseEvent
             The mouse event triggered by the click
         """
-        if not event.inaxes == self.h.figure.ax_img:
-            # when the click is outside of the axes do nothing
+        if not event.inaxes == self.h.figure.ax_img or self.selector is not None:
+            # when the click is outside of the axes or a region is being drawn do nothing
+            return
+
+        if self.circle is not None:
+            self._circle_click(event.xdata, event.ydata)
             return
 
         # get coordinates of the mouse click
@@ -62,21 +78,133 @@ class GUICallbacks():
 
             self.h.figure.draw_clicks(self.h.clicks)
 
-            if self.h.clicks.shape[0] == 2:
+            if self.h.clicks.shape[0] == 2 and event.key == "shift":
+                # add a named area, its data is computed from the frames
+                self.h.areas.add_from_click(self.h.clicks)
+                self.h.figure.update_areas(self.h.areas)
+                self.h.clicks = np.empty((0, 2), dtype=int)
+                self.h.figure.draw_clicks(self.h.clicks)
+
+            elif self.h.clicks.shape[0] == 2:
                 self.h.area.get_from_click(self.h.clicks)    # get defined area
                 self.h.figure.update_area(self.h.area)    #update drawn area
                 # publish the selected area
-                self.h.client.publish("/singlecameras/camera1/area", self.h.area.pub_area())
+                self.h.client.publish(self.h.topic("area"), self.h.area.pub_area())
+
+        elif event.key == "shift":
+            name = self.h.areas.at(x, y)
+            if name is not None:
+                logger.info(f"Removing area {name}")
+                self.h.areas.remove(name)
+                self.h.figure.update_areas(self.h.areas)
+            else:
+                name = self.h.masks.at(x, y)
+                if name is not None:
+                    logger.info(f"Removing region {name}")
+                    self.h.masks.remove(name)
+                    self.h.figure.update_masks(self.h.masks)
 
         else:
             # if area button is not clicked get point coordinates and publish them
             # if coordinates are already present, it does not append nor publish them
             if self.h.single_pixels.get_from_click(x, y):
                 # publish position of the last pixel
-                self.h.client.publish("/singlecameras/camera1/pixels/coord",
+                self.h.client.publish(self.h.topic("pixels/coord"),
                                       self.h.single_pixels.new_pixel())
                 self.h.figure.update_pixels(self.h.single_pixels)
 
+    def on_key(self, event):
+        """
+        Handle key presses on the figure, to draw a new mask region on the thermal image:
+        - "d" starts drawing a polygon (click on the vertices, close it on the first one)
+        - "e" starts drawing a circle (click on the center, then on the edge)
+        - "escape" cancels the drawing
+
+        to enable or disable the timing of the processing stages ("t"), to show
+        the next layer of per-pixel statistics on the thermal image ("m") and to
+        reset the statistics ("x").
+
+        Parameters
+        ----------
+        event : matplotlib.backend_bases.KeyEvent
+        """
+        drawing = self.selector is not None or self.circle is not None
+        if event.key == "escape" and drawing:
+            self._stop_drawing()
+        elif event.key == "d" and not drawing:
+            # matplotlib is imported only by the GUI, MQTTCallbacks is also used without it
+            from matplotlib.widgets import PolygonSelector
+            logger.info("Draw the region on the thermal image")
+            self.selector = PolygonSelector(self.h.figure.ax_img, self._polygon_selected,
+                                            props={"color": "lime"})
+        elif event.key == "e" and not drawing:
+            logger.info("Click on the center of the region, then on its edge")
+            self.circle = np.empty((0, 2))
+        elif event.key == "t":
+            self.h.timing.toggle()
+        elif event.key == "m":
+            layer = self.h.figure.next_layer()
+            if layer == "above" and self.h.stats.threshold is None:
+                logger.warning("No temperature threshold set, the time above it is not counted")
+            if self.h.frame is not None:
+                self.h.show_frame(self.h.frame)
+        elif event.key == "x":
+            self.h.stats.reset()
+            logger.info("Statistics of the frames reset")
+
+    def _stop_drawing(self):
+        """Stop drawing a mask region, removing the polygon widget or the clicked points
+        """
+        if self.selector is not None:
+            self.selector.set_active(False)
+            self.selector.set_visible(False)
+            self.selector.disconnect_events()
+            self.selector = None
+        self.circle = None
+        self.h.figure.draw_clicks(self.h.clicks)
+        self.h.figure.canvas.draw_idle()
+
+    def _add_mask(self, add, *args):
+        """Add the drawn mask region to the handler and draw it
+
+        Parameters
+        ----------
+        add : callable
+            method of the MaskSet that defines the region
+        args
+            its arguments after the name
+        """
+        try:
+            name = add(None, *args)
+            self.h.figure.update_masks(self.h.masks)
+            logger.info(f"Region {name} added")
+        except ValueError as e:
+            logger.warning(f"Region not added: {e}")
+        self._stop_drawing()
+
+    def _polygon_selected(self, vertices):
+        """Callback of the polygon selector
+
+        Parameters
+        ----------
+        vertices : list of (float, float)
+        """
+        self._add_mask(self.h.masks.add_polygon, vertices)
+
+    def _circle_click(self, x, y):
+        """Store a click defining a circle region, adding the region after the second one
+
+        Parameters
+        ----------
+        x, y : float
+            coordinates of the click on the thermal image
+        """
+        self.circle = np.append(self.circle, [(x, y)], axis=0)
+        self.h.figure.draw_clicks(self.circle)
+        if len(self.circle) == 2:
+            (cx, cy), (ex, ey) = self.circle
+            self._add_mask(self.h.masks.add_circle, cx, cy, np.hypot(ex - cx, ey - cy))
+
     def video_button_cb(self, label):
         """
         Callback executed when "Video" checkbox changes state:
@@ -100,25 +228,33 @@ class GUICallbacks():
     # callbacks for control panel buttons
     def reset_px_cb(self, event):
         """
-        Publish a request to reset all selected single pixels.
+        Publish a request to reset all selected single pixels. If their data is
+        computed from the frames, they are also reset right away.
 
         Parameters
         ----------
         event : Event
             Button press event
         """
-        self.h.client.publish("/singlecameras/camera1/pixels/reset", "1")
+        self.h.client.publish(self.h.topic("pixels/reset"), "1")
+        if self.h.roi_source == "frame":
+            self.h.single_pixels.handle_mqtt("none")
+            self.h.figure.update_pixels(self.h.single_pixels)
 
     def reset_a_cb(self, event):
         """
-        Publish a request to reset the selected area.
+        Publish a request to reset the selected area. If its data is computed
+        from the frames, it is also reset right away.
 
         Parameters
         ----------
         event : Event
             Button press event
         """
-        self.h.client.publish("/singlecameras/camera1/area/reset", "1")
+        self.h.client.publish(self.h.topic("area/reset"), "1")
+        if self.h.roi_source == "frame":
+            self.h.area.handle_mqtt("none")
+            self.h.figure.update_area(self.h.area)
 
     def info_cb(self, event):
         """
@@ -132,7 +268,7 @@ class GUICallbacks():
         event : Event
             Button press event
         """
-        self.h.client.publish("/singlecameras/camera1/info_request", "1")
+        self.h.client.publish(self.h.topic("info_request"), "1")
         logger.info("Sending request to AtomS3")
 
     def apply_set(self, event):
@@ -145,7 +281,7 @@ class GUICallbacks():
             Button press event
         """
         logger.info("Sending new settings to AtomS3")
-        self.h.client.publish("/singlecameras/camera1/settings", self.h.settings.publish_form())
+        self.h.client.publish(self.h.topic("settings"), self.h.settings.publish_form())
 
     def reset_set(self, event):
         """
@@ -158,7 +294,7 @@ class GUICallbacks():
         """
         logger.info("Sending default settings to AtomS3")
         self.h.settings.default()
-        self.h.client.publish("/singlecameras/camera1/settings", self.h.settings.publish_form())
+        self.h.client.publish(self.h.topic("settings"), self.h.settings.publish_form())
 
     # callbacks for textboxes on control panel
     def set_shift(self, expression):
@@ -234,17 +370,21 @@ class MQTTCallbacks():
 
     Parameters
     ----------
-    handler : thermocam.handler.ThermoHandler
+    handler : thermocam.core.CameraCore or thermocam.registry.CameraRegistry
+    capture : thermocam.capture.CaptureWriter, optional
+        if given, every received message is also written to the capture file,
+        default is None
     """
-    def __init__(self, handler):
+    def __init__(self, handler, capture=None):
         self.h = handler
+        self.capture = capture
 
     def on_connect(self, client, userdata, flags, reason_code, properties):
         """
         Callback executed when the MQTT client successfully connects to the broker
 
         Upon connection, this function subscribes to the topic(s) defined by
-        `MQTT_PATH`. Subscribing inside the connection callback ensures that
+        the `mqtt_path` of the handler. Subscribing inside the connection callback ensures that
         subscriptions are not lost if the client disconnects and reconnects
 
         Parameters
@@ -257,11 +397,14 @@ class MQTTCallbacks():
         """
 
         logger.info(f"Connected with result code {reason_code}")
-        client.subscribe(MQTT_PATH)
+        client.subscribe(self.h.mqtt_path)
 
     def on_message(self, client, userdata, msg):
         """
         Callback executed when the MQTT client receives a message
+
+        If the handler has a queue, the message is only enqueued (it is processed
+        later by the GUI thread), otherwise it is processed immediately.
     
         Parameters
         ----------
@@ -269,4 +412,9 @@ class MQTTCallbacks():
         userdata : any
         msg : paho.mqtt.client.MQTTMessage
         """
-        self.h.handle_message(msg)
+        if self.capture is not None:
+            self.capture.write(msg)
+        if self.h.queue is not None:
+            self.h.queue.put(msg)
+        else:
+            self.h.handle_message(msg)
@@ -0,0 +1,166 @@
+"""
+Define the capture of the received MQTT messages to file, and their replay.
+
+A capture file starts with a short header, followed by one record per message:
+receive time (float64, seconds since epoch), topic length (uint16), payload
+length (uint32), topic and payload. A capture can be fed back to a handler without
+any network, at real time, at N times the real speed or as fast as possible.
+"""
+
+import struct
+import time
+from loguru import logger
+
+MAGIC = b"THCAP01\n"
+_RECORD = struct.Struct("<dHI")
+
+
+class CapturedMessage:
+    """
+    Message read from a capture file, with the same attributes of a received
+    MQTT message that are used by the handlers
+
+    Parameters
+    ----------
+    topic : str
+    payload : bytes
+    received : float
+        receive time, in seconds since epoch, stored as time
+    """
+
+    __slots__ = ("topic", "payload", "time")
+
+    def __init__(self, topic, payload, received):
+        self.topic = topic
+        self.payload = payload
+        self.time = received
+
+
+class CaptureWriter:
+    """
+    Writer of the received messages to a capture file
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        capture file, it is overwritten if it exists
+
+    Attributes
+    ----------
+    count : int
+        number of written messages
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        logger.info(f"Capturing messages to {path}")
+
+    def write(self, msg, t=None):
+        """
+        Write a message to the capture
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+            received MQTT message
+        t : float, optional
+            receive time in seconds since epoch, default is now
+        """
+        topic = msg.topic.encode()
+        self._file.write(_RECORD.pack(time.time() if t is None else t, len(topic),
+                                      len(msg.payload)))
+        self._file.write(topic)
+        self._file.write(msg.payload)
+        self.count += 1
+
+    def close(self):
+        """Close the capture file
+        """
+        if not self._file.closed:
+            self._file.close()
+            logger.info(f"Captured {self.count} messages to {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_capture(path):
+    """
+    Read the messages of a capture file, in the order they were received.
+    A truncated last record (e.g. capture interrupted) triggers a warning.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+
+    Yields
+    ------
+    CapturedMessage
+
+    Raises
+    ------
+    ValueError
+        if the file is not a capture file
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a capture file")
+        while True:
+            header = f.read(_RECORD.size)
+            if not header:
+                return
+            if len(header) < _RECORD.size:
+                break
+            t, topic_len, payload_len = _RECORD.unpack(header)
+            topic = f.read(topic_len)
+            payload = f.read(payload_len)
+            if len(topic) < topic_len or len(payload) < payload_len:
+                break
+            yield CapturedMessage(topic.decode(), payload, t)
+    logger.warning(f"Capture {path} is truncated")
+
+
+def replay(path, handler, speed=1.):
+    """
+    Feed the messages of a capture file to a handler, as they were received
+
+    Messages are delivered like the MQTT callback does: put in the queue of the
+    handler, if it has one, otherwise processed immediately. The handler stamps
+    them with the time they are replayed.
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        capture file
+    handler : thermocam.core.CameraCore or thermocam.registry.CameraRegistry
+    speed : float or None, optional
+        replay speed relative to the capture (e.g. 10 is ten times faster),
+        if None messages are delivered as fast as possible. Default is 1 (real time)
+
+    Returns
+    -------
+    dict
+        number of delivered messages, elapsed time in seconds and rate in messages/s
+    """
+    deliver = handler.queue.put if handler.queue is not None else handler.handle_message
+    start = time.perf_counter()
+    first = None
+    count = 0
+    for msg in read_capture(path):
+        if speed:
+            if first is None:
+                first = msg.time
+            wait = (msg.time - first)/speed - (time.perf_counter() - start)
+            if wait > 0:
+                time.sleep(wait)
+        deliver(msg)
+        count += 1
+    elapsed = time.perf_counter() - start
+    return {"messages": count, "seconds": elapsed,
+            "rate": count/elapsed if elapsed > 0 else float("nan")}
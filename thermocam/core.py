@@ -0,0 +1,505 @@
+"""Define the GUI-free state of a single camera: received frames, ROIs, output files
+and video
+"""
+
+from datetime import datetime, timedelta
+import json
+import time
+from loguru import logger
+
+from thermocam import THERMOCAM_DATA
+from thermocam.archive import FrameArchive
+from thermocam.frame import FrameError, decode_frame
+from thermocam.health import IngestHealth
+from thermocam.output import OutputWriter
+from thermocam.pixelstats import PixelStats
+from thermocam.protocol import parse_settings
+from thermocam.routing import TopicRouter
+from thermocam.videomaker import VideoMaker
+from thermocam.roi import AreaSet, InterestingArea, InterestingPixels, MaskSet
+from thermocam.timing import Timing
+
+
+class CameraCore():
+    """Per-camera message processing and output data, without GUI.
+
+    Decodes the frames, keeps track of the pixels and area defined on the device
+    and of their data, and writes the output files. Received messages are
+    dispatched by a routing table (see TopicRouter); subclasses can extend the
+    route handlers to also update a GUI.
+
+    Parameters
+    ----------
+    camera_id : str, optional
+        Identifier of the camera in the MQTT topics, default is "camera1"
+    save : bool, optional
+        If True, pixel and area data received from the device are written to
+        timestamped text files, default is True
+    max_dead_time : timedelta, optional
+        Minimum delay without frames before the device is considered offline,
+        it is longer at low frame rates (see IngestHealth). Dafault is 2 s
+    archive : bool, optional
+        If True, all the received frames are stored in a FrameArchive, default is False
+    writer_options : dict, optional
+        Keyword arguments of the OutputWriter of the text files (flush interval,
+        rotation, compression), default is None (default options)
+    roi_source : {"device", "frame"}, optional
+        Source of the pixels and area data: "device" uses the data published by
+        the device, "frame" computes it from each received frame (the device data
+        is then ignored). Default is "device"
+    areas_file : str or pathlib.Path, optional
+        File with the named areas to load in the AreaSet (see AreaSet.load),
+        default is None
+    masks_file : str or pathlib.Path, optional
+        .npz file with the regions to load in the MaskSet (see MaskSet.load),
+        default is None
+    timing : Timing, optional
+        Instrumentation of the processing stages, default is None (a disabled
+        Timing is created)
+    stats_threshold : float, optional
+        Temperature above which the time of each pixel is counted in the session
+        statistics, default is None (not counted)
+    series_capacity : int, optional
+        Maximum number of retained samples of each pixel, area, named area and
+        mask region, default is 10000
+    series_window : float, optional
+        Maximum age in seconds of the retained samples, default is None (only
+        the capacity applies)
+
+    Attributes
+    ----------
+    camera_id : str
+        Identifier of the camera in the MQTT topics.
+    client : paho.mqtt.client.Client or None
+        MQTT client instance (must be assigned externally).
+    mqtt_path : str
+        Topic filter to subscribe to in order to receive the camera messages.
+    start_time : datetime
+        Time when the handler was created, used to timestamp incoming data.
+    last_received : datetime
+        Timestamp of the last received image frame.
+    health : IngestHealth
+        Effective frame rate, jitter and gaps of the received frames, and
+        publishing results reported by the device.
+    frame : ThermalFrame or None
+        Last decoded thermal frame.
+    frames : int
+        Number of valid frames received.
+    stats : PixelStats
+        Per-pixel statistics of the received frames, saved to a .npz file in
+        "thermocam.THERMOCAM_DATA" when the files are closed (if saving is enabled).
+    current_settings : dict or None
+        Last settings published by the device.
+    device_temps : dict or None
+        Last maximum, minimum and average frame temperatures published by the device.
+    area : InterestingArea
+        Object for handling selected rectangular ROI.
+    single_pixels : InterestingPixels
+        Object for handling selected individual pixels.
+    areas : AreaSet
+        Named areas defined on the client, their data is computed from the frames.
+    masks : MaskSet
+        Regions of arbitrary shape defined on the client, their data is computed
+        from the frames.
+    video : VideoMaker
+        Video recording manager.
+    router : TopicRouter
+        Routing table that dispatches the received messages, more routes can be
+        added with router.add_route.
+    f_pix, f_area : OutputWriter or None
+        Output files for data, if saving is enabled.
+    f_areas, f_masks : OutputWriter or None
+        Output files for the data of the named areas and of the mask regions,
+        opened when they are first written.
+    archive : FrameArchive or None
+        Archive of the raw frames, if enabled.
+    roi_source : str
+        Source of the pixels and area data, "device" or "frame".
+    queue : None
+        Messages are processed as soon as they are received.
+    timing : Timing
+        Duration of the processing stages of the received messages: "queue"
+        (from arrival to start of processing), "handle" (processing), "total"
+        (from arrival to end of processing), "decode", "stats", "archive", "roi"
+        and "video". Disabled by default.
+    """
+
+    def __init__(self, camera_id="camera1", save=True, max_dead_time=timedelta(seconds=2),
+                 archive=False, writer_options=None, roi_source="device",
+                 areas_file=None, masks_file=None, timing=None,
+                 stats_threshold=None, series_capacity=10000, series_window=None):
+        if roi_source not in ("device", "frame"):
+            raise ValueError(f"Unknown ROI source {roi_source}")
+        self.camera_id = camera_id
+        self.client = None
+        self.mqtt_path = f"/singlecameras/{camera_id}/#"
+        self.queue = None
+
+        self.start_time = datetime.now()
+        self.max_dead_time = max_dead_time
+        # gets updated with new image
+        self.last_received = datetime.now()-timedelta(seconds=10)
+        self.health = IngestHealth(max_dead_time.total_seconds())
+        self.frame = None
+        self.frames = 0     # counter for how many valid frames have been received
+        self.stats = PixelStats(stats_threshold)
+        self.current_settings = None
+        self.device_temps = None
+        self.area = InterestingArea(series_capacity, series_window)
+        self.single_pixels = InterestingPixels(series_capacity, series_window)
+        self.areas = AreaSet(series_capacity, series_window)
+        if areas_file is not None:
+            self.areas.load(areas_file)
+        self.masks = MaskSet(series_capacity, series_window)
+        if masks_file is not None:
+            self.masks.load(masks_file)
+        self.video = VideoMaker(prefix=camera_id)
+        self.roi_source = roi_source
+        self.timing = timing if timing is not None else Timing(name=camera_id)
+
+        self.router = TopicRouter(camera_id)
+        self._register_routes()
+
+        self.archive = FrameArchive(camera_id) if archive else None
+
+        # stuff for saving files
+        self.save = save
+        self.f_pix = None
+        self.f_area = None
+        self.f_areas = None
+        self.f_masks = None
+        self.writer_options = writer_options or {}
+
+        if save:
+            self.f_pix = OutputWriter(f"pix_{camera_id}", **self.writer_options)
+            self.f_area = OutputWriter(f"area_{camera_id}", **self.writer_options)
+
+    def topic(self, suffix):
+        """Return the full topic of the camera for a suffix
+
+        Parameters
+        ----------
+        suffix : str
+            e.g. "pixels/coord"
+
+        Returns
+        -------
+        str
+            e.g. "/singlecameras/camera1/pixels/coord"
+        """
+        return self.router.prefix + suffix
+
+    def is_online(self):
+        """Return whether a frame has been received within the dead time of the
+        configured frame rate (see IngestHealth)
+
+        Returns
+        -------
+        bool
+        """
+        return self.health.is_online()
+
+    # MQTT CALLBACK
+    def handle_message(self, msg):
+        """Process incoming MQTT messages from the AtomS3
+
+        The message is dispatched to the handler registered for its topic in the
+        routing table (see TopicRouter). By default, according to the topic, it:
+        - decodes the thermal image
+        - updates pixels and area selection
+        - updates the pixels and area data and writes them to the output files
+        - stores the current settings of the thermal camera
+        - stores the frame temperatures computed by the device
+
+        If the timing is enabled, the time spent waiting (from the arrival time
+        stamped on the message by the MQTT client, if any) and processing is recorded.
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+            received MQTT message
+        """
+        # if the received message is empty, ignore it
+        if not msg.payload:
+            logger.warning(f"Received empty message on topic {msg.topic}")
+            return
+
+        if not self.timing.enabled:
+            self.router.dispatch(msg)
+            return
+        start = time.monotonic()
+        arrival = getattr(msg, "timestamp", None)
+        self.router.dispatch(msg)
+        end = time.monotonic()
+        self.timing.record("handle", end - start)
+        if arrival is not None:
+            self.timing.record("queue", start - arrival)
+            self.timing.record("total", end - arrival)
+
+    def _register_routes(self):
+        """Add the default routes to the routing table
+        """
+        self.router.add_route("image", self._on_image)
+        self.router.add_route("settings/current", self._on_settings)
+        self.router.add_route("pixels/current", self._on_pixels_current)
+        self.router.add_route("pixels/data", self._on_pixels_data)
+        self.router.add_route("area/current", self._on_area_current)
+        self.router.add_route("area/data", self._on_area_data)
+        self.router.add_route("temps", self._on_temps)
+        self.router.add_route("check", self._on_check)
+
+    def _on_settings(self, msg):
+        """Store the current camera settings
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+
+        Returns
+        -------
+        bool
+            True if the settings have a valid format
+        """
+        logger.info(f"Received {self.camera_id} settings")
+        logger.debug(msg.payload)
+        try:
+            self.current_settings = parse_settings(msg.payload)
+            self.health.set_rate(self.current_settings["rate"])
+            return True
+        except (ValueError, KeyError):
+            logger.warning(f"Received settings have invalid format: {msg.payload}")
+            return False
+
+    def _on_image(self, msg):
+        """Decode the received thermal image, add it to the statistics and process it
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+
+        Returns
+        -------
+        bool
+            True if the image is valid
+        """
+        self.last_received = datetime.now()
+        # images replaced by this one in the ingest queue arrived anyway
+        for t in getattr(msg, "arrivals", ()):
+            self.health.frame(t)
+        # the payload is decoded once and the frame is shared by everything else
+        try:
+            with self.timing.stage("decode"):
+                self.frame = decode_frame(msg.payload, self.last_received)
+        except FrameError as e:
+            logger.warning(f"Received invalid image: {e}")
+            return False
+        # the arrival time stamped by the MQTT client is not delayed by the queue
+        self.health.frame(getattr(msg, "timestamp", None))
+        self.frames += 1
+        # before processing, so that the displayed statistics include the frame
+        with self.timing.stage("stats"):
+            self.stats.update(self.frame)
+        self.process_frame(self.frame)
+        return True
+
+    def process_frame(self, frame):
+        """Use a newly decoded frame: by default it is archived (if enabled),
+        used for the pixels and area data (if their source is "frame") and for the
+        data of the named areas and mask regions, and added to the video (if filming)
+
+        Parameters
+        ----------
+        frame : ThermalFrame
+        """
+        if self.archive is not None:
+            with self.timing.stage("archive"):
+                self.archive.append(frame)
+        with self.timing.stage("roi"):
+            if self.roi_source == "frame":
+                self._roi_from_frame(frame)
+            if len(self.areas):
+                self._areas_from_frame(frame)
+            if len(self.masks):
+                self._masks_from_frame(frame)
+        with self.timing.stage("video"):
+            self.record(frame)
+
+    def _roi_from_frame(self, frame, ax_pixels=None, ax_area=None):
+        """Compute the pixels and area data from a frame and write it to file
+
+        Parameters
+        ----------
+        frame : ThermalFrame
+        ax_pixels, ax_area : matplotlib.axes.Axes, optional
+            Axes on which pixel and area data are drawn, if any
+        """
+        if len(self.single_pixels.p):
+            self.single_pixels.update_from_frame(frame, ax_pixels, self.start_time)
+            if self.save and self.f_pix:
+                self.f_pix.write(f"{frame.time},{self.single_pixels.out_data()}\n")
+        if self.area.defined():
+            self.area.update_from_frame(frame, ax_area, self.start_time)
+            if self.save and self.f_area:
+                self.f_area.write(f"{frame.time}, {self.area.out_data()}\n")
+
+    def _areas_from_frame(self, frame, ax=None):
+        """Compute the data of the named areas from a frame and write it to file
+
+        Parameters
+        ----------
+        frame : ThermalFrame
+        ax : matplotlib.axes.Axes, optional
+            Axes on which the areas data is drawn, if any
+        """
+        self.areas.update_from_frame(frame, ax, self.start_time)
+        if self.save:
+            if self.f_areas is None:
+                self.f_areas = OutputWriter(f"areas_{self.camera_id}", **self.writer_options)
+            self.f_areas.write(f"{frame.time},{self.areas.out_data()}\n")
+
+    def _masks_from_frame(self, frame, ax=None):
+        """Compute the data of the mask regions from a frame and write it to file
+
+        Parameters
+        ----------
+        frame : ThermalFrame
+        ax : matplotlib.axes.Axes, optional
+            Axes on which the regions data is drawn, if any
+        """
+        self.masks.update_from_frame(frame, ax, self.start_time)
+        if self.save:
+            if self.f_masks is None:
+                self.f_masks = OutputWriter(f"masks_{self.camera_id}", **self.writer_options)
+            self.f_masks.write(f"{frame.time},{self.masks.out_data()}\n")
+
+    def record(self, frame):
+        """Add the frame to the video if filming, else do nothing
+
+        Parameters
+        ----------
+        frame : ThermalFrame
+        """
+        self.video.add_thermal(frame)
+
+    def _on_pixels_current(self, msg):
+        """Get pixels the camera is already looking at
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+        """
+        self.single_pixels.handle_mqtt(msg.payload.decode())
+
+    def _on_pixels_data(self, msg, ax=None):
+        """Update the pixels data and write it to file
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+        ax : matplotlib.axes.Axes, optional
+            Axes on which pixel data is drawn, if any
+        """
+        if self.roi_source == "frame":
+            return
+        self.single_pixels.update_data(msg.payload.decode(), ax, self.start_time)
+
+        if self.save and self.f_pix:
+            self.f_pix.write(f"{datetime.now()},{self.single_pixels.out_data()}\n")
+
+    def _on_area_current(self, msg):
+        """Get area the camera is already looking at
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+        """
+        self.area.handle_mqtt(msg.payload.decode())
+
+    def _on_area_data(self, msg, ax=None):
+        """Update the area data and write it to file
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+        ax : matplotlib.axes.Axes, optional
+            Axes on which area data is drawn, if any
+        """
+        if self.roi_source == "frame":
+            return
+        self.area.update_data(msg.payload.decode(), ax, self.start_time)
+        # NOTE: if current area (persistent message) is not received it does not work
+        if self.area.defined(): # TODO: ugly
+            if self.save and self.f_area:
+                self.f_area.write(f"{datetime.now()}, {self.area.out_data()}\n")
+        else:
+            logger.info("No current area...")
+
+    def _on_temps(self, msg):
+        """Store the maximum, minimum and average frame temperatures computed by the device
+
+        They are received as {"tmax":30.50,"tmin":20.10,"tavg":25.00}
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+        """
+        try:
+            self.device_temps = json.loads(msg.payload)
+        except ValueError:
+            logger.warning(f"Received temperatures have invalid format: {msg.payload}")
+
+    def _on_check(self, msg):
+        """Count the result of the publishing of the last image, reported by the
+        device as "ok" or "ko"
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+        """
+        if not self.health.check(msg.payload):
+            logger.warning(f"Received check has invalid format: {msg.payload}")
+
+    def flush_files(self):
+        """Write to file the buffered data older than the flush interval, and log
+        the timing summary if it is due
+
+        This method is meant to be periodically executed by a timer
+        """
+        self.timing.tick()
+        if self.f_pix:
+            self.f_pix.tick()
+        if self.f_area:
+            self.f_area.tick()
+        if self.f_areas:
+            self.f_areas.tick()
+        if self.f_masks:
+            self.f_masks.tick()
+
+    def close_files(self):
+        """ Close pixel and area output files if they were opened, and the frame archive.
+        If saving is enabled, the statistics of the received frames are saved.
+        """
+        if self.f_pix:
+            self.f_pix.close()
+        if self.f_area:
+            self.f_area.close()
+        if self.f_areas:
+            self.f_areas.close()
+        if self.f_masks:
+            self.f_masks.close()
+        if self.archive is not None:
+            self.archive.close()
+        if self.save and self.stats.count:
+            self.save_stats()
+
+    def save_stats(self, directory=THERMOCAM_DATA):
+        """Save the statistics of the received frames to a timestamped .npz file
+
+        Parameters
+        ----------
+        directory : pathlib.Path, optional
+            default is "thermocam.THERMOCAM_DATA"
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        start = self.start_time.strftime("%Y%m%d_%H%M%S")
+        self.stats.save(directory / f"stats_{self.camera_id}_{start}.npz")
@@ -0,0 +1,204 @@
+"""
+Define the push of the same settings to a fleet of cameras over one MQTT
+connection, with tracking of their acknowledgement.
+
+After receiving new settings the AtomS3 restarts and publishes its current
+settings (retained) on "settings/current": a camera has applied the settings
+when it publishes, after the push, current settings that match them. Cameras
+that do not confirm within the timeout get the settings again, waiting longer
+at each attempt.
+"""
+
+import fnmatch
+import threading
+import time
+from loguru import logger
+
+from thermocam.protocol import parse_settings
+
+CURRENT_ALL = "/singlecameras/+/settings/current"
+
+
+def camera_topic(camera_id, suffix):
+    """Return the full topic of a camera for a suffix, e.g. "settings"
+    """
+    return f"/singlecameras/{camera_id}/{suffix}"
+
+
+def discover(client, patterns, wait=2.):
+    """
+    Find the cameras whose identifier matches some glob patterns, among the ones
+    that published their current settings (retained by the broker)
+
+    Parameters
+    ----------
+    client : paho.mqtt.client.Client
+        connected client, with its network loop running
+    patterns : list of str
+        e.g. ["lab*", "camera[12]"]
+    wait : float, optional
+        time in seconds to collect the retained messages, default is 2 s
+
+    Returns
+    -------
+    list of str
+        sorted identifiers of the matching cameras
+    """
+    found = set()
+
+    def on_current(_client, _userdata, msg):
+        found.add(msg.topic.split("/")[2])
+
+    client.message_callback_add(CURRENT_ALL, on_current)
+    client.subscribe(CURRENT_ALL)
+    time.sleep(wait)
+    client.unsubscribe(CURRENT_ALL)
+    client.message_callback_remove(CURRENT_ALL)
+    return sorted(cam for cam in found if any(fnmatch.fnmatchcase(cam, p) for p in patterns))
+
+
+class FleetPush:
+    """
+    Push of settings to many cameras at once, waiting for their confirmation
+
+    Parameters
+    ----------
+    client : paho.mqtt.client.Client
+        connected client, with its network loop running; all the cameras are
+        reached through it
+    settings : thermocam.protocol.CameraSettings
+        settings to apply
+    timeout : float, optional
+        time in seconds to wait for the confirmation of the first attempt,
+        default is 20 s
+    retries : int, optional
+        number of times the settings are sent again to the cameras that did not
+        confirm, default is 2
+    backoff : float, optional
+        factor by which the timeout grows at each retry, default is 2
+
+    Attributes
+    ----------
+    results : dict
+        maps the camera identifiers to their result (see run)
+    """
+
+    def __init__(self, client, settings, timeout=20., retries=2, backoff=2.):
+        self.client = client
+        self.settings = settings
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.results = {}
+        self._cond = threading.Condition()
+
+    def _on_current(self, _client, _userdata, msg):
+        """Record the current settings published by a camera (MQTT network thread)
+        """
+        # retained settings, sent by the broker on subscription, are older than the push
+        if getattr(msg, "retain", False):
+            return
+        cam = msg.topic.split("/")[2]
+        now = time.monotonic()
+        with self._cond:
+            result = self.results.get(cam)
+            if result is None or result["applied"] or result["sent"] is None:
+                return
+            try:
+                current = parse_settings(msg.payload)
+            except (ValueError, KeyError):
+                logger.warning(f"Received {cam} settings have invalid format: {msg.payload}")
+                return
+            result["current"] = current
+            if self.settings.matches(current):
+                result["applied"] = True
+                result["seconds"] = now - result["start"]
+                self._cond.notify_all()
+            else:
+                logger.debug(f"{cam} published different settings: {current}")
+
+    def _send(self, cams):
+        """Publish the settings to some cameras
+        """
+        payload = self.settings.publish_form()
+        now = time.monotonic()
+        with self._cond:
+            for cam in cams:
+                result = self.results[cam]
+                result["sent"] = now
+                result["attempts"] += 1
+                if result["start"] is None:
+                    result["start"] = now
+        for cam in cams:
+            self.client.publish(camera_topic(cam, "settings"), payload)
+
+    def run(self, camera_ids):
+        """
+        Push the settings to the cameras and wait until all of them confirmed or
+        the last attempt timed out
+
+        Parameters
+        ----------
+        camera_ids : list of str
+
+        Returns
+        -------
+        dict
+            maps each camera identifier to a dict with "applied" (bool),
+            "attempts", "seconds" (time from the first push to the confirmation,
+            None if not applied) and "current" (last current settings received
+            after the push, None if none)
+        """
+        self.results = {cam: {"applied": False, "attempts": 0, "seconds": None,
+                              "current": None, "start": None, "sent": None}
+                        for cam in camera_ids}
+        self.client.message_callback_add(CURRENT_ALL, self._on_current)
+        self.client.subscribe(CURRENT_ALL)
+        try:
+            timeout = self.timeout
+            pending = list(camera_ids)
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    logger.info(f"Sending the settings again to {', '.join(pending)}")
+                self._send(pending)
+                deadline = time.monotonic() + timeout
+                with self._cond:
+                    while pending:
+                        pending = [c for c in pending if not self.results[c]["applied"]]
+                        left = deadline - time.monotonic()
+                        if not pending or left <= 0:
+                            break
+                        self._cond.wait(left)
+                if not pending:
+                    break
+                timeout *= self.backoff
+        finally:
+            self.client.unsubscribe(CURRENT_ALL)
+            self.client.message_callback_remove(CURRENT_ALL)
+        return {cam: {k: r[k] for k in ("applied", "attempts", "seconds", "current")}
+                for cam, r in self.results.items()}
+
+
+def summary(results):
+    """
+    Return the per-camera summary of a push, one line per camera
+
+    Parameters
+    ----------
+    results : dict
+        as returned by FleetPush.run
+
+    Returns
+    -------
+    list of str
+    """
+    width = max((len(cam) for cam in results), default=0)
+    lines = []
+    for cam, r in results.items():
+        if r["applied"]:
+            lines.append(f"{cam:{width}s}  applied in {r['seconds']:6.1f} s  "
+                         f"({r['attempts']} attempt{'s' if r['attempts'] > 1 else ''})")
+        else:
+            got = "no answer" if r["current"] is None else f"current {r['current']}"
+            lines.append(f"{cam:{width}s}  NOT applied after {r['attempts']} attempts, {got}")
+    return lines
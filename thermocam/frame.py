@@ -0,0 +1,225 @@
+"""
+Define the thermal frame object and the decoder for the image payloads published
+by the AtomS3.
+
+The AtomS3 publishes each frame as the raw memory of its 768 float32 temperatures
+(little-endian, 24 rows of 32 values). The payload is decoded in a single step
+with numpy.frombuffer, without creating intermediate Python objects, and the
+resulting frame is shared by the display, the video recorder and the ROI code so
+that each message is decoded exactly once.
+
+To save bandwidth, frames can also be published in more compact encodings, which
+are recognized by the payload size or by their first (header) byte:
+
+- "float32": 3072 bytes, raw float32 temperatures (the default of the firmware)
+- "float16": 1536 bytes, raw float16 temperatures
+- "centi": b"C" followed by the temperatures in hundredths of degree, as 768
+  int16 (1537 bytes)
+- "deflate": b"Z" followed by the deflate (zlib) compressed differences between
+  consecutive temperatures, in hundredths of degree, as int16. If compression
+  does not make the payload smaller than the float16 one, it falls back to "centi"
+
+The differences are taken along the frame, not with the previous frame, so each
+payload can be decoded on its own even if some messages are lost.
+
+Constants
+---------
+FRAME_ROWS, FRAME_COLS : int
+    Shape of the frame as published by the sensor.
+FRAME_PIXELS : int
+    Number of pixels in a frame.
+FRAME_BYTES : int
+    Size in bytes of a float32 image payload.
+ENCODINGS : tuple of str
+    Names of the supported image encodings.
+"""
+
+from datetime import datetime
+import zlib
+import numpy as np
+
+FRAME_ROWS = 24
+FRAME_COLS = 32
+FRAME_PIXELS = FRAME_ROWS*FRAME_COLS
+FRAME_BYTES = 4*FRAME_PIXELS
+ENCODINGS = ("float32", "float16", "centi", "deflate")
+
+_DTYPE = np.dtype('<f4')
+_HALF = np.dtype('<f2')
+_CENTI = np.dtype('<i2')
+_HALF_BYTES = 2*FRAME_PIXELS
+_CENTI_HEADER = 0x43    # b"C"
+_DEFLATE_HEADER = 0x5A  # b"Z"
+
+
+class FrameError(ValueError):
+    """Raised when an image payload cannot be decoded into a valid frame
+    """
+
+
+class ThermalFrame:
+    """
+    Decoded thermal frame.
+
+    The temperatures are stored as a read-only float32 array with the shape
+    published by the sensor (24x32). The transposed view, which matches what
+    is shown on the AtomS3 display and on the GUI, is available as "image":
+    a pixel with coordinates (x, y) has temperature image[y, x].
+
+    Parameters
+    ----------
+    data : np.ndarray with shape (24, 32)
+        frame temperatures, float32
+    time : datetime, optional
+        time at which the frame was received, default is now
+
+    Attributes
+    ----------
+    data : np.ndarray with shape (24, 32)
+        read-only frame temperatures
+    time : datetime
+        time at which the frame was received
+    """
+
+    __slots__ = ("data", "time")
+
+    def __init__(self, data, time=None):
+        self.data = data
+        self.time = datetime.now() if time is None else time
+
+    @property
+    def image(self):
+        """Transposed (32x24) view of the frame, as drawn on the GUI
+        """
+        return self.data.T
+
+    def min(self):
+        """Return the minimum temperature of the frame
+        """
+        return float(self.data.min())
+
+    def max(self):
+        """Return the maximum temperature of the frame
+        """
+        return float(self.data.max())
+
+    def pixel(self, x, y):
+        """Return the temperature of the pixel with coordinates (x, y)
+
+        Parameters
+        ----------
+        x : int
+        y : int
+
+        Returns
+        -------
+        float
+        """
+        return float(self.data[x, y])
+
+
+def _from_centi(values):
+    """Return the float32 temperatures from hundredths of degree
+    """
+    return values.astype(np.float32)*np.float32(0.01)
+
+
+def decode_frame(payload, time=None):
+    """
+    Decode an image payload into a ThermalFrame.
+
+    The encoding is recognized from the payload size (float32, float16) or from
+    its header byte (centi, deflate), see the module description. Float32
+    payloads are not copied: the frame is a read-only view on their buffer.
+
+    Parameters
+    ----------
+    payload : bytes-like
+        received image payload
+    time : datetime, optional
+        time at which the frame was received, default is now
+
+    Returns
+    -------
+    ThermalFrame
+
+    Raises
+    ------
+    FrameError
+        if the payload is not in one of the supported encodings, or if the frame
+        contains NaN or Inf
+    """
+    n = len(payload)
+    if n == FRAME_BYTES:
+        data = np.frombuffer(payload, dtype=_DTYPE)
+    elif n == _HALF_BYTES:
+        data = np.frombuffer(payload, dtype=_HALF).astype(np.float32)
+    elif n == _HALF_BYTES + 1 and payload[0] == _CENTI_HEADER:
+        data = _from_centi(np.frombuffer(payload, dtype=_CENTI, offset=1))
+    elif n > 1 and payload[0] == _DEFLATE_HEADER:
+        inflater = zlib.decompressobj()
+        try:
+            # at most one byte more than a frame, to reject oversized payloads cheaply
+            deltas = inflater.decompress(memoryview(payload)[1:], _HALF_BYTES + 1)
+        except zlib.error as e:
+            raise FrameError(f"invalid compressed image: {e}") from e
+        if len(deltas) != _HALF_BYTES or not inflater.eof or inflater.unused_data:
+            raise FrameError("compressed image does not contain one frame")
+        # the int16 sum wraps around like the differences did when encoding
+        data = _from_centi(np.cumsum(np.frombuffer(deltas, dtype=_CENTI), dtype=np.int16))
+    else:
+        raise FrameError(f"image payload has {n} bytes, expected {FRAME_BYTES} or a "
+                         f"supported encoding")
+
+    data = data.reshape(FRAME_ROWS, FRAME_COLS)
+    data.flags.writeable = False
+    if not np.isfinite(data).all():
+        raise FrameError("image contains NaN or Inf values")
+
+    return ThermalFrame(data, time)
+
+
+def encode_frame(data, encoding="float32", level=6):
+    """
+    Encode the temperatures of a frame as an image payload
+
+    Parameters
+    ----------
+    data : array-like with shape (24, 32)
+        temperatures, indexed as [x, y] (as ThermalFrame.data)
+    encoding : str, optional
+        one of ENCODINGS, default is "float32" (as published by the firmware)
+    level : int, optional
+        zlib compression level of the "deflate" encoding, default is 6
+
+    Returns
+    -------
+    bytes
+
+    Raises
+    ------
+    ValueError
+        if the encoding is unknown, if the frame has the wrong shape or if the
+        temperatures cannot be represented in hundredths of degree as int16
+    """
+    data = np.asarray(data, dtype=np.float32)
+    if data.shape != (FRAME_ROWS, FRAME_COLS):
+        raise ValueError(f"frame has shape {data.shape}, expected {(FRAME_ROWS, FRAME_COLS)}")
+    if encoding == "float32":
+        return data.astype(_DTYPE).tobytes()
+    if encoding == "float16":
+        return data.astype(_HALF).tobytes()
+    if encoding not in ("centi", "deflate"):
+        raise ValueError(f"Unknown image encoding {encoding}")
+
+    centi = np.round(data.astype(np.float64)*100)
+    if not np.isfinite(centi).all() or np.abs(centi).max() > np.iinfo(np.int16).max:
+        raise ValueError("temperatures out of the range of the centi encoding")
+    centi = centi.astype(_CENTI).ravel()
+    if encoding == "deflate":
+        deltas = np.diff(centi, prepend=np.int16(0))    # int16, wraps around
+        packed = zlib.compress(deltas.astype(_CENTI).tobytes(), level)
+        # a payload as long as a float16 one would be taken for it
+        if len(packed) + 1 < _HALF_BYTES:
+            return bytes([_DEFLATE_HEADER]) + packed
+    return bytes([_CENTI_HEADER]) + centi.tobytes()
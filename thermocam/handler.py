@@ -1,23 +1,24 @@
 """Define the object that handles everything else: the MQTT callbaks, the GUI and the data
 """
 
-from datetime import datetime, timedelta
-import re
+from datetime import timedelta
 import numpy as np
-from loguru import logger
 
-from thermocam import THERMOCAM_DATA
-from thermocam.videomaker import VideoMaker
-from thermocam.roi import InterestingArea, InterestingPixels
-from thermocam.settings import ControlPanel, CameraSettings
+from thermocam.core import CameraCore
+from thermocam.frame import ThermalFrame
+from thermocam.roi import scroll
+from thermocam.ingest import IngestQueue
+from thermocam.protocol import CameraSettings
+from thermocam.settings import ControlPanel
 from thermocam.visualization import Display
 from thermocam.callbacks import GUICallbacks
 
 
-class ThermoHandler():
+class ThermoHandler(CameraCore):
     """Central handler for GUI elements, MQTT message processing, and output data.
 
-    Connects everything together
+    Connects everything together: it extends CameraCore (message processing and
+    output data of a camera) with the Display and the ControlPanel
 
     Parameters
     ----------
@@ -27,49 +28,80 @@ class ThermoHandler():
     max_dead_time : timedelta, optional
         Maximum allowed delay between frames before the device is considered
         offline, dafault is 2 s
+    blit : bool, optional
+        If True, the display uses the blit render mode (see Display), default is False
+    lut : bool, optional
+        If True, the thermal image is colored with a lookup table at its size on
+        the screen (see Display), default is False
+    smooth : bool, optional
+        With lut, upsample the thermal image with bilinear interpolation, default
+        is False
+    queue_size : int, optional
+        Size of the queue between the MQTT network thread and the GUI thread (see
+        IngestQueue). If 0, messages are processed directly on the network thread.
+        Default is 256
+    drain_interval : int, optional
+        Interval in ms between two checks of the queue, default is 50 ms
+    camera_id : str, optional
+        Identifier of the camera in the MQTT topics, default is "camera1"
+    archive : bool, optional
+        If True, all the received frames are stored in a FrameArchive, default is False
+    writer_options : dict, optional
+        Keyword arguments of the OutputWriter of the text files, default is None
+    roi_source : {"device", "frame"}, optional
+        Source of the pixels and area data, default is "device"
+    areas_file : str or pathlib.Path, optional
+        File with the named areas to load, default is None
+    masks_file : str or pathlib.Path, optional
+        .npz file with the mask regions to load, default is None
+    timing : thermocam.timing.Timing, optional
+        Instrumentation of the processing stages, default is None (disabled)
+    stats_threshold : float, optional
+        Temperature above which the time of each pixel is counted in the session
+        statistics, default is None (not counted)
+    series_capacity : int, optional
+        Maximum number of retained samples of each series, default is 10000
+    series_window : float, optional
+        Maximum age in seconds of the retained samples, default is None
 
     Attributes
         ----------
-        client : paho.mqtt.client.Client or None
-            MQTT client instance (must be assigned externally).
-        start_time : datetime
-            Time when the handler was created, used to timestamp incoming data.
-        last_received : datetime
-            Timestamp of the last received image frame.
         clicks : np.ndarray
             Stores pairs of (x, y) coordinates used to define selected area.
         figure : Display
             GUI display and plotting manager.
         panel : ControlPanel
             Interactive settings panel.
-        video : VideoMaker
-            Video recording manager.
         settings : CameraSettings
             Stores user-selected camera configuration.
-        area : InterestingArea
-            Object for handling selected rectangular ROI.
-        single_pixels : InterestingPixels
-            Object for handling selected individual pixels.
-        f_pix, f_area : file or None
-            Output files for data, if saving is enabled.
+        queue : IngestQueue or None
+            Queue of received messages waiting to be processed.
+
+    See CameraCore for the other attributes.
     """
 
-    def __init__(self, save=True,max_dead_time = timedelta(seconds=2)):
-        self.client = None
+    def __init__(self, save=True,max_dead_time = timedelta(seconds=2), blit=False,
+                 queue_size=256, drain_interval=50, camera_id="camera1", archive=False,
+                 writer_options=None, roi_source="device", areas_file=None, masks_file=None,
+                 timing=None, stats_threshold=None, series_capacity=10000,
+                 series_window=None, lut=False, smooth=False):
+        super().__init__(camera_id=camera_id, save=save, max_dead_time=max_dead_time,
+                         archive=archive, writer_options=writer_options,
+                         roi_source=roi_source, areas_file=areas_file,
+                         masks_file=masks_file, timing=timing,
+                         stats_threshold=stats_threshold,
+                         series_capacity=series_capacity, series_window=series_window)
 
-        self.start_time = datetime.now()
-        self.max_dead_time = max_dead_time
-        self.last_received = datetime.now()-timedelta(seconds=10)
         self.clicks = np.empty((0, 2), dtype=int)    # array for mouse clicks to define area
-        self.figure = Display()
+        self.figure = Display(blit=blit, lut=lut, smooth=smooth)
+        self.figure.update_areas(self.areas)
+        self.figure.update_masks(self.masks)
         self.panel = ControlPanel()
-        self.video = VideoMaker()
         self.settings = CameraSettings()
-        self.area = InterestingArea()
-        self.single_pixels = InterestingPixels()
 
         cb = GUICallbacks(self)
         self.figure.canvas.mpl_connect("button_press_event", cb.on_click)
+        self.figure.canvas.mpl_connect("key_press_event", cb.on_key)
         self.figure.video_button.on_clicked(cb.video_button_cb)
         self.panel.reset_pixels.on_clicked(cb.reset_px_cb)
         self.panel.reset_area.on_clicked(cb.reset_a_cb)
@@ -83,126 +115,192 @@ class ThermoHandler():
         self.panel.mode_selector.on_clicked(cb.mode_changed)
         self.panel.rate_selector.on_clicked(cb.set_rate)
 
-        # gets updated with new image
-        self.last_received = datetime.now() - timedelta(seconds=10)
-
         self.canvas = self.panel.fig.canvas
         self.timer = self.figure.canvas.new_timer(interval=500)  # 500 ms
         self.timer.add_callback(self.update_status)             # callback
         self.timer.start()
 
-        # stuff for saving files
-        self.save = save
-        self.f_pix = None
-        self.f_area = None
+        # messages received by the network thread are processed by the GUI thread
+        if queue_size:
+            self.queue = IngestQueue(queue_size)
+            self.drain_timer = self.figure.canvas.new_timer(interval=drain_interval)
+            self.drain_timer.add_callback(self.process_queue)
+            self.drain_timer.start()
 
-        if save:
-            curr_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-            self.f_pix = open(THERMOCAM_DATA / f"pix_{curr_time}.txt", 'w', encoding="utf-8")
-            self.f_area = open(THERMOCAM_DATA / f"area_{curr_time}.txt", 'w', encoding="utf-8")
-     
+    def _on_settings(self, msg):
+        """Display the current camera settings on the control panel
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+        """
+        if not super()._on_settings(msg):
+            return
+        current_set = self.current_settings
+        self.panel.rate.set_text(current_set["rate"])
+        self.panel.shift.set_text(current_set["shift"])
+        self.panel.emissivity.set_text(current_set["emissivity"])
+        if current_set["mode"] == 0:
+            self.panel.mode.set_text("Chess")
+        else:
+            self.panel.mode.set_text("  TV")
+        self.panel.fig.canvas.draw()
 
+    def process_frame(self, frame):
+        """Plot the received thermal image and, if video button is clicked, add
+        frame to video
 
-    # MQTT CALLBACK
-    def handle_message(self, msg):
-        """Process incoming MQTT messages from the AtomS3
+        Parameters
+        ----------
+        frame : thermocam.frame.ThermalFrame
+        """
+        with self.timing.stage("display"):
+            self.show_frame(frame)
+        super().process_frame(frame)
 
-        According to the topic, it:
-        - displays the thermal image
-        - updates pixels and area selection by drawing the current ones
-        - updates the live plots of the pixels and area data
-        - records video (of the thermal image)
-        - displays current settings ot the thermal camera in the contol panel
+    def show_frame(self, frame):
+        """Draw a frame on the thermal image, or the statistics map chosen as layer
+        of the display (until the first frame is added to the statistics, the frame
+        is drawn)
 
         Parameters
         ----------
-        msg : paho.mqtt.client.MQTTMessage
-            received MQTT message
+        frame : thermocam.frame.ThermalFrame
         """
-        # if the received message is empty, ignore it
-        if not msg.payload:
-            logger.warning(f"Received empty message on topic {msg.topic}")
-
-        if msg.topic == "/singlecameras/camera1/settings/current":
-            logger.info("Received camera settings")
-            # get the current camera settings and display them on contol panel
-            # they are received as rate: 8.00 shift: 8.00 emissivity: 0.95 mode: 1
-            logger.debug(msg.payload)
-            try:
-                st_settings = msg.payload.decode()
-                pattern_set = r'(\w+):\s(\d+(?:\.\d+)?)'
-                matches_set = re.findall(pattern_set, st_settings)
-
-                # Convert to dictionary
-                current_set = {k: float(v) for k, v in matches_set}
-
-                self.panel.rate.set_text(current_set["rate"])
-                self.panel.shift.set_text(current_set["shift"])
-                self.panel.emissivity.set_text(current_set["emissivity"])
-                if current_set["mode"] == 0:
-                    self.panel.mode.set_text("Chess")
-                else:
-                    self.panel.mode.set_text("  TV")
-                self.panel.fig.canvas.draw()
-
-            except (ValueError, KeyError):
-                logger.warning(f"Received settings have invalid format: {msg.payload}")
-
-
-        # an image is recieved from the sensor: plot the image and, if video
-        # button is clicked, add frame to video
-        if msg.topic == "/singlecameras/camera1/image":
-            self.last_received = datetime.now()
-            self.figure.update_image(msg)
-            self.video.add_frame(self.figure, self.figure.img_dimensions())
+        layer = self.figure.layer
+        if layer != "live" and self.stats.count:
+            frame = ThermalFrame(self.stats.map(layer), frame.time)
+        self.figure.update_image(frame)
 
-        if msg.topic == "/singlecameras/camera1/pixels/current":
-            # get pixels the camera is already looking at
-            self.single_pixels.handle_mqtt(msg.payload.decode())
-            self.figure.update_pixels(self.single_pixels)
-
-        if msg.topic == "/singlecameras/camera1/pixels/data":
-            self.single_pixels.update_data(msg.payload.decode(),
-                                           self.figure.ax_pixels, self.start_time)
-            self.figure.pix_text.set_text(f"Number of current pixels: {len(self.single_pixels.p)}")
-
-            if self.save and self.f_pix:
-                self.f_pix.write(f"{datetime.now()},{self.single_pixels.out_data()}\n")
-
-        if msg.topic == "/singlecameras/camera1/area/current":
-            # get area the camera is already looking at
-            self.area.handle_mqtt(msg.payload.decode())
-            self.figure.update_area(self.area)
-
-        if msg.topic == "/singlecameras/camera1/area/data":
-            self.area.update_data(msg.payload.decode(), self.figure.ax_area, self.start_time)
-            # NOTE: if current area (persistent message) is not received it does not work
-            if self.area.defined(): # TODO: ugly
-                x, y, w, h = self.area.a[0][:]
-                self.figure.area_text.set_text(f"Area: ({x},{y}), w={w}, h={h}")
-                if self.save and self.f_area:
-                    self.f_area.write(f"{datetime.now()}, {self.area.out_data()}\n")
-            else:
-                logger.info("No current area...")
+    def _roi_from_frame(self, frame, ax_pixels=None, ax_area=None):
+        """Compute the pixels and area data from a frame and update their live plots
 
-    def update_status(self):
+        Parameters
+        ----------
+        frame : thermocam.frame.ThermalFrame
+        ax_pixels, ax_area : matplotlib.axes.Axes, optional
+            ignored, data is drawn on the Display
         """
-        Update the device status on the control panel.
+        super()._roi_from_frame(frame, self.figure.ax_pixels, self.figure.ax_area)
+        self.figure.pix_text.set_text(f"Number of current pixels: {len(self.single_pixels.p)}")
+        if self.area.defined():
+            x, y, w, h = self.area.a[0][:]
+            self.figure.area_text.set_text(f"Area: ({x},{y}), w={w}, h={h}")
 
-        If last image from AtomS3 has been received within max_dead_time, it
-        display ONLINE status, otherwise as OFFLINE.
+    def _areas_from_frame(self, frame, ax=None):
+        """Compute the data of the named areas and update their live plot
 
-        This method is meant to be periodically executed by a timer
+        Parameters
+        ----------
+        frame : thermocam.frame.ThermalFrame
+        ax : matplotlib.axes.Axes, optional
+            ignored, data is drawn on the area plot of the Display
+        """
+        super()._areas_from_frame(frame, self.figure.ax_area)
+        self._scroll_area()
+
+    def _masks_from_frame(self, frame, ax=None):
+        """Compute the data of the mask regions and update their live plot
+
+        Parameters
+        ----------
+        frame : thermocam.frame.ThermalFrame
+        ax : matplotlib.axes.Axes, optional
+            ignored, data is drawn on the area plot of the Display
         """
-        if datetime.now()-self.last_received<self.max_dead_time:
-            self.panel.online()
+        super()._masks_from_frame(frame, self.figure.ax_area)
+        self._scroll_area()
+
+    def _scroll_area(self):
+        """Set the limits of the area plot to show the data of the area, the named
+        areas and the mask regions that are drawn
+        """
+        series = self.areas.drawn_series() + self.masks.drawn_series()
+        if self.area.defined() and str(self.area.a) in self.area.area_data:
+            series.append(self.area.area_data[str(self.area.a)]["series"])
+        scroll(self.figure.ax_area, series)
+
+    def record(self, frame):
+        """Add the thermal image part of the figure (or, if the video source is
+        "data", the thermal frame) to the video if filming
+
+        Parameters
+        ----------
+        frame : thermocam.frame.ThermalFrame
+        """
+        if self.video.source == "data":
+            self.video.add_thermal(frame)
         else:
-            self.panel.offline()
+            self.video.add_frame(self.figure, self.figure.img_dimensions())
 
-    def close_files(self):
-        """ Close pixel and area output files if they were opened.
+    def _on_pixels_current(self, msg):
+        """Get pixels the camera is already looking at and draw them
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+        """
+        super()._on_pixels_current(msg)
+        self.figure.update_pixels(self.single_pixels)
+
+    def _on_pixels_data(self, msg, ax=None):
+        """Update the pixels live plot and write their data to file
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+        ax : matplotlib.axes.Axes, optional
+            ignored, pixel data is drawn on the Display
+        """
+        super()._on_pixels_data(msg, self.figure.ax_pixels)
+        self.figure.pix_text.set_text(f"Number of current pixels: {len(self.single_pixels.p)}")
+
+    def _on_area_current(self, msg):
+        """Get area the camera is already looking at and draw it
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+        """
+        super()._on_area_current(msg)
+        self.figure.update_area(self.area)
+
+    def _on_area_data(self, msg, ax=None):
+        """Update the area live plot and write its data to file
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+        ax : matplotlib.axes.Axes, optional
+            ignored, area data is drawn on the Display
+        """
+        super()._on_area_data(msg, self.figure.ax_area)
+        if self.area.defined():
+            x, y, w, h = self.area.a[0][:]
+            self.figure.area_text.set_text(f"Area: ({x},{y}), w={w}, h={h}")
+        if len(self.areas) or len(self.masks):
+            self._scroll_area()
+
+    def process_queue(self):
+        """Process all the messages waiting in the queue
+
+        This method is meant to be periodically executed by a timer on the GUI thread
+        """
+        for msg in self.queue.drain():
+            self.handle_message(msg)
+
+    def update_status(self):
+        """
+        Update the device status and the health of the received data on the
+        control panel.
+
+        The device is shown as ONLINE if the last image has been received within
+        the dead time of its frame rate (see IngestHealth), otherwise as OFFLINE.
+        It also writes to file the buffered data older than the flush interval
+        and, if the timing is enabled, shows the slowest processing stages.
+
+        This method is meant to be periodically executed by a timer
         """
-        if self.f_pix:
-            self.f_pix.close()
-        if self.f_area:
-            self.f_area.close()
+        self.flush_files()
+        self.panel.show_health(self.health.status())
+        self.panel.show_timing(self.timing.text(3) if self.timing.enabled else "")
@@ -0,0 +1,175 @@
+"""
+Define the monitor of the health of the data received from a camera: effective
+frame rate, inter-frame jitter and gaps compared with the rate configured on the
+device, and results of the publishing of the images reported by the device on
+the "check" topic.
+"""
+
+from collections import deque
+import time
+import numpy as np
+
+
+class IngestHealth:
+    """
+    Health of the frames received from a camera
+
+    The camera is considered offline when no frame has been received for
+    max(max_dead_time, gap_factor periods of the configured rate), so that a
+    camera configured at a low rate does not flap between online and offline.
+    An interval between two frames longer than gap_factor periods is a gap.
+
+    Parameters
+    ----------
+    max_dead_time : float, optional
+        minimum time in seconds without frames before the camera is considered
+        offline, default is 2 s
+    window : int, optional
+        number of the last frames used for the effective rate and the jitter,
+        default is 32
+    gap_factor : float, optional
+        default is 2 (at least one frame missing)
+
+    Attributes
+    ----------
+    rate : float or None
+        frame rate configured on the device (from its current settings), if known
+    frames : int
+        number of received frames
+    gaps : int
+        number of intervals between frames longer than gap_factor periods
+    missed : int
+        estimated number of frames missing in the gaps
+    ok, ko : int
+        number of images the device reported as published successfully or not
+    """
+
+    def __init__(self, max_dead_time=2., window=32, gap_factor=2.):
+        self.max_dead_time = max_dead_time
+        self.gap_factor = gap_factor
+        self.rate = None
+        self.frames = 0
+        self.gaps = 0
+        self.missed = 0
+        self.ok = 0
+        self.ko = 0
+        self._times = deque(maxlen=window)
+
+    def frame(self, t=None):
+        """
+        Record the arrival of a frame
+
+        Parameters
+        ----------
+        t : float, optional
+            arrival time (time.monotonic), default is now
+        """
+        t = time.monotonic() if t is None else t
+        if self._times and self.rate:
+            periods = (t - self._times[-1])*self.rate
+            if periods > self.gap_factor:
+                self.gaps += 1
+                self.missed += round(periods) - 1
+        self._times.append(t)
+        self.frames += 1
+
+    def set_rate(self, rate):
+        """
+        Set the frame rate configured on the device
+
+        Parameters
+        ----------
+        rate : float
+            in Hz
+        """
+        if rate != self.rate:
+            self.rate = rate
+            # intervals at the previous rate would be misleading
+            if self._times:
+                last = self._times[-1]
+                self._times.clear()
+                self._times.append(last)
+
+    def check(self, payload):
+        """
+        Record the result of the publishing of an image, as reported by the device
+
+        Parameters
+        ----------
+        payload : bytes
+            b"ok" or b"ko"
+
+        Returns
+        -------
+        bool
+            False if the payload is neither ok nor ko
+        """
+        if payload == b"ok":
+            self.ok += 1
+        elif payload == b"ko":
+            self.ko += 1
+        else:
+            return False
+        return True
+
+    def dead_time(self):
+        """Return the time in seconds without frames after which the camera is offline
+        """
+        if not self.rate:
+            return self.max_dead_time
+        return max(self.max_dead_time, self.gap_factor/self.rate)
+
+    def is_online(self, now=None):
+        """
+        Return whether a frame has been received within the dead time
+
+        Parameters
+        ----------
+        now : float, optional
+            current time (time.monotonic), default is now
+
+        Returns
+        -------
+        bool
+        """
+        if not self._times:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - self._times[-1] < self.dead_time()
+
+    def fps(self):
+        """Return the effective frame rate over the last frames, NaN if unknown
+        """
+        if len(self._times) < 2:
+            return float("nan")
+        span = self._times[-1] - self._times[0]
+        if span <= 0:
+            return float("nan")
+        return (len(self._times) - 1)/span
+
+    def jitter(self):
+        """Return the standard deviation of the intervals between the last frames
+        in seconds, NaN if unknown
+        """
+        if len(self._times) < 3:
+            return float("nan")
+        return float(np.std(np.diff(self._times)))
+
+    def status(self, now=None):
+        """
+        Return the current health
+
+        Parameters
+        ----------
+        now : float, optional
+            current time (time.monotonic), default is now
+
+        Returns
+        -------
+        dict
+            online, effective fps, configured rate, jitter (s), gaps, missed
+            frames, ok and ko
+        """
+        return {"online": self.is_online(now), "fps": self.fps(), "rate": self.rate,
+                "jitter": self.jitter(), "gaps": self.gaps, "missed": self.missed,
+                "ok": self.ok, "ko": self.ko}
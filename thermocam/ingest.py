@@ -0,0 +1,130 @@
+"""
+Define the bounded queue that decouples the MQTT network thread from the GUI thread.
+
+The network thread only enqueues the received messages, while the GUI thread
+periodically drains the queue and processes them. Image messages are coalesced
+(only the newest frame of each topic that has not been drawn yet is kept, with
+the arrival times of the ones it replaced), while all the other messages (pixel
+and area data, settings...) are processed in order.
+"""
+
+from collections import deque
+import threading
+import time
+
+
+class CoalescedImage:
+    """
+    Newest image message of a topic, with the arrival times of the older images it
+    replaced in the queue, so that they are still counted by the health monitor
+
+    The attributes of the message (topic, payload, timestamp...) are available
+    as attributes of this object.
+
+    Parameters
+    ----------
+    msg : paho.mqtt.client.MQTTMessage
+    arrivals : list of float
+        arrival times (time.monotonic) of the replaced images, oldest first
+    """
+
+    def __init__(self, msg, arrivals):
+        self.msg = msg
+        self.arrivals = arrivals
+
+    def __getattr__(self, name):
+        return getattr(self.msg, name)
+
+
+class IngestQueue:
+    """
+    Thread-safe bounded queue for received MQTT messages, with latest-frame-wins
+    semantics for images.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        maximum number of non-image messages waiting to be processed; when the
+        queue is full, the oldest message is dropped. Default is 256
+
+    Attributes
+    ----------
+    enqueued : int
+        number of messages put in the queue
+    coalesced : int
+        number of image messages replaced by a newer frame before being processed
+    dropped : int
+        number of non-image messages dropped because the queue was full
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._messages = deque()
+        self._images = {}   # topic -> newest image message not processed yet
+        self._times = {}    # topic -> arrival time of the newest image
+        self._arrivals = {} # topic -> arrival times of the images it replaced
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._messages) + len(self._images)
+
+    def put(self, msg):
+        """
+        Add a message to the queue, meant to be called from the network thread.
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+            received MQTT message
+        """
+        with self._lock:
+            self.enqueued += 1
+            if msg.topic.endswith("/image"):
+                if msg.topic in self._images:
+                    self.coalesced += 1
+                    self._arrivals.setdefault(msg.topic, []).append(self._times[msg.topic])
+                self._images[msg.topic] = msg
+                # paho stamps the messages with time.monotonic
+                self._times[msg.topic] = getattr(msg, "timestamp", None) or time.monotonic()
+            else:
+                if len(self._messages) >= self.maxsize:
+                    self._messages.popleft()
+                    self.dropped += 1
+                self._messages.append(msg)
+
+    def drain(self):
+        """
+        Remove and return all the queued messages.
+
+        Non-image messages are returned in the order they were received, followed
+        by the newest frame of each image topic (a CoalescedImage if it replaced
+        older ones).
+
+        Returns
+        -------
+        list of paho.mqtt.client.MQTTMessage or CoalescedImage
+        """
+        with self._lock:
+            messages, self._messages = self._messages, deque()
+            images, self._images = self._images, {}
+            arrivals, self._arrivals = self._arrivals, {}
+            self._times = {}
+        return [*messages, *(CoalescedImage(msg, arrivals[topic]) if topic in arrivals else msg
+                             for topic, msg in images.items())]
+
+    def stats(self):
+        """Return the queue counters
+
+        Returns
+        -------
+        dict
+            number of enqueued, coalesced and dropped messages, and current queue length
+        """
+        with self._lock:
+            return {"enqueued": self.enqueued, "coalesced": self.coalesced,
+                    "dropped": self.dropped,
+                    "queued": len(self._messages) + len(self._images)}
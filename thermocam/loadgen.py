@@ -0,0 +1,274 @@
+"""
+Define a synthetic load generator that simulates many cameras publishing at high
+rate, to find the scaling limit of the receiver.
+
+Messages are delivered either through the MQTT callbacks of the receiver, from a
+thread standing in for the network thread of the MQTT client (no broker needed),
+or published to a real broker. For every processed message the time from its
+arrival (the moment the MQTT callback is called) to the end of its processing is
+recorded.
+"""
+
+import heapq
+import threading
+import time
+import numpy as np
+from loguru import logger
+
+from thermocam import synthetic
+
+
+class FakeMessage:
+    """
+    Message delivered without broker, with the attributes of a received MQTT
+    message that are used by the handlers
+
+    Parameters
+    ----------
+    topic : str
+    payload : bytes
+
+    Attributes
+    ----------
+    timestamp : float
+        arrival time (time.monotonic), as set by paho-mqtt on received messages
+    """
+
+    __slots__ = ("topic", "payload", "timestamp")
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+        self.timestamp = time.monotonic()
+
+
+class SimulatedCamera:
+    """
+    Camera publishing synthetic frames, pixel data and area data
+
+    Parameters
+    ----------
+    camera_id : str
+    rate : float, optional
+        frames per second, default is 8
+    n_pixels : int, optional
+        number of pixels whose data is published with each frame, default is 5
+    area : (int, int) or None, optional
+        width and height of the area whose data is published with each frame,
+        default is (8, 8); if None, no area data is published
+    seed : int, optional
+        seed of the random data
+    encoding : str, optional
+        encoding of the image payloads (see thermocam.frame.ENCODINGS), default
+        is "float32"
+    """
+
+    def __init__(self, camera_id, rate=8., n_pixels=5, area=(8, 8), seed=None,
+                 encoding="float32"):
+        self.camera_id = camera_id
+        self.rate = rate
+        self.encoding = encoding
+        self.rng = np.random.default_rng(seed)
+        self.pixels = self.rng.integers(0, [24, 32], size=(n_pixels, 2))
+        self.area = None if area is None else (2, 3, *area)
+        self.published = 0   # number of published frames
+
+    def topic(self, suffix):
+        """Return the full topic of the camera for a suffix
+        """
+        return f"/singlecameras/{self.camera_id}/{suffix}"
+
+    def current(self):
+        """Return the messages the device publishes (retained) when it starts
+
+        Returns
+        -------
+        list of (str, bytes)
+            topics and payloads
+        """
+        msgs = [(self.topic("settings/current"), synthetic.settings_payload(rate=self.rate))]
+        if len(self.pixels):
+            msgs.append((self.topic("pixels/current"),
+                         ",".join(f"{x} {y}" for x, y in self.pixels).encode()))
+        if self.area is not None:
+            msgs.append((self.topic("area/current"), " ".join(map(str, self.area)).encode()))
+        return msgs
+
+    def frame(self, t):
+        """Return the messages published for a new frame
+
+        Parameters
+        ----------
+        t : float
+            time in seconds from start
+
+        Returns
+        -------
+        list of (str, bytes)
+            topics and payloads
+        """
+        data = synthetic.frame_data(t, self.rng)
+        msgs = [(self.topic("image"), synthetic.image_payload(data, self.encoding)),
+                (self.topic("temps"), synthetic.temps_payload(data))]
+        if len(self.pixels):
+            msgs.append((self.topic("pixels/data"), synthetic.pixels_payload(data, self.pixels)))
+        if self.area is not None:
+            msgs.append((self.topic("area/data"), synthetic.area_payload(data, self.area)))
+        self.published += 1
+        return msgs
+
+
+class LoadGenerator:
+    """
+    Drive a receiver with the messages of simulated cameras and measure it
+
+    The handler processing time is measured by wrapping its handle_message method.
+    If the handler has a queue and no GUI is draining it, a thread drains it every
+    drain_interval, standing in for the GUI timer.
+
+    Parameters
+    ----------
+    handler : thermocam.core.CameraCore or thermocam.registry.CameraRegistry
+        receiver of the messages
+    cameras : list of SimulatedCamera
+    callbacks : thermocam.callbacks.MQTTCallbacks
+        MQTT callbacks of the receiver
+    client : paho.mqtt.client.Client, optional
+        if given, messages are published to its broker instead of being delivered
+        in-process to the callbacks, default is None
+    drain_interval : float or None, optional
+        interval in seconds between two drains of the handler queue, if None
+        the queue is drained elsewhere (e.g. by a GUI timer), default is 0.05 s
+
+    Attributes
+    ----------
+    latencies : list of float
+        time in seconds from arrival to end of processing of each message
+    delivered : int
+        number of messages delivered (or published)
+    """
+
+    def __init__(self, handler, cameras, callbacks, client=None, drain_interval=0.05):
+        self.handler = handler
+        self.cameras = cameras
+        self.callbacks = callbacks
+        self.client = client
+        self.drain_interval = drain_interval
+        self.latencies = []
+        self.delivered = 0
+        self._stop = threading.Event()
+
+        handle = handler.handle_message
+
+        def timed(msg):
+            handle(msg)
+            arrival = getattr(msg, "timestamp", None)
+            if arrival is not None:
+                self.latencies.append(time.monotonic() - arrival)
+        handler.handle_message = timed
+
+    def _deliver(self, topic, payload):
+        """Deliver or publish a message
+        """
+        if self.client is not None:
+            self.client.publish(topic, payload)
+        else:
+            self.callbacks.on_message(None, None, FakeMessage(topic, payload))
+        self.delivered += 1
+
+    def _drain_loop(self):
+        """Drain the handler queue periodically until stopped
+        """
+        while not self._stop.wait(self.drain_interval):
+            self.handler.process_queue()
+        self.handler.process_queue()
+
+    def run(self, duration, settle=0.):
+        """
+        Publish the messages of all the cameras at their rate for some time
+
+        If the receiver is too slow (in-process delivery), cameras fall behind
+        their schedule instead of publishing bursts to catch up.
+
+        Parameters
+        ----------
+        duration : float
+            duration in seconds
+        settle : float, optional
+            time in seconds to wait at the end for the messages still in flight
+            (e.g. through a broker), default is 0
+
+        Returns
+        -------
+        dict
+            see report
+        """
+        drain = None
+        if self.handler.queue is not None and self.drain_interval is not None:
+            drain = threading.Thread(target=self._drain_loop, name="drain")
+            drain.start()
+
+        for cam in self.cameras:
+            for topic, payload in cam.current():
+                self._deliver(topic, payload)
+
+        start = time.perf_counter()
+        # next frame time of each camera, staggered
+        due = [(i/len(self.cameras)/cam.rate, i) for i, cam in enumerate(self.cameras)]
+        heapq.heapify(due)
+        try:
+            while due:
+                t, i = heapq.heappop(due)
+                if t >= duration:
+                    break
+                wait = t - (time.perf_counter() - start)
+                if wait > 0:
+                    time.sleep(wait)
+                for topic, payload in self.cameras[i].frame(t):
+                    self._deliver(topic, payload)
+                now = time.perf_counter() - start
+                heapq.heappush(due, (max(t + 1/self.cameras[i].rate, now), i))
+        finally:
+            elapsed = time.perf_counter() - start
+            time.sleep(settle)
+            self._stop.set()
+            if drain is not None:
+                drain.join()
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        """
+        Return the measurements of a run
+
+        Parameters
+        ----------
+        elapsed : float
+            duration of the run in seconds
+
+        Returns
+        -------
+        dict
+            delivered and processed messages and their rate (per second, NaN if
+            elapsed is 0), latency percentiles in ms, published and processed
+            frames, and, if the handler has a queue, coalesced and dropped messages
+        """
+        lat = np.array(self.latencies)*1e3
+        published = sum(cam.published for cam in self.cameras)
+        cams = getattr(self.handler, "cameras", None)
+        cams = cams.values() if cams is not None else [self.handler]
+        # a run too short for the clock has no measurable rate
+        per_second = 1./elapsed if elapsed > 0 else float("nan")
+        out = {"seconds": elapsed, "delivered": self.delivered, "processed": len(lat),
+               "delivered_rate": self.delivered*per_second,
+               "processed_rate": len(lat)*per_second,
+               "frames_published": published,
+               "frames_processed": sum(cam.frames for cam in cams)}
+        for p in (50, 95, 99):
+            out[f"latency_p{p}"] = float(np.percentile(lat, p)) if len(lat) else float("nan")
+        out["latency_max"] = float(lat.max()) if len(lat) else float("nan")
+        if self.handler.queue is not None:
+            stats = self.handler.queue.stats()
+            out["coalesced"] = stats["coalesced"]
+            out["dropped"] = stats["dropped"]
+        logger.info(f"Load: {out}")
+        return out
@@ -0,0 +1,193 @@
+"""
+Define the writer of the pixel and area output files.
+
+Lines are buffered in memory and written with a single call once the flush
+interval has elapsed (or the buffer is large), instead of one write per message.
+Files are rotated when they reach a maximum size or age, and closed segments
+can be compressed with gzip or, if the "zstandard" package is installed, zstd.
+Compression runs in a background thread so that it does not delay the messages.
+"""
+
+from datetime import datetime
+import gzip
+import importlib.util
+import shutil
+import threading
+import time
+from pathlib import Path
+from loguru import logger
+
+from thermocam import THERMOCAM_DATA
+
+
+def compress_file(path, method):
+    """
+    Compress a file and remove the original
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        file to compress
+    method : {"gzip", "zstd"}
+        compression method
+
+    Returns
+    -------
+    pathlib.Path
+        compressed file
+    """
+    if method == "gzip":
+        out = path.with_name(path.name + ".gz")
+        with open(path, "rb") as f_in, gzip.open(out, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+    else:
+        import zstandard
+        out = path.with_name(path.name + ".zst")
+        with open(path, "rb") as f_in, open(out, "wb") as f_out:
+            zstandard.ZstdCompressor().copy_stream(f_in, f_out)
+    path.unlink()
+    return out
+
+
+class OutputWriter:
+    """
+    Buffered writer of a text output file, with rotation and compression.
+
+    Segments are named "<prefix>_<start time>.txt" and stored in directory.
+
+    Parameters
+    ----------
+    prefix : str
+        prefix of the file names, e.g. "pix_camera1"
+    directory : pathlib.Path, optional
+        created if it does not exist, default is "thermocam.THERMOCAM_DATA"
+    flush_interval : float, optional
+        maximum time in seconds a line is kept in memory, default is 5 s
+    buffer_size : int, optional
+        number of buffered characters that triggers a flush, default is 65536
+    max_bytes : int or None, optional
+        size of a segment that triggers rotation, default is 100 MB
+    max_age : float or None, optional
+        age in seconds of a segment that triggers rotation, default is None
+    compress : {None, "gzip", "zstd"}, optional
+        compression of the closed segments, default is None
+
+    Attributes
+    ----------
+    path : pathlib.Path
+        file currently written
+    """
+
+    def __init__(self, prefix, directory=THERMOCAM_DATA, flush_interval=5., buffer_size=65536,
+                 max_bytes=100_000_000, max_age=None, compress=None):
+        if compress == "zstd":
+            # imported only when a file is compressed
+            if importlib.util.find_spec("zstandard") is None:
+                logger.warning("zstandard is not installed, using gzip compression")
+                compress = "gzip"
+        elif compress not in (None, "gzip"):
+            raise ValueError(f"Unknown compression {compress}")
+
+        self.prefix = prefix
+        self.directory = Path(directory)
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compress = compress
+
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffered = 0
+        self._compressors = []
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._open()
+        self._first_opened = self._opened
+
+    def _open(self):
+        """Open a new segment
+        """
+        start = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.path = self.directory / f"{self.prefix}_{start}.txt"
+        n = 1
+        # rotated within the same second (the previous segment may be compressed already)
+        while any(self.path.with_name(self.path.name + ext).exists()
+                  for ext in ("", ".gz", ".zst")):
+            self.path = self.directory / f"{self.prefix}_{start}_{n}.txt"
+            n += 1
+        self._file = open(self.path, 'w', encoding="utf-8")
+        self._size = 0
+        self._opened = time.monotonic()
+        self._last_flush = self._opened
+
+    def write(self, line):
+        """
+        Add a line to the buffer, flushing it if needed
+
+        Parameters
+        ----------
+        line : str
+        """
+        with self._lock:
+            self._buffer.append(line)
+            self._buffered += len(line)
+            if (self._buffered >= self.buffer_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+
+    def tick(self):
+        """Flush the buffer if the flush interval has elapsed
+
+        This method is meant to be periodically executed, so that lines are
+        written even when no new line arrives
+        """
+        with self._lock:
+            if self._buffer and time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def _flush(self, rotate=True):
+        """Write the buffer to file and rotate the file if needed
+
+        Parameters
+        ----------
+        rotate : bool, optional
+            if False, the file is not rotated, default is True
+        """
+        data = "".join(self._buffer)
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+        self._buffer.clear()
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+
+        if rotate and ((self.max_bytes is not None and self._size >= self.max_bytes)
+                or (self.max_age is not None and self._last_flush-self._opened >= self.max_age)):
+            self._close_segment()
+            self._open()
+
+    def _close_segment(self):
+        """Close the current segment and compress it in the background, if enabled
+        """
+        self._file.close()
+        if self.compress is not None:
+            thread = threading.Thread(target=compress_file, args=(self.path, self.compress),
+                                      name=f"compress {self.path.name}")
+            thread.start()
+            self._compressors = [t for t in self._compressors if t.is_alive()] + [thread]
+
+    def close(self):
+        """Flush the buffer, close the file and wait for the compression of all segments
+        """
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush(rotate=False)
+            if self._size == 0 and self._opened != self._first_opened:
+                # empty segment opened by the last rotation
+                self._file.close()
+                self.path.unlink()
+            else:
+                self._close_segment()
+        for thread in self._compressors:
+            thread.join()
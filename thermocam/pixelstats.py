@@ -0,0 +1,149 @@
+"""
+Define the per-pixel statistics of a session, accumulated frame by frame.
+
+Each frame updates running mean and variance (Welford's algorithm), minimum,
+maximum and time above a threshold of every pixel. All the maps are preallocated
+float64 arrays updated in place, so the cost of a frame does not depend on the
+length of the session and no frame history is kept.
+"""
+
+import numpy as np
+from loguru import logger
+
+from thermocam.frame import FRAME_ROWS, FRAME_COLS
+
+
+class PixelStats:
+    """
+    Streaming statistics of each pixel over the received frames
+
+    Parameters
+    ----------
+    threshold : float or None, optional
+        temperature above which the time of each pixel is counted, if None the
+        time is not counted. Default is None
+    max_interval : float, optional
+        maximum time in seconds between two frames that is counted above the
+        threshold, so that the time without frames (e.g. camera offline) is not
+        counted. Default is 5 s
+
+    Attributes
+    ----------
+    count : int
+        number of accumulated frames
+    mean, min, max : np.ndarray with shape (24, 32)
+        running mean, minimum and maximum temperature of each pixel
+    above : np.ndarray with shape (24, 32)
+        time in seconds each pixel was above the threshold
+    start, end : datetime or None
+        time of the first and of the last accumulated frame
+
+    The maps are indexed as the frames, [x, y].
+    """
+
+    # names of the maps, in the order they are shown
+    MAPS = ("mean", "std", "min", "max", "above")
+
+    def __init__(self, threshold=None, max_interval=5.):
+        self.threshold = threshold
+        self.max_interval = max_interval
+        shape = (FRAME_ROWS, FRAME_COLS)
+        self.mean = np.empty(shape)
+        self.min = np.empty(shape)
+        self.max = np.empty(shape)
+        self.above = np.empty(shape)
+        self._m2 = np.empty(shape)      # sum of squared differences from the mean
+        self._delta = np.empty(shape)
+        self._tmp = np.empty(shape)
+        self._hot = np.empty(shape, dtype=bool)
+        self.reset()
+
+    def reset(self):
+        """Clear the statistics
+        """
+        self.count = 0
+        self.start = self.end = None
+        self.mean.fill(0.)
+        self._m2.fill(0.)
+        self.min.fill(np.inf)
+        self.max.fill(-np.inf)
+        self.above.fill(0.)
+
+    def update(self, frame):
+        """
+        Add a frame to the statistics
+
+        Parameters
+        ----------
+        frame : thermocam.frame.ThermalFrame
+        """
+        x = frame.data
+        self.count += 1
+        # Welford: mean += (x - mean)/n, m2 += (x - old mean)*(x - new mean)
+        np.subtract(x, self.mean, out=self._delta)
+        np.multiply(self._delta, 1./self.count, out=self._tmp)
+        self.mean += self._tmp
+        np.subtract(x, self.mean, out=self._tmp)
+        self._tmp *= self._delta
+        self._m2 += self._tmp
+        np.minimum(self.min, x, out=self.min)
+        np.maximum(self.max, x, out=self.max)
+
+        if self.threshold is not None and self.end is not None:
+            dt = min((frame.time - self.end).total_seconds(), self.max_interval)
+            if dt > 0:
+                np.greater(x, self.threshold, out=self._hot)
+                np.add(self.above, dt, out=self.above, where=self._hot)
+        if self.start is None:
+            self.start = frame.time
+        self.end = frame.time
+
+    def variance(self):
+        """Return the sample variance of each pixel (0 with less than two frames)
+
+        Returns
+        -------
+        np.ndarray with shape (24, 32)
+        """
+        if self.count < 2:
+            return np.zeros_like(self._m2)
+        return self._m2/(self.count - 1)
+
+    def map(self, name):
+        """
+        Return one of the maps
+
+        Parameters
+        ----------
+        name : str
+            one of MAPS
+
+        Returns
+        -------
+        np.ndarray with shape (24, 32)
+
+        Raises
+        ------
+        ValueError
+            if the name is not one of MAPS
+        """
+        if name == "std":
+            return np.sqrt(self.variance())
+        if name not in self.MAPS:
+            raise ValueError(f"Unknown statistics map {name}")
+        return getattr(self, name)
+
+    def save(self, path):
+        """
+        Save the maps, the number of frames, the threshold and the time interval
+        of the statistics to a .npz file
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+        """
+        np.savez(path, count=self.count, var=self.variance(),
+                 threshold=np.nan if self.threshold is None else self.threshold,
+                 start=str(self.start), end=str(self.end),
+                 **{name: self.map(name) for name in self.MAPS if name != "std"})
+        logger.info(f"Saved the statistics of {self.count} frames to {path}")
@@ -0,0 +1,205 @@
+"""
+Define the settings of the MLX90640 exchanged with the AtomS3: the ones chosen
+by the user and published to the device, and the current ones published by the
+device.
+
+This module depends neither on the GUI nor on numpy, so that the command line
+tools that only exchange settings start quickly.
+"""
+
+import math
+import re
+from loguru import logger
+
+
+def parse_settings(payload):
+    """
+    Parse the current settings published by the AtomS3.
+
+    They are received as "rate: 8.00 shift: 8.00 emissivity: 0.95 mode: 1"
+
+    Parameters
+    ----------
+    payload : bytes
+        received MQTT message payload
+
+    Returns
+    -------
+    dict
+        maps "rate", "shift", "emissivity" and "mode" to their values
+
+    Raises
+    ------
+    ValueError
+        if the payload is not valid text
+    KeyError
+        if one of the settings is missing
+    """
+    pattern_set = r'(\w+):\s(\d+(?:\.\d+)?)'
+    matches_set = re.findall(pattern_set, payload.decode())
+
+    # Convert to dictionary
+    current_set = {k: float(v) for k, v in matches_set}
+    missing = {"rate", "shift", "emissivity", "mode"} - current_set.keys()
+    if missing:
+        raise KeyError(f"missing settings {missing}")
+    return current_set
+
+
+class CameraSettings:
+    """
+    Object that contains the camera setings
+     
+    Attributes
+    ----------
+    rate : float
+        Camera refresh rate in Hz (0.5, 1, 2, 4, 8).
+    shift : float
+        Shift value (must be positive).
+    emissivity : float
+        Emissivity coefficient (0 < emissivity <= 1).
+    mode : int
+        Readout mode: 0 = Chess pattern, 1 = TV interleave.
+
+    Methods
+    -------
+    default()
+        Reset all settings to default values.
+    publish_form()
+        Format the settings as a string for AtomS3.
+    """
+
+    DEFAULTS = {"rate" : 2, "shift" : 8, "emissivity" : 0.95, "mode": 0}
+
+    def __init__(self):
+        """Initialize with default values
+        """
+        self._rate = self.DEFAULTS["rate"]
+        self._shift = self.DEFAULTS["shift"]
+        self._emissivity = self.DEFAULTS["emissivity"]
+        self._mode = self.DEFAULTS["mode"]
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @rate.setter
+    def rate(self, new_rate):
+        """Set new rate
+
+        Parameters
+        ----------
+        new_rate : float
+            refresh rate
+        """
+        if new_rate in (0.5,1,2,4,8):
+            self._rate = new_rate
+        else:
+            logger.warning(f"{new_rate} is an invalid value for rate")
+
+    @property
+    def shift(self):
+        return self._shift
+
+    @shift.setter
+    def shift(self, new_shift):
+        """Set shift
+
+        Parameters
+        ----------
+        new_shift : float
+            shift
+        """
+        if new_shift >= 0:
+            self._shift = new_shift
+        else:
+            logger.warning(f"{new_shift} is an invalid value for shift (must be positive)")
+
+    @property
+    def emissivity(self):
+        return self._emissivity
+
+    @emissivity.setter
+    def emissivity(self, new_em):
+        """Set emissivity
+
+        Parameters
+        ----------
+        new_em : float
+            emissivity, must be between 0 and 1
+        """
+        if 0<new_em<=1:
+            self._emissivity = new_em
+        else:
+            logger.warning(f"{new_em} is an invalid value for emissivity (must be between 0 and 1)")
+
+    @property
+    def mode(self):
+        return self._mode
+
+    @mode.setter
+    def mode(self, new_mode):
+        """Set readout mode (chess or TV interleave)
+
+        Parameters
+        ----------
+        mode 
+        """
+        if new_mode in ('Chess pattern', 0):
+            self._mode = 0
+        elif new_mode in ('TV interleave', 1):
+            self._mode = 1
+        else:
+            logger.warning(f"Readout mode {new_mode} is unknown, using default chess pattern.")
+            self._mode = 0
+
+    def default(self):
+        """
+        Reset camera settings to default values:
+        rate=2 Hz, shift=8, emissivity=0.95, mode=Chess pattern
+        """
+        self.rate = self.DEFAULTS["rate"]
+        self.shift = self.DEFAULTS["shift"]
+        self.emissivity = self.DEFAULTS["emissivity"]
+        self.mode = self.DEFAULTS["mode"]
+
+    def publish_form(self):
+        """
+        Format the settings in an appropriate way for the AtomS3
+
+        Return a string representation of the current settings for AtomS3
+        The rate is converted to an integer x such that 2^(x-1) = rate, and
+        other settings are included as-is.
+
+        Returns
+        -------
+        string : str
+            multiline string with rate, shift, emissivity, and mode.
+        """
+
+        r = int(math.log(self._rate, 2)+1)
+        s, e, m = self._shift, self._emissivity, self._mode
+        string = f"{r}\n{s}\n{e}\n{m}\n"
+        logger.debug(f"Publishing:\n{string}")
+        return string
+
+    def matches(self, current):
+        """
+        Return whether the current settings published by the device are these ones
+
+        The device publishes the values with two decimals, so they are compared
+        with that precision.
+
+        Parameters
+        ----------
+        current : dict
+            as returned by parse_settings
+
+        Returns
+        -------
+        bool
+        """
+        return (math.isclose(current["rate"], self._rate, abs_tol=5e-3)
+                and math.isclose(current["shift"], self._shift, abs_tol=5e-3)
+                and math.isclose(current["emissivity"], self._emissivity, abs_tol=5e-3)
+                and int(current["mode"]) == self._mode)
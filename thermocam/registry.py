@@ -0,0 +1,151 @@
+"""Define the registry that handles several cameras with a single MQTT connection
+"""
+
+from loguru import logger
+
+from thermocam import MQTT_PATH_ALL
+from thermocam.core import CameraCore
+from thermocam.ingest import IngestQueue
+
+
+def camera_id(topic):
+    """Return the camera identifier of a topic
+
+    Parameters
+    ----------
+    topic : str
+        e.g. "/singlecameras/camera1/image"
+
+    Returns
+    -------
+    str or None
+        e.g. "camera1", None if the topic is not a camera topic
+    """
+    parts = topic.split("/", 3)
+    if len(parts) < 4 or parts[1] != "singlecameras":
+        return None
+    return parts[2]
+
+
+class CameraRegistry():
+    """Dispatch the messages of all the cameras to their own state
+
+    Subscribes once to the topics of every camera ("/singlecameras/+/#") and
+    forwards each message to the handler of its camera, which is created the
+    first time a camera publishes something. Optionally, the last frame of each
+    camera is shown on a tiled overview.
+
+    Parameters
+    ----------
+    factory : callable, optional
+        called with the camera identifier, it returns the handler of a new camera.
+        Default creates a CameraCore with default parameters
+    overview : thermocam.visualization.OverviewDisplay, optional
+        tiled display of the frames of all the cameras, default is None
+    queue_size : int, optional
+        with an overview, size of the queue between the MQTT network thread and
+        the GUI thread (see IngestQueue), default is 256
+    drain_interval : int, optional
+        with an overview, interval in ms between two checks of the queue, default is 50 ms
+
+    Attributes
+    ----------
+    cameras : dict
+        maps camera identifiers to their handlers
+    mqtt_path : str
+        Topic filter to subscribe to in order to receive the messages of all cameras.
+    queue : IngestQueue or None
+        Queue of received messages waiting to be processed.
+    """
+
+    def __init__(self, factory=CameraCore, overview=None, queue_size=256, drain_interval=50):
+        self.factory = factory
+        self.overview = overview
+        self.cameras = {}
+        self.mqtt_path = MQTT_PATH_ALL
+        self.queue = None
+        self._client = None
+
+        if overview is not None:
+            # without new lines, the output files are flushed and the timing is
+            # logged only by this timer
+            self.timer = overview.canvas.new_timer(interval=500)  # 500 ms
+            self.timer.add_callback(self.flush_files)
+            self.timer.start()
+        if overview is not None and queue_size:
+            # messages received by the network thread are processed by the GUI thread
+            self.queue = IngestQueue(queue_size)
+            self.drain_timer = overview.canvas.new_timer(interval=drain_interval)
+            self.drain_timer.add_callback(self.process_queue)
+            self.drain_timer.start()
+
+    @property
+    def client(self):
+        """MQTT client instance, shared by all the cameras
+        """
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+        for cam in self.cameras.values():
+            cam.client = client
+
+    def get(self, cam_id):
+        """Return the handler of a camera, creating it if it is new
+
+        Parameters
+        ----------
+        cam_id : str
+            camera identifier
+
+        Returns
+        -------
+        thermocam.core.CameraCore
+        """
+        cam = self.cameras.get(cam_id)
+        if cam is None:
+            logger.info(f"New camera: {cam_id}")
+            cam = self.factory(cam_id)
+            cam.client = self._client
+            self.cameras[cam_id] = cam
+        return cam
+
+    def handle_message(self, msg):
+        """Forward a received MQTT message to the handler of its camera
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+            received MQTT message
+        """
+        cam_id = camera_id(msg.topic)
+        if cam_id is None:
+            return
+        cam = self.get(cam_id)
+        frame = cam.frame
+        cam.handle_message(msg)
+
+        # only a newly decoded frame, not an invalid image, is worth a redraw
+        if self.overview is not None and cam.frame is not frame:
+            self.overview.update(cam_id, cam.frame)
+
+    def process_queue(self):
+        """Process all the messages waiting in the queue
+
+        This method is meant to be periodically executed by a timer on the GUI thread
+        """
+        for msg in self.queue.drain():
+            self.handle_message(msg)
+
+    def flush_files(self):
+        """ Write to file the buffered data of all the cameras older than the flush interval.
+        """
+        for cam in self.cameras.values():
+            cam.flush_files()
+
+    def close_files(self):
+        """ Close the output files of all the cameras.
+        """
+        for cam in self.cameras.values():
+            cam.close_files()
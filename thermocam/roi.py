@@ -10,16 +10,43 @@ MIN_Y, MAX_Y : int
     Allowed y coordinate bounds.
 """
 
+from abc import ABC, abstractmethod
 from datetime import datetime
 import re
 import numpy as np
 from loguru import logger
 
+from thermocam.series import MinMaxEnvelope, TimeSeries
+
 MIN_X = 0
 MAX_X = 23
 MIN_Y = 0
 MAX_Y = 31
 
+
+def scroll(ax, series):
+    """
+    Set the limits of the axes to show the retained samples of the given series.
+
+    Only the retained data is looked at, so the cost does not grow with the
+    duration of the session (unlike ax.relim).
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+    series : list of thermocam.series.TimeSeries
+    """
+    limits = np.array([s.limits() for s in series if len(s)])
+    if not len(limits):
+        return
+    t0, t1 = limits[:, 0].min(), limits[:, 1].max()
+    v0, v1 = limits[:, 2].min(), limits[:, 3].max()
+    dt = max(t1 - t0, 1.)*0.05
+    dv = max(v1 - v0, 1.)*0.15
+    ax.set_xlim(t0, t1 + dt)
+    ax.set_ylim(v0 - dv, v1 + dv)
+
+
 class InterestingPixels:
     """
     Class to manage the defined pixels.
@@ -32,19 +59,30 @@ class InterestingPixels:
     Pixel coordinates can be defined by the interactions of the user with the GUI,
     or can be parsed from comma-separated "x y" MQTT messages.
 
+    Parameters
+    ----------
+    capacity : int, optional
+        maximum number of retained samples for each pixel, default is 10000
+    window : float or None, optional
+        maximum age in seconds of the retained samples, default is None (only
+        capacity applies)
+
     Attributes
     ----------
     p : array-like with shape (N, 2)
         Currently defined pixels.
     pixels_data : dict
-        Dictionary mapping (x, y) tuples to dictionary containing time and temperature
-        data and Line2D
+        Dictionary mapping (x, y) tuples to dictionary containing the time series
+        of the temperature (TimeSeries), its min/max envelope at screen resolution
+        (MinMaxEnvelope) and Line2D
     """
 
-    def __init__(self):
+    def __init__(self, capacity=10000, window=None):
         self.p = np.empty((0, 2), dtype=int)
+        self.capacity = capacity
+        self.window = window
         self.pixels_data = {} # will contain the pixel as a key and as a value another dict
-                 #  with the times, values and Line2D
+                 #  with the time series and Line2D
 
     def out_data(self):
         """
@@ -53,18 +91,14 @@ class InterestingPixels:
         Data is formatted as follows:
         "(x, y), T" repeated for eache defined pixel and separated by commas
         """
-        out = ""
-        # loop over data dict
-        for key, v in self.pixels_data.items():
-            out += f" {key}, {v["temps"][-1]},"
-        out = out[:-1] # remove last comma
-
-        return out
+        return ",".join(f" {key}, {float(v["series"].last())}"
+                        for key, v in self.pixels_data.items())
 
     def get_from_str(self, msg):
         """
         Parse current pixels' coordinates from MQTT message. Coordinates already present
-        are ignored. Invalid formatting triggers a warning.
+        are ignored. Invalid formatting triggers a warning, pixels out of the frame
+        are skipped with a warning.
 
         Parameters
         ----------
@@ -77,6 +111,11 @@ class InterestingPixels:
             # add each pixel
             for i, pixel in enumerate(current):
                 coord = list(map(int, pixel.split(' ')))
+                if len(coord) != 2:
+                    raise ValueError
+                if not (MIN_X <= coord[0] <= MAX_X and MIN_Y <= coord[1] <= MAX_Y):
+                    logger.warning(f"Received pixel {pixel} is out of the frame, ignored")
+                    continue
                 if  not np.any(np.all(self.p == coord, axis=1)): # not already present:
                     self.p = np.append(self.p, [[coord[0], coord[1]]], axis=0)
             logger.debug(f"Current pixels: {self.p}")
@@ -161,8 +200,8 @@ class InterestingPixels:
         ----------
         msg : str
             received MQTT message as a string, containing comma separated "x y T" entries.
-        ax : matplotlib.axes.Axes
-            Axes on which pixel data is drawn.
+        ax : matplotlib.axes.Axes or None
+            Axes on which pixel data is drawn, if None data is only stored.
         t : datetime
             Timestamp of start time.
         """
@@ -171,29 +210,71 @@ class InterestingPixels:
             logger.debug(msg)
             # get current pixels and data from message
             current = [list(map(float, p.split(' '))) for p in msg.split(",")]
-            t = (datetime.now() - t).total_seconds()
+            self._add_data(current, ax, (datetime.now() - t).total_seconds())
+        except (ValueError, KeyError):
+            logger.warning(f"Received pixel data has invalid format: {msg}")
+
+    def update_from_frame(self, frame, ax, t):
+        """
+        Take the current pixels data from a thermal frame and update live plots.
+
+        Values are read with a single fancy indexing of the frame data, and are
+        timestamped with the frame time.
+
+        Parameters
+        ----------
+        frame : thermocam.frame.ThermalFrame
+            decoded thermal frame
+        ax : matplotlib.axes.Axes or None
+            Axes on which pixel data is drawn, if None data is only stored.
+        t : datetime
+            Timestamp of start time.
+        """
+        if not len(self.p):
+            return
+        values = frame.data[self.p[:, 0], self.p[:, 1]]
+        self._add_data(zip(self.p[:, 0], self.p[:, 1], values.tolist()), ax,
+                       (frame.time - t).total_seconds())
 
-            # now update value in dictionary or add new one if not present
-            for x, y, val in current:
-                pixel = (int(x), int(y))
-                if pixel not in self.pixels_data: # add to dict and make new line
-                    logger.info(f"Receiving new pixel: {pixel}")
+    def _add_data(self, current, ax, t):
+        """
+        Add a sample to the data of each pixel and update live plots.
+
+        Parameters
+        ----------
+        current : iterable of (x, y, T)
+        ax : matplotlib.axes.Axes or None
+        t : float
+            time of the sample in seconds since start time
+        """
+        # now update value in dictionary or add new one if not present
+        for x, y, val in current:
+            pixel = (int(x), int(y))
+            if pixel not in self.pixels_data: # add to dict and make new line
+                logger.info(f"Receiving new pixel: {pixel}")
+                l = env = None
+                if ax is not None:
                     # create line for its data
                     l, = ax.plot([], [], label=str(pixel), color=np.random.rand(3,))
                     ax.legend(loc="upper left", bbox_to_anchor=(1,1))
-                    # add (empty) data and Line2D to dict
-                    self.pixels_data[pixel] = {"times": [], "temps": [], "line": l}
-                # add values (temperature and time)
-                single = self.pixels_data[pixel]
-                single["times"].append(t)
-                single["temps"].append(val)
-                single["line"].set_data(single["times"], single["temps"])
-
-            # update plot axes
-            ax.relim()
-            ax.autoscale_view()
-        except (ValueError, KeyError):
-            logger.warning(f"Received pixel data has invalid format: {msg}")
+                    env = MinMaxEnvelope(1, int(ax.bbox.width))
+                # add (empty) data and Line2D to dict
+                self.pixels_data[pixel] = {"series": TimeSeries(1, self.capacity, self.window),
+                                           "envelope": env, "line": l}
+            # add values (temperature and time)
+            single = self.pixels_data[pixel]
+            single["series"].append(t, val)
+            if single["line"] is not None:
+                # only the envelope at screen resolution is drawn
+                env = single["envelope"]
+                env.resize(ax.bbox.width)
+                env.add(t, val)
+                env.trim(single["series"].times()[0])
+                single["line"].set_data(*env.xy())
+
+        if ax is not None:
+            # scroll plot axes
+            scroll(ax, [v["series"] for v in self.pixels_data.values()])
 
 
 
@@ -209,18 +290,31 @@ class InterestingArea:
     Area can be defined by the interactions of the user with the GUI,
     or can be parsed from MQTT messages.
 
+    Parameters
+    ----------
+    capacity : int, optional
+        maximum number of retained samples, default is 10000
+    window : float or None, optional
+        maximum age in seconds of the retained samples, default is None (only
+        capacity applies)
     
     Attributes
     ----------
     a : array-like with shape (a, 2)
         Currently defined area as (x_left, y_low, width, height).
     area_data : dict
-        Dictionary mapping str(self.a) to dictionary containing time and temperature
-        data and Line2D
+        Dictionary mapping str(self.a) to dictionary containing the time series
+        of avg, min and max temperature (TimeSeries), its min/max envelope at
+        screen resolution (MinMaxEnvelope) and Line2D
     """
 
-    def __init__(self):
+    # columns of the time series
+    AVG, MIN, MAX = 0, 1, 2
+
+    def __init__(self, capacity=10000, window=None):
         self.a = np.empty((0, 4),dtype=int)
+        self.capacity = capacity
+        self.window = window
         self.area_data = {} # will contain the area as a key and as a value another dict with
                # the times, values and Line2D (even though only one area at the time is defined)
 
@@ -250,7 +344,8 @@ class InterestingArea:
     def get_from_str(self, msg):
         """
         Parse area definition from MQTT message as x_left, y_low, width, height.
-        Invalid formatting triggers a warning and retains the previous area.
+        Invalid formatting or an area not within the frame triggers a warning and
+        retains the previous area.
 
         Parameters
         ----------
@@ -260,7 +355,16 @@ class InterestingArea:
 
         try:
             # coordinates MUST be integers
-            self.a = np.array([list(map(int, msg.split(' ')))], dtype=int)
+            area = list(map(int, msg.split(' ')))
+            if len(area) != 4:
+                raise ValueError
+            x, y, w, h = area
+            if (w < 1 or h < 1 or x < MIN_X or y < MIN_Y
+                    or x + w - 1 > MAX_X or y + h - 1 > MAX_Y):
+                logger.warning(f"Received area {msg} is out of the frame, still using "
+                               "previous area")
+                return
+            self.a = np.array([area], dtype=int)
             # NOTE: self.a is redefined as the new area, it's not appended as in the case of
             #       the pixels: only one area at the time is defined
             logger.info(f"Current area: {self.a}")
@@ -329,8 +433,8 @@ class InterestingArea:
         ----------
         msg : str
               received MQTT message as a string
-        ax : matplotlib.axes.Axes
-            Axes on which area data is drawn.
+        ax : matplotlib.axes.Axes or None
+            Axes on which area data is drawn, if None data is only stored.
         t : datetime
             Timestamp of start time.
         """
@@ -343,32 +447,76 @@ class InterestingArea:
             # values should be appended only if they are all present
             if (data["max"] and data["min"] and data["avg"]):
                 x = (datetime.now() - t).total_seconds()
-                if str(self.a) not in self.area_data:
-                    # create 2DLine for min, max and avg
-                    l_avg, = ax.plot([], [], color='green', markersize=12, label=r"$T_{avg}$")
-                    l_min, = ax.plot([], [], color='blue', markersize=12, label=r"$T_{min}$")
-                    l_max, = ax.plot([], [], color='red', markersize=12, label=r"$T_{max}$")
-                    if ax.get_legend() is None:
-                        ax.legend(loc="upper left", bbox_to_anchor=(1,0.5))
-                    self.area_data[str(self.a)] = {"times" : [], "avg" : [], "min" : [], "max" : [],
-                                            "l_avg" : l_avg, "l_min" : l_min, "l_max" : l_max}
-                # only the currently defined area data is getting updated
-                a = self.area_data[str(self.a)]
-                a["times"].append(x)
-                a["avg"].append(data["avg"])
-                a["min"].append(data["min"])
-                a["max"].append(data["max"])
-                a["l_avg"].set_data(a["times"], a["avg"])
-                a["l_min"].set_data(a["times"], a["min"])
-                a["l_max"].set_data(a["times"], a["max"])
-
-                # update plot axes
-                ax.relim()
-                ax.autoscale_view()
+                self._add_data(x, data["avg"], data["min"], data["max"], ax)
 
         except (TypeError, KeyError):
             logger.warning(f"Received area data has invalid format: {msg}")
 
+    def update_from_frame(self, frame, ax, t):
+        """
+        Compute the defined area data from a thermal frame and update live plots.
+
+        The area covers frame.data[x:x+w, y:y+h] (same convention as the device),
+        and its data is timestamped with the frame time.
+
+        Parameters
+        ----------
+        frame : thermocam.frame.ThermalFrame
+            decoded thermal frame
+        ax : matplotlib.axes.Axes or None
+            Axes on which area data is drawn, if None data is only stored.
+        t : datetime
+            Timestamp of start time.
+        """
+        if not self.defined():
+            return
+        x, y, w, h = self.a[0]
+        block = frame.data[x:x+w, y:y+h]
+        self._add_data((frame.time - t).total_seconds(), float(block.mean()),
+                       float(block.min()), float(block.max()), ax)
+
+    def _add_data(self, x, avg, min_T, max_T, ax):
+        """
+        Add a sample to the data of the defined area and update live plots.
+
+        Parameters
+        ----------
+        x : float
+            time of the sample in seconds since start time
+        avg, min_T, max_T : float
+            average, minimum and maximum temperature of the area
+        ax : matplotlib.axes.Axes or None
+        """
+        if str(self.a) not in self.area_data:
+            l_avg = l_min = l_max = env = None
+            if ax is not None:
+                env = MinMaxEnvelope(3, int(ax.bbox.width))
+                # create 2DLine for min, max and avg
+                l_avg, = ax.plot([], [], color='green', markersize=12, label=r"$T_{avg}$")
+                l_min, = ax.plot([], [], color='blue', markersize=12, label=r"$T_{min}$")
+                l_max, = ax.plot([], [], color='red', markersize=12, label=r"$T_{max}$")
+                if ax.get_legend() is None:
+                    ax.legend(loc="upper left", bbox_to_anchor=(1,0.5))
+            self.area_data[str(self.a)] = {
+                "series" : TimeSeries(3, self.capacity, self.window), "envelope" : env,
+                "l_avg" : l_avg, "l_min" : l_min, "l_max" : l_max}
+        # only the currently defined area data is getting updated
+        a = self.area_data[str(self.a)]
+        series = a["series"]
+        series.append(x, avg, min_T, max_T)
+
+        if ax is not None:
+            # only the envelope at screen resolution is drawn
+            env = a["envelope"]
+            env.resize(ax.bbox.width)
+            env.add(x, avg, min_T, max_T)
+            env.trim(series.times()[0])
+            a["l_avg"].set_data(*env.xy(self.AVG))
+            a["l_min"].set_data(*env.xy(self.MIN))
+            a["l_max"].set_data(*env.xy(self.MAX))
+            # scroll plot axes
+            scroll(ax, [series])
+
     def out_data(self):
         """
         Return a string with the defined area data to be written in output file.
@@ -379,8 +527,549 @@ class InterestingArea:
         x, y, w, h = self.a[0][:]
         a = self.area_data[str(self.a)]
 
-        avg = a["avg"][-1]
-        min_T = a["min"][-1]
-        max_T = a["max"][-1]
+        avg = float(a["series"].last(self.AVG))
+        min_T = float(a["series"].last(self.MIN))
+        max_T = float(a["series"].last(self.MAX))
         out = f"{x}, {y}, {w}, {h}, {avg}, {min_T}, {max_T}"
         return out
+
+
+class RegionSet(ABC):
+    """
+    Base class of the sets of named regions defined on the client, whose data is
+    computed from the received frames.
+
+    It stores the time series of avg, min and max temperature of each region and
+    draws the average of the first max_lines regions. Subclasses define the
+    regions and compute their statistics (method stats); minimum and maximum are
+    computed for all the regions at once with a segmented reduction over the
+    concatenated pixel indices of the regions.
+
+    Parameters
+    ----------
+    capacity : int, optional
+        maximum number of retained samples for each region, default is 10000
+    window : float or None, optional
+        maximum age in seconds of the retained samples, default is None (only
+        capacity applies)
+    max_lines : int, optional
+        maximum number of regions whose average is drawn, default is 20
+
+    Attributes
+    ----------
+    regions : dict
+        Dictionary mapping the region names to their definition.
+    regions_data : dict
+        Dictionary mapping the region names to dictionary containing the time series
+        of avg, min and max temperature (TimeSeries), the min/max envelope of the
+        average at screen resolution (MinMaxEnvelope) and its Line2D, if drawn
+    """
+
+    AVG = 0
+    MIN = 1
+    MAX = 2
+
+    def __init__(self, capacity=10000, window=None, max_lines=20):
+        self.capacity = capacity
+        self.window = window
+        self.max_lines = max_lines
+        self.regions = {}
+        self.regions_data = {}
+        self._set_pixels(np.zeros((0, MAX_X+1, MAX_Y+1), dtype=bool))
+
+    def __len__(self):
+        return len(self.regions)
+
+    def _set_pixels(self, masks):
+        """Store the pixels of each region for the min/max reduction
+
+        Parameters
+        ----------
+        masks : np.ndarray with shape (K, 24, 32)
+            pixels of each region, indexed as [k, x, y]
+        """
+        masks = masks.reshape(len(masks), (MAX_X+1)*(MAX_Y+1))
+        self._indices = np.nonzero(masks)[1]
+        self._offsets = np.r_[0, np.cumsum(masks.sum(axis=1))[:-1]].astype(int)
+        self._masks = masks
+
+    @abstractmethod
+    def _rebuild(self):
+        """Update the arrays used to compute the data of all the regions at once
+        """
+
+    def _add(self, name, definition):
+        """Store the definition of a region, replacing the existing one (and its data)
+
+        Parameters
+        ----------
+        name : str
+            name of the region, it can not contain spaces
+        definition : object
+
+        Raises
+        ------
+        ValueError
+            if the name is not valid
+        """
+        if not name or " " in name:
+            raise ValueError(f"Invalid region name: '{name}'")
+        self.remove(name)
+        self.regions[name] = definition
+        self._rebuild()
+
+    def remove(self, name):
+        """
+        Remove a region and its data, if it exists
+
+        Parameters
+        ----------
+        name : str
+        """
+        if self.regions.pop(name, None) is None:
+            return
+        data = self.regions_data.pop(name, None)
+        if data is not None and data["line"] is not None:
+            data["line"].remove()
+        self._rebuild()
+
+    def clear(self):
+        """Remove all the regions and their data
+        """
+        for name in list(self.regions):
+            self.remove(name)
+
+    def at(self, x, y):
+        """
+        Return the name of the last defined region containing a pixel
+
+        Parameters
+        ----------
+        x, y : int
+
+        Returns
+        -------
+        str or None
+        """
+        if not MIN_X <= x <= MAX_X or not MIN_Y <= y <= MAX_Y:
+            return None
+        inside = np.flatnonzero(self._masks[:, x*(MAX_Y+1) + y])
+        return list(self.regions)[inside[-1]] if len(inside) else None
+
+    def _new_name(self, prefix):
+        """Return the first name "<prefix><n>" not used by a region
+
+        Parameters
+        ----------
+        prefix : str
+
+        Returns
+        -------
+        str
+        """
+        n = len(self.regions) + 1
+        while f"{prefix}{n}" in self.regions:
+            n += 1
+        return f"{prefix}{n}"
+
+    def _min_max(self, flat):
+        """Return minimum and maximum temperature of all the regions
+
+        Parameters
+        ----------
+        flat : np.ndarray with shape (768,)
+            raveled frame data
+
+        Returns
+        -------
+        min, max : np.ndarray
+        """
+        values = flat[self._indices]
+        return (np.minimum.reduceat(values, self._offsets),
+                np.maximum.reduceat(values, self._offsets))
+
+    @abstractmethod
+    def stats(self, data):
+        """
+        Compute average, minimum and maximum temperature of all the regions
+
+        Parameters
+        ----------
+        data : np.ndarray with shape (24, 32)
+            thermal frame data, indexed as data[x, y]
+
+        Returns
+        -------
+        avg, min, max : np.ndarray
+            one value per region, in the order of definition
+        """
+
+    def update_from_frame(self, frame, ax, t):
+        """
+        Compute the data of all the regions from a thermal frame and update live plots.
+
+        Parameters
+        ----------
+        frame : thermocam.frame.ThermalFrame
+            decoded thermal frame
+        ax : matplotlib.axes.Axes or None
+            Axes on which the regions data is drawn, if None data is only stored.
+        t : datetime
+            Timestamp of start time.
+        """
+        if not self.regions:
+            return
+        x = (frame.time - t).total_seconds()
+        drawn = []
+        stats = [s.tolist() for s in self.stats(frame.data)]
+        for name, avg, min_T, max_T in zip(self.regions, *stats):
+            if name not in self.regions_data:
+                l = env = None
+                if ax is not None and len(self.regions_data) < self.max_lines:
+                    l, = ax.plot([], [], linestyle="--", label=name)
+                    ax.legend(loc="upper left", bbox_to_anchor=(1,0.5))
+                    env = MinMaxEnvelope(1, int(ax.bbox.width))
+                self.regions_data[name] = {"series": TimeSeries(3, self.capacity, self.window),
+                                           "envelope": env, "line": l}
+            r = self.regions_data[name]
+            r["series"].append(x, avg, min_T, max_T)
+            if r["line"] is not None:
+                env = r["envelope"]
+                env.resize(ax.bbox.width)
+                env.add(x, avg)
+                env.trim(r["series"].times()[0])
+                r["line"].set_data(*env.xy())
+                drawn.append(r["series"])
+
+        if ax is not None:
+            scroll(ax, drawn)
+
+    def drawn_series(self):
+        """Return the time series of the regions that are drawn
+
+        Returns
+        -------
+        list of thermocam.series.TimeSeries
+        """
+        return [v["series"] for v in self.regions_data.values() if v["line"] is not None]
+
+    def out_data(self):
+        """
+        Return a string with the regions data to be written in output file.
+
+        Data is formatted as follows:
+        "name, avg, min, max" repeated for each region and separated by commas
+        """
+        return ",".join(f" {name}, {float(v['series'].last(self.AVG))}, "
+                        f"{float(v['series'].last(self.MIN))}, "
+                        f"{float(v['series'].last(self.MAX))}"
+                        for name, v in self.regions_data.items())
+
+
+class AreaSet(RegionSet):
+    """
+    Class to manage a set of named rectangular areas, defined on the client.
+
+    Unlike InterestingArea, which follows the single area defined on the device,
+    any number of areas can be defined (e.g. one per component of a board), and
+    their data is computed from the received frames. For each frame, the sum of
+    every area is obtained in O(1) from a single summed-area table (integral image).
+
+    Areas can be loaded from a text file with one area per line, as
+    "name x_left y_low width height"; empty lines and lines starting with "#"
+    are ignored.
+
+    Parameters
+    ----------
+    capacity : int, optional
+        maximum number of retained samples for each area, default is 10000
+    window : float or None, optional
+        maximum age in seconds of the retained samples, default is None (only
+        capacity applies)
+    max_lines : int, optional
+        maximum number of areas whose average is drawn, default is 20
+
+    See RegionSet for the attributes.
+    """
+
+    def __init__(self, capacity=10000, window=None, max_lines=20):
+        super().__init__(capacity, window, max_lines)
+        self._integral = np.zeros((MAX_X+2, MAX_Y+2))
+        self._rebuild()
+
+    @property
+    def areas(self):
+        """Dictionary mapping the area names to (x_left, y_low, width, height)
+        """
+        return self.regions
+
+    def _rebuild(self):
+        """Update the arrays used to compute the data of all the areas at once
+        """
+        rects = np.array(list(self.regions.values()), dtype=int).reshape(-1, 4)
+        x0, y0, w, h = rects.T
+        self._corners = (x0, y0, x0 + w, y0 + h)
+        self._sizes = w*h
+        masks = np.zeros((len(rects), MAX_X+1, MAX_Y+1), dtype=bool)
+        for mask, (x, y, w, h) in zip(masks, rects):
+            mask[x:x+w, y:y+h] = True
+        self._set_pixels(masks)
+
+    def add(self, name, x, y, w, h):
+        """
+        Define a new area, or redefine an existing one (its data is cleared)
+
+        Parameters
+        ----------
+        name : str
+            name of the area, it can not contain spaces
+        x, y : int
+            coordinates of the lower left pixel
+        w, h : int
+            width and height in pixels
+
+        Raises
+        ------
+        ValueError
+            if the name is not valid or the area is not inside the image
+        """
+        x, y, w, h = int(x), int(y), int(w), int(h)
+        if w < 1 or h < 1 or x < MIN_X or y < MIN_Y or x+w > MAX_X+1 or y+h > MAX_Y+1:
+            raise ValueError(f"Area {name} ({x}, {y}, {w}, {h}) is not inside the image")
+        self._add(name, (x, y, w, h))
+        logger.info(f"New area {name}: ({x}, {y}), w={w}, h={h}")
+
+    def add_from_click(self, c):
+        """
+        Define a new area from two mouse clicks, naming it "area<n>"
+
+        Parameters
+        ----------
+        c : array-like with shape (2, 2)
+            coordinates of the two clicked pixels
+
+        Returns
+        -------
+        str
+            name of the new area
+        """
+        # same bound checks as the area defined on the device
+        area = InterestingArea()
+        area.get_from_click(c)
+        name = self._new_name("area")
+        self.add(name, *area.a[0])
+        return name
+
+    def load(self, path):
+        """
+        Add the areas defined in a text file. Invalid lines trigger a warning
+        and are skipped.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+        """
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    name, x, y, w, h = line.split()
+                    self.add(name, x, y, w, h)
+                except ValueError as e:
+                    logger.warning(f"Invalid area definition '{line}' in {path}: {e}")
+
+    def save(self, path):
+        """
+        Write the defined areas to a text file, in the format read by load
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            for name, (x, y, w, h) in self.regions.items():
+                f.write(f"{name} {x} {y} {w} {h}\n")
+
+    def stats(self, data):
+        """
+        Compute average, minimum and maximum temperature of all the areas
+
+        Parameters
+        ----------
+        data : np.ndarray with shape (24, 32)
+            thermal frame data, indexed as data[x, y]
+
+        Returns
+        -------
+        avg, min, max : np.ndarray
+            one value per area, in the order of definition
+        """
+        s = self._integral
+        s[1:, 1:] = data
+        np.cumsum(s, axis=0, out=s)
+        np.cumsum(s, axis=1, out=s)
+        x0, y0, x1, y1 = self._corners
+        avg = (s[x1, y1] - s[x0, y1] - s[x1, y0] + s[x0, y0]) / self._sizes
+        return (avg, *self._min_max(data.ravel()))
+
+
+class MaskSet(RegionSet):
+    """
+    Class to manage a set of named regions of arbitrary shape, defined on the client.
+
+    Each region is a boolean or weighted 24x32 mask (indexed as [x, y], like the
+    frame data), e.g. drawn as a polygon or a circle on the thermal image. The
+    normalized weights of all the masks are stacked in a dense (K x 768) matrix,
+    so that the (weighted) average of K regions is a single matrix-vector
+    product; minimum and maximum are taken over the pixels with positive weight.
+
+    Masks can be saved to and loaded from a .npz file.
+
+    Parameters
+    ----------
+    capacity : int, optional
+        maximum number of retained samples for each region, default is 10000
+    window : float or None, optional
+        maximum age in seconds of the retained samples, default is None (only
+        capacity applies)
+    max_lines : int, optional
+        maximum number of regions whose average is drawn, default is 20
+
+    See RegionSet for the attributes.
+    """
+
+    def __init__(self, capacity=10000, window=None, max_lines=20):
+        super().__init__(capacity, window, max_lines)
+        self._rebuild()
+
+    @property
+    def masks(self):
+        """Dictionary mapping the region names to their weights (24x32 arrays)
+        """
+        return self.regions
+
+    def _rebuild(self):
+        """Update the weight matrix of all the masks
+        """
+        weights = np.array(list(self.regions.values()), dtype=np.float32)
+        weights = weights.reshape(len(weights), (MAX_X+1)*(MAX_Y+1))
+        self._weights = weights / np.maximum(weights.sum(axis=1, keepdims=True), 1e-12)
+        self._set_pixels(weights > 0)
+
+    def add(self, name, mask):
+        """
+        Define a new region, or redefine an existing one (its data is cleared)
+
+        Parameters
+        ----------
+        name : str
+            name of the region, it can not contain spaces
+        mask : array-like with shape (24, 32)
+            boolean mask or non-negative weights of the pixels, indexed as [x, y]
+
+        Raises
+        ------
+        ValueError
+            if the name is not valid, or the mask has the wrong shape, negative
+            weights or no pixels
+        """
+        mask = np.asarray(mask, dtype=np.float32)
+        if mask.shape != (MAX_X+1, MAX_Y+1):
+            raise ValueError(f"Mask {name} has shape {mask.shape}, "
+                             f"expected {(MAX_X+1, MAX_Y+1)}")
+        if (mask < 0).any() or not (mask > 0).any():
+            raise ValueError(f"Mask {name} must have non-negative weights and some pixels")
+        self._add(name, mask)
+        logger.info(f"New region {name}: {int((mask > 0).sum())} pixels")
+
+    def add_polygon(self, name, vertices):
+        """
+        Define a region with the pixels whose center is inside a polygon
+
+        Parameters
+        ----------
+        name : str or None
+            name of the region, if None it is named "roi<n>"
+        vertices : array-like with shape (n, 2)
+            (x, y) coordinates of the vertices on the thermal image
+
+        Returns
+        -------
+        str
+            name of the region
+        """
+        from matplotlib.path import Path
+        x, y = np.mgrid[MIN_X:MAX_X+1, MIN_Y:MAX_Y+1]
+        inside = Path(vertices).contains_points(np.c_[x.ravel(), y.ravel()])
+        name = name or self._new_name("roi")
+        self.add(name, inside.reshape(x.shape))
+        return name
+
+    def add_circle(self, name, x, y, r):
+        """
+        Define a region with the pixels whose center is inside a circle
+
+        Parameters
+        ----------
+        name : str or None
+            name of the region, if None it is named "roi<n>"
+        x, y : float
+            coordinates of the center on the thermal image
+        r : float
+            radius in pixels
+
+        Returns
+        -------
+        str
+            name of the region
+        """
+        px, py = np.mgrid[MIN_X:MAX_X+1, MIN_Y:MAX_Y+1]
+        name = name or self._new_name("roi")
+        self.add(name, (px - x)**2 + (py - y)**2 <= r**2)
+        return name
+
+    def load(self, path):
+        """
+        Add the regions saved in a .npz file
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+        """
+        with np.load(path) as f:
+            for name, mask in zip(f["names"], f["masks"]):
+                try:
+                    self.add(str(name), mask)
+                except ValueError as e:
+                    logger.warning(f"Invalid region in {path}: {e}")
+
+    def save(self, path):
+        """
+        Save the defined regions to a .npz file, in the format read by load
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+        """
+        masks = np.array(list(self.regions.values()), dtype=np.float32)
+        np.savez(path, names=np.array(list(self.regions), dtype=str),
+                 masks=masks.reshape(len(masks), MAX_X+1, MAX_Y+1))
+
+    def stats(self, data):
+        """
+        Compute the weighted average, minimum and maximum temperature of all the regions
+
+        Parameters
+        ----------
+        data : np.ndarray with shape (24, 32)
+            thermal frame data, indexed as data[x, y]
+
+        Returns
+        -------
+        avg, min, max : np.ndarray
+            one value per region, in the order of definition
+        """
+        flat = data.ravel()
+        return (self._weights @ flat, *self._min_max(flat))
@@ -0,0 +1,111 @@
+"""
+Define the routing table that dispatches received MQTT messages to their handlers.
+
+The AtomS3 publishes on topics like "/singlecameras/camera1/<suffix>": routes are
+keyed by the suffix (e.g. "image", "pixels/data"), so that dispatching a message
+is a single dictionary lookup and new routes can be added without modifying
+the handler.
+"""
+
+from collections import Counter
+
+
+class TopicRouter:
+    """
+    Routing table for the messages published by one camera.
+
+    Each route maps a topic suffix to a callable that takes the MQTT message.
+    The image topic, which carries most of the traffic, is checked first with a
+    single string comparison. Messages on topics without a route are counted
+    and ignored.
+
+    Parameters
+    ----------
+    camera_id : str, optional
+        identifier of the camera in the MQTT topics, default is "camera1"
+
+    Attributes
+    ----------
+    prefix : str
+        common prefix of the topics of the camera
+    routes : dict
+        maps topic suffixes to their handlers
+    counts : collections.Counter
+        number of messages received for each topic suffix, including the ones
+        without a route
+    """
+
+    def __init__(self, camera_id="camera1"):
+        self.prefix = f"/singlecameras/{camera_id}/"
+        self.routes = {}
+        self.counts = Counter()
+        self._image_topic = self.prefix + "image"
+        self._image_route = None
+
+    def add_route(self, suffix, handler):
+        """
+        Register the handler for a topic suffix, replacing the previous one (if any)
+
+        Parameters
+        ----------
+        suffix : str
+            topic suffix, e.g. "temps" for "/singlecameras/camera1/temps"
+        handler : callable
+            function called with the received MQTT message
+        """
+        self.routes[suffix] = handler
+        if suffix == "image":
+            self._image_route = handler
+
+    def remove_route(self, suffix):
+        """
+        Remove the handler for a topic suffix, if present
+
+        Parameters
+        ----------
+        suffix : str
+        """
+        self.routes.pop(suffix, None)
+        if suffix == "image":
+            self._image_route = None
+
+    def dispatch(self, msg):
+        """
+        Call the handler registered for the topic of the message
+
+        Parameters
+        ----------
+        msg : paho.mqtt.client.MQTTMessage
+            received MQTT message
+
+        Returns
+        -------
+        bool
+            True if the message has been handled, False if no route matched
+        """
+        topic = msg.topic
+        if topic == self._image_topic and self._image_route is not None:
+            self.counts["image"] += 1
+            self._image_route(msg)
+            return True
+
+        if not topic.startswith(self.prefix):
+            self.counts[topic] += 1
+            return False
+
+        suffix = topic[len(self.prefix):]
+        self.counts[suffix] += 1
+        route = self.routes.get(suffix)
+        if route is None:
+            return False
+        route(msg)
+        return True
+
+    def unrouted(self):
+        """Return the number of received messages for each topic without a route
+
+        Returns
+        -------
+        dict
+        """
+        return {k: v for k, v in self.counts.items() if k not in self.routes}
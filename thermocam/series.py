@@ -0,0 +1,253 @@
+"""
+Define the fixed-capacity time series used to store the data of pixels and area.
+
+Samples are stored in preallocated NumPy arrays used as circular buffers, so
+memory does not grow during long runs. Every sample is written twice (at index i
+and i + capacity), so that the retained samples are always contiguous in memory
+and can be handed to Matplotlib as views, without copies.
+"""
+
+import numpy as np
+
+
+class TimeSeries:
+    """
+    Circular buffer of samples (time, value_1, ..., value_n).
+
+    The retention is given by the maximum number of samples and, optionally, by
+    a time window: samples older than the last one by more than window seconds
+    are not returned.
+
+    Parameters
+    ----------
+    columns : int, optional
+        number of values of each sample, default is 1
+    capacity : int, optional
+        maximum number of retained samples, default is 10000
+    window : float or None, optional
+        maximum age in seconds of the retained samples (relative to the last one),
+        default is None (only capacity applies)
+    """
+
+    def __init__(self, columns=1, capacity=10000, window=None):
+        self.capacity = capacity
+        self.window = window
+        self._times = np.empty(2*capacity)
+        self._values = np.empty((columns, 2*capacity))
+        self._next = 0      # index (modulo capacity) of the next sample
+        self._len = 0
+
+    def __len__(self):
+        return len(self.times())
+
+    def append(self, t, *values):
+        """
+        Add a sample, overwriting the oldest one if the buffer is full
+
+        Parameters
+        ----------
+        t : float
+            time of the sample
+        values : float
+            one value per column
+        """
+        i, j = self._next, self._next + self.capacity
+        self._times[i] = self._times[j] = t
+        self._values[:, i] = self._values[:, j] = values
+        self._next = (self._next + 1) % self.capacity
+        self._len = min(self._len + 1, self.capacity)
+
+    def _slice(self):
+        """Return the slice of the retained samples in the doubled buffer
+        """
+        stop = self._next + self.capacity if self._len == self.capacity else self._next
+        start = stop - self._len
+        if self.window is not None and self._len:
+            times = self._times[start:stop]
+            start += np.searchsorted(times, times[-1] - self.window)
+        return slice(start, stop)
+
+    def times(self):
+        """Return the times of the retained samples, oldest first (view)
+
+        Returns
+        -------
+        np.ndarray
+        """
+        return self._times[self._slice()]
+
+    def values(self, column=0):
+        """Return the values of a column of the retained samples, oldest first (view)
+
+        Parameters
+        ----------
+        column : int, optional
+            default is 0
+
+        Returns
+        -------
+        np.ndarray
+        """
+        return self._values[column, self._slice()]
+
+    def last(self, column=0):
+        """Return the last value of a column
+
+        Parameters
+        ----------
+        column : int, optional
+            default is 0
+
+        Returns
+        -------
+        float
+        """
+        return self._values[column, (self._next - 1) % self.capacity]
+
+    def limits(self):
+        """Return the time span and the range of all values of the retained samples
+
+        Returns
+        -------
+        (t_min, t_max, v_min, v_max) : float
+        """
+        s = self._slice()
+        values = self._values[:, s]
+        return self._times[s.start], self._times[s.stop-1], values.min(), values.max()
+
+
+class MinMaxEnvelope:
+    """
+    Min/max decimation of a time series to the resolution of the screen.
+
+    Samples are grouped in time bins and, for each bin, only the minimum and the
+    maximum of each column are kept: drawing them as a vertical stroke looks
+    the same as drawing all the samples, as long as a bin is not wider than a
+    pixel. The envelope is updated incrementally as samples arrive; when there
+    are more than two bins per pixel, the bin width is doubled and adjacent
+    bins are merged, so the number of points handed to Matplotlib stays
+    bounded no matter how long the session runs.
+
+    Parameters
+    ----------
+    columns : int, optional
+        number of values of each sample, default is 1
+    width : int, optional
+        width in pixels of the axes the data is drawn on, default is 800
+    resolution : float, optional
+        initial bin width in seconds, default is 0.01 s
+    """
+
+    def __init__(self, columns=1, width=800, resolution=0.01):
+        self.width = width
+        self.bin = resolution
+        size = 2*width + 1
+        self._starts = np.empty(size)
+        self._min = np.empty((columns, size))
+        self._max = np.empty((columns, size))
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def add(self, t, *values):
+        """
+        Add a sample to the envelope
+
+        Parameters
+        ----------
+        t : float
+            time of the sample, not earlier than the previous one
+        values : float
+            one value per column
+        """
+        start = np.floor(t/self.bin)*self.bin
+        n = self._n
+        if n and start == self._starts[n-1]:
+            np.minimum(self._min[:, n-1], values, out=self._min[:, n-1])
+            np.maximum(self._max[:, n-1], values, out=self._max[:, n-1])
+            return
+
+        if n == len(self._starts):
+            while self._n == len(self._starts):
+                self._merge()
+            # with wider bins, the sample may fall in the last one
+            self.add(t, *values)
+            return
+        self._starts[n] = start
+        self._min[:, n] = values
+        self._max[:, n] = values
+        self._n += 1
+
+    def _merge(self):
+        """Double the bin width and merge the bins that fall in the same new bin
+        """
+        self.bin *= 2
+        n = self._n
+        starts = np.floor(self._starts[:n]/self.bin)*self.bin
+        first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+        m = len(first)
+        self._starts[:m] = starts[first]
+        self._min[:, :m] = np.minimum.reduceat(self._min[:, :n], first, axis=1)
+        self._max[:, :m] = np.maximum.reduceat(self._max[:, :n], first, axis=1)
+        self._n = m
+
+    def trim(self, t_min):
+        """
+        Remove the bins that end before a time (e.g. the oldest retained sample)
+
+        Parameters
+        ----------
+        t_min : float
+        """
+        drop = np.searchsorted(self._starts[:self._n] + self.bin, t_min, side="right")
+        if drop:
+            n = self._n - drop
+            self._starts[:n] = self._starts[drop:self._n]
+            self._min[:, :n] = self._min[:, drop:self._n]
+            self._max[:, :n] = self._max[:, drop:self._n]
+            self._n = n
+
+    def resize(self, width):
+        """
+        Set the width in pixels of the axes, merging bins if they are too many
+
+        Parameters
+        ----------
+        width : int
+        """
+        width = max(int(width), 1)
+        if width == self.width:
+            return
+        size = 2*width + 1
+        while self._n > size:
+            self._merge()
+        n = self._n
+        starts, mins, maxs = self._starts, self._min, self._max
+        self._starts = np.empty(size)
+        self._min = np.empty((len(mins), size))
+        self._max = np.empty((len(maxs), size))
+        self._starts[:n] = starts[:n]
+        self._min[:, :n] = mins[:, :n]
+        self._max[:, :n] = maxs[:, :n]
+        self.width = width
+
+    def xy(self, column=0):
+        """
+        Return the points to draw: minimum and maximum of each bin, at the bin start
+
+        Parameters
+        ----------
+        column : int, optional
+            default is 0
+
+        Returns
+        -------
+        x, y : np.ndarray
+        """
+        n = self._n
+        x = np.repeat(self._starts[:n], 2)
+        y = np.empty(2*n)
+        y[0::2] = self._min[column, :n]
+        y[1::2] = self._max[column, :n]
+        return x, y
@@ -4,11 +4,15 @@
 
 import math
 import matplotlib.pyplot as plt
+from matplotlib.transforms import Bbox
 from matplotlib.widgets import Button
 from matplotlib.widgets import TextBox
 from matplotlib.widgets import RadioButtons
 from matplotlib.patches import FancyBboxPatch
-from loguru import logger
+
+# CameraSettings is defined without GUI in thermocam.protocol, it is imported here
+# for compatibility
+from thermocam.protocol import CameraSettings
 
 
 class ControlPanel:
@@ -20,6 +24,12 @@ class ControlPanel:
     It includes controls for refresh rate, shift, emissivity, and readout mode,
     as well as buttons to apply or reset settings
 
+    The status, the health metrics and the timing overlay are updated often: they
+    are drawn over a background cached at the last full draw of the figure, and
+    only when one of their texts changes, in which case only its region of the
+    window is updated (if the backend supports blitting, otherwise the figure
+    is redrawn when the GUI is idle).
+
     Attributes
     ----------
     apply_settings : matplotlib.widgets.Button
@@ -42,6 +52,12 @@ class ControlPanel:
         shows current shift
     emissivity_text : matplotlib.text.Text
         shows current emissivity
+    timing_text : matplotlib.text.Text
+        shows the median and 95th percentile duration of the slowest processing
+        stages, if the timing is enabled
+    fps_text, jitter_text, gaps_text, check_text : matplotlib.text.Text
+        show effective and configured frame rate, inter-frame jitter, gaps (and
+        missed frames) and images published by the device successfully or not
 
     Methods
     -------
@@ -49,6 +65,10 @@ class ControlPanel:
         Set the camera status display to "ONLINE"
     offline()
         Set the camera status display to "OFFLINE"
+    show_health(status)
+        Show the health of the received data
+    show_timing(text)
+        Set the text of the timing overlay
     """
 
     def __init__(self, figsize=(5, 4)):
@@ -57,8 +77,17 @@ class ControlPanel:
         self.reset_pixels, self.reset_area = self._reset_buttons()
         self._settings()
         self._state = self._status_display()
+        self.fps_text, self.jitter_text, self.gaps_text, self.check_text = self._health_display()
+        self.timing_text = self.fig.text(0.63, 0.265, "", fontsize=6, family="monospace",
+                                         va="top")
         self._cosmetic_work()
 
+        self._background = None     # cached background for redrawing single artists
+        self._extents = {}          # where the live artists were last drawn
+        for a in self._live():
+            a.set_animated(True)
+        self.fig.canvas.mpl_connect("draw_event", self._on_draw)
+
     def _setup_labels(self):
         """ Configure static labels and title
         """
@@ -67,7 +96,7 @@ class ControlPanel:
         fig.text(0.125, 0.85, "MLX90640 settings", fontsize=12, fontweight='bold')
         fig.text(0.395, 0.8-0.04, "Current:", fontweight='bold')
         fig.text(0.06, 0.35-0.03, "Readout mode:")
-        fig.text(0.725, 0.42,"Status:", fontsize=12, fontweight='bold')
+        fig.text(0.645, 0.435,"Status:", fontsize=12, fontweight='bold')
 
     def _reset_buttons(self):
         """ Configure buttons to reset pixels and area
@@ -118,13 +147,106 @@ class ControlPanel:
             text that displays current AtomS3 status (initialized as OFFLINE)
         """
         fig = self.fig
-        state = fig.text(0.72, 0.335, "OFFLINE",fontsize=13,color="red",
+        state = fig.text(0.80, 0.43, "OFFLINE",fontsize=11,color="red",
                 bbox=dict(boxstyle="round",
                    ec=(1., 0.5, 0.5),
                    fc=(1., 0.8, 0.8),
                    ))
         return state
 
+    def _health_display(self):
+        """Add the texts that show the health of the received data
+
+        Returns
+        -------
+        fps, jitter, gaps, check : Text
+        """
+        fig = self.fig
+        opts = {"fontsize": 7, "family": "monospace"}
+        fps = fig.text(0.645, 0.375, "FPS: -", **opts)
+        jitter = fig.text(0.80, 0.375, "Jit.: -", **opts)
+        gaps = fig.text(0.645, 0.335, "Gaps: 0", **opts)
+        check = fig.text(0.645, 0.295, "OK/KO: 0/0", **opts)
+        return fps, jitter, gaps, check
+
+    def _live(self):
+        """Return the artists that are redrawn on their own when their text changes
+
+        Returns
+        -------
+        list of matplotlib.text.Text
+        """
+        return [self._state, self.fps_text, self.jitter_text, self.gaps_text,
+                self.check_text, self.timing_text]
+
+    def _extent(self, artist):
+        """Return the region of the canvas covered by a text and its box
+
+        Parameters
+        ----------
+        artist : matplotlib.text.Text
+
+        Returns
+        -------
+        matplotlib.transforms.Bbox
+        """
+        renderer = self.fig.canvas.get_renderer()
+        boxes = [artist.get_window_extent(renderer)]
+        if artist.get_bbox_patch() is not None:
+            boxes.append(artist.get_bbox_patch().get_window_extent(renderer))
+        return Bbox.union(boxes).padded(2)
+
+    def _on_draw(self, event):
+        """Cache the background after a full draw and draw the live artists on it
+
+        Parameters
+        ----------
+        event : matplotlib.backend_bases.DrawEvent
+        """
+        canvas = self.fig.canvas
+        self._background = canvas.copy_from_bbox(self.fig.bbox)
+        for a in self._live():
+            self.fig.draw_artist(a)
+            self._extents[a] = self._extent(a)
+
+    def _redraw(self, artists):
+        """Redraw the live artists over the cached background and update on screen
+        only the regions of the ones that changed (where they were and where they
+        are now)
+
+        Parameters
+        ----------
+        artists : list of matplotlib.text.Text
+            live artists that changed
+        """
+        if not artists:
+            return
+        canvas = self.fig.canvas
+        if self._background is None or not canvas.supports_blit:
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self._background)
+        for a in self._live():
+            self.fig.draw_artist(a)
+        for a in artists:
+            old = self._extents.get(a)
+            new = self._extent(a)
+            canvas.blit(Bbox.union([old, new]) if old is not None else new)
+            self._extents[a] = new
+
+    def _set_text(self, artist, text):
+        """Set the text of an artist
+
+        Returns
+        -------
+        bool
+            True if the text changed
+        """
+        if artist.get_text() == text:
+            return False
+        artist.set_text(text)
+        return True
+
     def _cosmetic_work(self):
         """Draw boxes to make the control panel look nicer and visually
         distinguish the different functionalities
@@ -161,159 +283,56 @@ class ControlPanel:
         ax_bg.add_patch(box_4)
 
     def online(self):
-        """Set the AtomS3 status as online on the panel
+        """Set the AtomS3 status as online on the panel, it is redrawn only if it changed
         """
-        self._state.set_text("ONLINE")
+        if not self._set_text(self._state, "ONLINE"):
+            return
         self._state.set_color("green")
         bbox = self._state.get_bbox_patch()
         bbox.set_facecolor((0.8, 1.0, 0.8))  # light green
         bbox.set_edgecolor((0.5, 1.0, 0.5))  # green border
-        self.fig.canvas.draw()
+        self._redraw([self._state])
 
     def offline(self):
-        """Set the AtomS3 status as offline on the panel
+        """Set the AtomS3 status as offline on the panel, it is redrawn only if it changed
         """
-        self._state.set_text("OFFLINE")
+        if not self._set_text(self._state, "OFFLINE"):
+            return
         self._state.set_color("red")
         bbox = self._state.get_bbox_patch()
         bbox.set_facecolor((1.0, 0.8, 0.8))  # light red
         bbox.set_edgecolor((1.0, 0.5, 0.5))  # red border
-        self.fig.canvas.draw()
+        self._redraw([self._state])
 
-
-class CameraSettings:
-    """
-    Object that contains the camera setings
-     
-    Attributes
-    ----------
-    rate : float
-        Camera refresh rate in Hz (0.5, 1, 2, 4, 8).
-    shift : float
-        Shift value (must be positive).
-    emissivity : float
-        Emissivity coefficient (0 < emissivity <= 1).
-    mode : int
-        Readout mode: 0 = Chess pattern, 1 = TV interleave.
-
-    Methods
-    -------
-    default()
-        Reset all settings to default values.
-    publish_form()
-        Format the settings as a string for AtomS3.
-    """
-
-    DEFAULTS = {"rate" : 2, "shift" : 8, "emissivity" : 0.95, "mode": 0}
-
-    def __init__(self):
-        """Initialize with default values
-        """
-        self._rate = self.DEFAULTS["rate"]
-        self._shift = self.DEFAULTS["shift"]
-        self._emissivity = self.DEFAULTS["emissivity"]
-        self._mode = self.DEFAULTS["mode"]
-
-    @property
-    def rate(self):
-        return self._rate
-
-    @rate.setter
-    def rate(self, new_rate):
-        """Set new rate
-
-        Parameters
-        ----------
-        new_rate : float
-            refresh rate
-        """
-        if new_rate in (0.5,1,2,4,8):
-            self._rate = new_rate
-        else:
-            logger.warning(f"{new_rate} is an invalid value for rate")
-
-    @property
-    def shift(self):
-        return self._shift
-
-    @shift.setter
-    def shift(self, new_shift):
-        """Set shift
-
-        Parameters
-        ----------
-        new_shift : float
-            shift
-        """
-        if new_shift >= 0:
-            self._shift = new_shift
-        else:
-            logger.warning(f"{new_shift} is an invalid value for shift (must be positive)")
-
-    @property
-    def emissivity(self):
-        return self._emissivity
-
-    @emissivity.setter
-    def emissivity(self, new_em):
-        """Set emissivity
+    def show_health(self, status):
+        """Show the health of the received data, redrawing only the values that changed
 
         Parameters
         ----------
-        new_em : float
-            emissivity, must be between 0 and 1
+        status : dict
+            as returned by IngestHealth.status
         """
-        if 0<new_em<=1:
-            self._emissivity = new_em
+        if status["online"]:
+            self.online()
         else:
-            logger.warning(f"{new_em} is an invalid value for emissivity (must be between 0 and 1)")
-
-    @property
-    def mode(self):
-        return self._mode
-
-    @mode.setter
-    def mode(self, new_mode):
-        """Set readout mode (chess or TV interleave)
+            self.offline()
+        rate = "?" if status["rate"] is None else f"{status['rate']:g}"
+        fps = "-" if math.isnan(status["fps"]) else f"{status['fps']:.1f}"
+        jitter = "-" if math.isnan(status["jitter"]) else f"{status['jitter']*1e3:.0f} ms"
+        gaps = f"Gaps: {status['gaps']}"
+        if status["missed"]:
+            gaps += f" ({status['missed']})"
+        texts = {self.fps_text: f"FPS: {fps}/{rate}", self.jitter_text: f"Jit.: {jitter}",
+                 self.gaps_text: gaps, self.check_text: f"OK/KO: {status['ok']}/{status['ko']}"}
+        self._redraw([a for a, text in texts.items() if self._set_text(a, text)])
+
+    def show_timing(self, text):
+        """Set the text of the timing overlay, it is redrawn only if it changed
 
         Parameters
         ----------
-        mode 
-        """
-        if new_mode in ('Chess pattern', 0):
-            self._mode = 0
-        elif new_mode in ('TV interleave', 1):
-            self._mode = 1
-        else:
-            logger.warning(f"Readout mode {new_mode} is unknown, using default chess pattern.")
-            self._mode = 0
-
-    def default(self):
+        text : str
+            summary of the processing stages (see Timing.text), "" hides the overlay
         """
-        Reset camera settings to default values:
-        rate=2 Hz, shift=8, emissivity=0.95, mode=Chess pattern
-        """
-        self.rate = self.DEFAULTS["rate"]
-        self.shift = self.DEFAULTS["shift"]
-        self.emissivity = self.DEFAULTS["emissivity"]
-        self.mode = self.DEFAULTS["mode"]
-
-    def publish_form(self):
-        """
-        Format the settings in an appropriate way for the AtomS3
-
-        Return a string representation of the current settings for AtomS3
-        The rate is converted to an integer x such that 2^(x-1) = rate, and
-        other settings are included as-is.
-
-        Returns
-        -------
-        string : str
-            multiline string with rate, shift, emissivity, and mode.
-        """
-
-        r = int(math.log(self._rate, 2)+1)
-        s, e, m = self._shift, self._emissivity, self._mode
-        string = f"{r}\n{s}\n{e}\n{m}\n"
-        logger.debug(f"Publishing:\n{string}")
-        return string
+        if self._set_text(self.timing_text, text):
+            self._redraw([self.timing_text])
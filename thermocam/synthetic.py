@@ -0,0 +1,128 @@
+"""
+Generate synthetic data in the formats published by the AtomS3, for tests,
+benchmarks and load generation without a camera.
+
+Payloads are formatted as in therm_atom.ino: images are the raw little-endian
+float32 temperatures (or one of the compact encodings of thermocam.frame), while
+pixel data, area data and settings are text with two decimals (as printed by the
+Arduino String class).
+"""
+
+import json
+import numpy as np
+
+from thermocam.frame import FRAME_ROWS, FRAME_COLS, encode_frame
+
+
+def frame_data(t=0., rng=None):
+    """
+    Return the temperatures of a synthetic frame: a background with a gradient,
+    a hot spot moving in time and some noise
+
+    Parameters
+    ----------
+    t : float, optional
+        time in seconds, it moves the hot spot, default is 0
+    rng : np.random.Generator, optional
+        generator of the noise, default is a new one
+
+    Returns
+    -------
+    np.ndarray with shape (24, 32)
+        float32 temperatures, indexed as [x, y]
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    x, y = np.mgrid[0:FRAME_ROWS, 0:FRAME_COLS]
+    x0 = FRAME_ROWS/2 + FRAME_ROWS/4*np.cos(0.5*t)
+    y0 = FRAME_COLS/2 + FRAME_COLS/4*np.sin(0.5*t)
+    data = (22. + 0.1*y + 15.*np.exp(-((x - x0)**2 + (y - y0)**2)/8.)
+            + rng.normal(0., 0.2, (FRAME_ROWS, FRAME_COLS)))
+    return data.astype(np.float32)
+
+
+def image_payload(data, encoding="float32"):
+    """
+    Return the image payload of a frame
+
+    Parameters
+    ----------
+    data : np.ndarray with shape (24, 32)
+    encoding : str, optional
+        one of thermocam.frame.ENCODINGS, default is "float32" (3072 bytes, as
+        published by the firmware)
+
+    Returns
+    -------
+    bytes
+    """
+    return encode_frame(data, encoding)
+
+
+def pixels_payload(data, pixels):
+    """
+    Return the pixel data payload of some pixels of a frame, as "x y T,..."
+
+    Parameters
+    ----------
+    data : np.ndarray with shape (24, 32)
+    pixels : array-like with shape (n, 2)
+        (x, y) coordinates of the pixels
+
+    Returns
+    -------
+    bytes
+    """
+    return ",".join(f"{x} {y} {data[x, y]:.2f}" for x, y in pixels).encode()
+
+
+def area_payload(data, area):
+    """
+    Return the area data payload of an area of a frame, as
+    "max: .. min: .. avg: .. x: .. y: .. w: .. h: .."
+
+    Parameters
+    ----------
+    data : np.ndarray with shape (24, 32)
+    area : (int, int, int, int)
+        x_left, y_low, width, height
+
+    Returns
+    -------
+    bytes
+    """
+    x, y, w, h = area
+    block = data[x:x+w, y:y+h]
+    return (f"max: {block.max():.2f} min: {block.min():.2f} avg: {block.mean():.2f} "
+            f"x: {x} y: {y} w: {w} h: {h}").encode()
+
+
+def temps_payload(data):
+    """
+    Return the payload with maximum, minimum and average temperature of a frame
+
+    Parameters
+    ----------
+    data : np.ndarray with shape (24, 32)
+
+    Returns
+    -------
+    bytes
+    """
+    return json.dumps({"tmax": round(float(data.max()), 2), "tmin": round(float(data.min()), 2),
+                       "tavg": round(float(data.mean()), 2)}, separators=(",", ":")).encode()
+
+
+def settings_payload(rate=8., shift=8., emissivity=0.95, mode=1):
+    """
+    Return the payload of the current settings
+
+    Parameters
+    ----------
+    rate, shift, emissivity : float, optional
+    mode : int, optional
+
+    Returns
+    -------
+    bytes
+    """
+    return f"rate: {rate:.2f} shift: {shift:.2f} emissivity: {emissivity:.2f} mode: {mode}".encode()
@@ -0,0 +1,249 @@
+"""
+Define the instrumentation that measures how long each stage of the processing
+of the received messages takes, from their arrival on the MQTT network thread to
+the pixels on screen.
+
+Durations are accumulated in histograms with logarithmic bins, so recording a
+sample is a few arithmetic operations and the memory does not grow. When the
+instrumentation is disabled, timing a stage only costs an attribute lookup and
+an empty context manager.
+"""
+
+import math
+import time
+import numpy as np
+from loguru import logger
+
+
+class Histogram:
+    """
+    Histogram of durations with logarithmic bins, from 1 µs to 100 s
+
+    Parameters
+    ----------
+    bins_per_decade : int, optional
+        default is 10 (about 25% wide bins)
+
+    Attributes
+    ----------
+    count : int
+        number of samples
+    total : float
+        sum of the samples, in seconds
+    max : float
+        largest sample, in seconds
+    """
+
+    LOW = 1e-6
+    DECADES = 8
+
+    def __init__(self, bins_per_decade=10):
+        self.bins_per_decade = bins_per_decade
+        self.counts = np.zeros(self.DECADES*bins_per_decade + 2, dtype=np.int64)
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+
+    def add(self, seconds):
+        """
+        Add a sample
+
+        Parameters
+        ----------
+        seconds : float
+        """
+        if seconds < self.LOW:
+            i = 0
+        else:
+            i = min(int(math.log10(seconds/self.LOW)*self.bins_per_decade) + 1,
+                    len(self.counts) - 1)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """
+        Return an estimate of a percentile (upper edge of its bin)
+
+        Parameters
+        ----------
+        p : float
+            between 0 and 100
+
+        Returns
+        -------
+        float
+            in seconds, NaN if there are no samples
+        """
+        if not self.count:
+            return float("nan")
+        i = int(np.searchsorted(np.cumsum(self.counts), math.ceil(self.count*p/100)))
+        return min(self.LOW*10**(i/self.bins_per_decade), self.max)
+
+    def mean(self):
+        """Return the mean of the samples in seconds, NaN if there are none
+        """
+        return self.total/self.count if self.count else float("nan")
+
+
+class _Stage:
+    """Context manager that records the duration of a stage
+    """
+
+    __slots__ = ("timing", "name", "start")
+
+    def __init__(self, timing, name):
+        self.timing = timing
+        self.name = name
+        self.start = 0.
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.timing.record(self.name, time.monotonic() - self.start)
+
+
+class _NoStage:
+    """Context manager that does nothing, used when the instrumentation is disabled
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+
+_NO_STAGE = _NoStage()
+
+
+class Timing:
+    """
+    Per-stage latency instrumentation
+
+    Stages are timed with "with timing.stage(name): ...", or recorded with
+    record(name, seconds). The instrumentation can be enabled and disabled at
+    any time.
+
+    Parameters
+    ----------
+    enabled : bool, optional
+        default is False
+    log_interval : float or None, optional
+        time in seconds between two summaries logged by tick, if None no summary
+        is logged. Default is 10 s
+    name : str, optional
+        name shown in the logged summaries, default is ""
+
+    Attributes
+    ----------
+    histograms : dict
+        maps the stage names to their Histogram
+    """
+
+    def __init__(self, enabled=False, log_interval=10., name=""):
+        self.enabled = enabled
+        self.log_interval = log_interval
+        self.name = name
+        self.histograms = {}
+        self._last_log = time.monotonic()
+
+    def stage(self, name):
+        """
+        Return a context manager that times a stage (it does nothing if disabled)
+
+        Parameters
+        ----------
+        name : str
+
+        Returns
+        -------
+        context manager
+        """
+        return _Stage(self, name) if self.enabled else _NO_STAGE
+
+    def record(self, name, seconds):
+        """
+        Add the duration of a stage
+
+        Parameters
+        ----------
+        name : str
+        seconds : float
+        """
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram()
+        hist.add(seconds)
+
+    def toggle(self):
+        """Enable the instrumentation if disabled and vice versa, clearing the histograms
+
+        Returns
+        -------
+        bool
+            True if it is now enabled
+        """
+        self.enabled = not self.enabled
+        self.reset()
+        logger.info(f"Timing {'enabled' if self.enabled else 'disabled'}")
+        return self.enabled
+
+    def reset(self):
+        """Clear the histograms
+        """
+        self.histograms = {}
+
+    def summary(self):
+        """
+        Return the statistics of each stage
+
+        Returns
+        -------
+        dict
+            maps the stage names to number of samples, mean, median, 95th
+            percentile and maximum duration in ms
+        """
+        return {name: {"count": h.count, "mean": h.mean()*1e3, "p50": h.percentile(50)*1e3,
+                       "p95": h.percentile(95)*1e3, "max": h.max*1e3}
+                for name, h in self.histograms.items()}
+
+    def text(self, stages=6):
+        """
+        Return a compact summary of the slowest stages, one per line
+
+        Parameters
+        ----------
+        stages : int, optional
+            maximum number of stages, default is 6
+
+        Returns
+        -------
+        str
+        """
+        rows = sorted(self.summary().items(), key=lambda r: -r[1]["p95"])[:stages]
+        return "\n".join(f"{name:>8.8s} {s['p50']:7.2f} {s['p95']:7.2f} ms"
+                         for name, s in rows)
+
+    def tick(self):
+        """Log the summary if the log interval has elapsed, and clear the histograms
+
+        This method is meant to be periodically executed by a timer
+        """
+        if not self.enabled or self.log_interval is None:
+            return
+        now = time.monotonic()
+        if now - self._last_log < self.log_interval:
+            return
+        self._last_log = now
+        for name, s in self.summary().items():
+            logger.info(f"Timing {self.name} {name}: {s['count']} samples, mean "
+                        f"{s['mean']:.2f} ms, p50 {s['p50']:.2f} ms, p95 {s['p95']:.2f} ms, "
+                        f"max {s['max']:.2f} ms")
+        self.reset()
@@ -1,29 +1,103 @@
 """
-Define the video-recording object to save Matplotlib figures as mp4 files.
+Define the video-recording object to save Matplotlib figures or thermal frames
+as mp4 files.
 """
 
+from collections import deque
 from datetime import datetime
+import queue
+import threading
+import time
+from pathlib import Path
 import numpy as np
-import cv2
 from loguru import logger
 
 from thermocam import THERMOCAM_VIDEO
 
 
+def _cv2():
+    """Return the OpenCV module, imported on first use since it is slow to import
+    and it is needed only to record videos
+    """
+    import cv2
+    return cv2
+
+
+class _Recording:
+    """
+    State of a video shared by the caller and the writer thread
+
+    Each video has its own, so that the counters of a new video are not touched
+    by the writer of the previous one while it is being finalized. The writer
+    thread is the only one that counts the written frames, the dropped frames
+    (counted by both) are updated under a lock.
+    """
+
+    def __init__(self):
+        self.written = 0
+        self.dropped = 0
+        self.encode_times = deque(maxlen=100)
+        self.stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def drop(self):
+        """Count a dropped frame
+        """
+        with self._lock:
+            self.dropped += 1
+
+    def wrote(self, encode_time):
+        """Count a written frame
+
+        Parameters
+        ----------
+        encode_time : float
+            time in seconds spent converting and writing it
+        """
+        with self._lock:
+            self.written += 1
+            self.encode_times.append(encode_time)
+
+    def times(self):
+        """Return a copy of the last encode times
+
+        Returns
+        -------
+        list of float
+        """
+        with self._lock:
+            return list(self.encode_times)
+
+
 class VideoMaker:
     """
-    Class for creating mp4 videos from Matplotlib figure frames.
+    Class for creating mp4 videos from Matplotlib figure frames or directly from
+    the thermal frames.
 
     Uses cv2.VideoWriter object and provides methods to: start video, add frame,
     stop video and save the output (stored in the directory defined by
     "thermocam.THERMOCAM_VIDEO"). The video is timestamped with the start time.
 
+    Thermal frames are colored with a lookup table computed once from the
+    colormap (on first use), and upscaled to the output size with a single
+    resize. Optionally, the time of the frame and a scale bar are drawn on the video.
+
+    Frames are converted and written to file by a dedicated writer thread, so
+    that encoding never blocks the caller: they are passed through a bounded
+    queue, and when the queue is full the overflow policy decides whether the
+    caller waits ("block") or a frame is discarded ("drop_oldest", "drop_newest").
+
     Parameters
     ----------
     size : tuple of int, default: (720, 960)
         Output video size in pixels
     fps : int, default: 4
         Frame rate of the output video.
+    interpolation : int, optional
+        OpenCV interpolation used to upscale the thermal frames, default is
+        cv2.INTER_NEAREST
+    directory : pathlib.Path, default: thermocam.THERMOCAM_VIDEO
+        Directory of the video files, created when the first video starts.
 
     Attributes
     ----------
@@ -35,19 +109,106 @@ class VideoMaker:
         Output video framerate.
     video : cv2.VideoWriter
         Video writer object.
+    written : int
+        Number of frames of the current video written to file.
+    dropped : int
+        Number of frames of the current video discarded because the queue was
+        full or they could not be written.
+    encode_times : list of float
+        Time in seconds spent converting and writing each of the last frames.
     """
 
-    def __init__(self, size=(720,960), fps=4):
+    def __init__(self, size=(720,960), fps=4, prefix="", source="figure", cmap="inferno",
+                 timestamp=True, scale_bar=True, interpolation=None,
+                 queue_size=32, overflow="drop_oldest", directory=THERMOCAM_VIDEO):
+        if overflow not in ("block", "drop_oldest", "drop_newest"):
+            raise ValueError(f"Unknown overflow policy {overflow}")
         self.filming = False
         self.size = size
         self.fps = fps
+        self.prefix = prefix
+        self.directory = Path(directory)
+        self.source = source
+        self.timestamp = timestamp
+        self.scale_bar = scale_bar
+        self.interpolation = interpolation
+        self.cmap = cmap
+        self._lut = None
+        self._bar = None
+
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self._recording = _Recording()
+        self._queue = None
+        self._thread = None
+
+    @property
+    def written(self):
+        """Number of frames of the current video written to file
+        """
+        return self._recording.written
+
+    @property
+    def dropped(self):
+        """Number of frames of the current video discarded
+        """
+        return self._recording.dropped
+
+    @property
+    def encode_times(self):
+        """Time in seconds spent converting and writing each of the last frames
+        """
+        return self._recording.times()
+
+    @property
+    def lut(self):
+        """Lookup table of the colormap, in BGR (computed on first use)
+
+        Returns
+        -------
+        np.ndarray with shape (256, 3)
+        """
+        if self._lut is None:
+            self._lut = self._make_lut(self.cmap)
+        return self._lut
+
+    @staticmethod
+    def _make_lut(cmap):
+        """Compute the 256-entry BGR lookup table of a colormap
+
+        Parameters
+        ----------
+        cmap : str
+            Matplotlib colormap name
+
+        Returns
+        -------
+        np.ndarray with shape (256, 3)
+        """
+        from matplotlib import colormaps
+
+        rgb = colormaps[cmap](np.arange(256))[:, 2::-1]   # RGBA to BGR
+        return np.ascontiguousarray(np.round(rgb*255), dtype=np.uint8)
+
+    def _make_bar(self):
+        """Compute the scale bar image (hottest color on top)
+
+        Returns
+        -------
+        np.ndarray with shape (h, w, 3)
+        """
+        w, h = self.size
+        bar_w, bar_h = max(w//30, 4), h//2
+        gradient = np.linspace(255, 0, bar_h).astype(np.uint8)
+        return np.repeat(self.lut[gradient][:, None, :], bar_w, axis=1)
 
     def start_video(self):
         """
         Initialize a new video file for recording.
 
-        Creates a timestamped mp4 file in the directory defined by
-        "thermocam.THERMOCAM_VIDEO" and creates a cv2.VideoWriter object.
+        Creates a timestamped mp4 file in the video directory (created if it
+        does not exist), creates a cv2.VideoWriter object and starts the thread
+        that writes the frames.
 
         Parameters
         ----------
@@ -55,14 +216,89 @@ class VideoMaker:
         """
 
         now = datetime.now() # current date and time
-        time = now.strftime("%Y%m%d_%H%M%S")
+        start = now.strftime("%Y%m%d_%H%M%S")
 
-        filename = THERMOCAM_VIDEO / f"{time}.mp4"
+        name = f"{self.prefix}_{start}" if self.prefix else start
+        self.directory.mkdir(parents=True, exist_ok=True)
+        filename = self.directory / f"{name}.mp4"
+        cv2 = _cv2()
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         self.video = cv2.VideoWriter(filename, fourcc, self.fps, self.size, isColor=True)
+        # each video has its own queue, state and writer thread, so that a new
+        # video can start while the previous one is being finalized
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._recording = _Recording()
+        # daemon, so that a stuck encoder cannot keep the program alive at exit
+        self._thread = threading.Thread(target=self._write_loop,
+                                        args=(self.video, self._queue, self._recording),
+                                        name=f"VideoMaker {name}", daemon=True)
+        self._thread.start()
         self.filming = True
         logger.info(f"Filming {filename}")
 
+    def _enqueue(self, item):
+        """Pass a frame to the writer thread, applying the overflow policy
+
+        Parameters
+        ----------
+        item : tuple
+            ("rgba", array) or ("thermal", frame, clim)
+        """
+        if not self._thread.is_alive():
+            # nobody would empty the queue
+            self._recording.drop()
+            return
+        if self.overflow == "block":
+            self._queue.put(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._recording.drop()
+            if self.overflow == "drop_oldest":
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self._queue.put_nowait(item)
+
+    def _write_loop(self, video, frames, recording):
+        """Convert and write the queued frames until the video is stopped and
+        the queue is empty
+
+        Parameters
+        ----------
+        video : cv2.VideoWriter
+        frames : queue.Queue
+        recording : _Recording
+            counters of the video, and stop event
+        """
+        cv2 = _cv2()
+        try:
+            # no frame is queued after the stop, so the queue is empty for good
+            while not (recording.stopped.is_set() and frames.empty()):
+                try:
+                    item = frames.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                start = time.perf_counter()
+                try:
+                    if item[0] == "rgba":
+                        # Convert to BGR (opencv's default)
+                        img = cv2.cvtColor(item[1], cv2.COLOR_RGBA2BGR)
+                        img = cv2.resize(img, self.size)
+                    else:
+                        img = self.render(item[1], item[2])
+                    video.write(img)
+                except Exception as e:  # the queue must be emptied anyway
+                    logger.error(f"Could not write a video frame: {e}")
+                    recording.drop()
+                    continue
+                recording.wrote(time.perf_counter() - start)
+        finally:
+            video.release()
+        logger.info("Stopped filming, saved output video")
+
     def add_frame(self, fig, bbox_inches=None):
         """
         Add frame from Matplotlib figure to video if filming=True, else do nothing
@@ -86,21 +322,96 @@ class VideoMaker:
             x0, y0, width, height = map(int, [x0, y0, width, height])
             data_arr = data_arr[y0:y0+height, x0:x0+width, :]
 
-        data_arr = cv2.cvtColor(data_arr, cv2.COLOR_RGBA2BGR) # Convert to BGR (opencv's default)
-        data_arr = cv2.resize(data_arr, self.size)
+        # the renderer buffer is reused by the next draw, the region must be copied
+        self._enqueue(("rgba", data_arr.copy()))
 
-        self.video.write(data_arr)
 
+    def add_thermal(self, frame, clim=None):
+        """
+        Add a thermal frame to video if filming=True, else do nothing
+
+        The frame is drawn directly from the temperatures, so no GUI is needed.
 
-    def stop_video(self):
+        Parameters
+        ----------
+        frame : thermocam.frame.ThermalFrame
+            decoded thermal frame
+        clim : (float, float), optional
+            temperatures corresponding to the extremes of the colormap, default
+            is the minimum and maximum of the frame
         """
-        Finalize and close the video file, set filming = False.
+        if not self.filming:
+            return
+
+        self._enqueue(("thermal", frame, clim))
+
+    def render(self, frame, clim=None):
+        """
+        Draw a thermal frame as a BGR image with the size of the video
 
         Parameters
         ----------
-        none
+        frame : thermocam.frame.ThermalFrame
+            decoded thermal frame
+        clim : (float, float), optional
+            temperatures corresponding to the extremes of the colormap, default
+            is the minimum and maximum of the frame
+
+        Returns
+        -------
+        np.ndarray with shape (height, width, 3)
         """
+        low, high = (frame.min(), frame.max()) if clim is None else clim
+        scale = 255./(high - low) if high > low else 0.
+        idx = np.clip((frame.image - low)*scale, 0, 255).astype(np.uint8)
+        cv2 = _cv2()
+        interpolation = cv2.INTER_NEAREST if self.interpolation is None else self.interpolation
+        img = cv2.resize(self.lut[idx], self.size, interpolation=interpolation)
+
+        w, h = self.size
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        if self.timestamp:
+            cv2.putText(img, frame.time.strftime("%d/%m/%Y %H:%M:%S"), (10, h-15),
+                        font, 0.8, (255, 255, 255), 2, cv2.LINE_AA)
+        if self.scale_bar:
+            if self._bar is None:
+                self._bar = self._make_bar()
+            bar_h, bar_w = self._bar.shape[:2]
+            x0, y0 = w - bar_w - 15, (h - bar_h)//2
+            img[y0:y0+bar_h, x0:x0+bar_w] = self._bar
+            for text, y in ((f"{high:.1f}", y0-10), (f"{low:.1f}", y0+bar_h+25)):
+                cv2.putText(img, text, (x0-40, y), font, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
+        return img
 
-        self.video.release()
+    def stop_video(self, wait=False):
+        """
+        Finalize and close the video file, set filming = False.
+
+        The frames still in the queue are written and the file is closed by the
+        writer thread, without blocking the caller unless wait=True.
+
+        Parameters
+        ----------
+        wait : bool, optional
+            if True, wait until the video file is closed, default is False
+        """
         self.filming = False
-        logger.info("Stopped filming, saved output video")
+        # an event rather than an end marker in the queue, which could be full
+        self._recording.stopped.set()
+        if wait:
+            self._thread.join()
+
+    def metrics(self):
+        """Return the recording metrics
+
+        Returns
+        -------
+        dict
+            current queue depth, number of written and dropped frames, average and
+            maximum encode time (ms) of the last frames
+        """
+        times = np.array(self.encode_times)*1e3
+        return {"queued": self._queue.qsize() if self._queue is not None else 0,
+                "written": self.written, "dropped": self.dropped,
+                "encode_mean": float(times.mean()) if len(times) else float("nan"),
+                "encode_max": float(times.max()) if len(times) else float("nan")}
@@ -1,11 +1,167 @@
-import struct
-from datetime import datetime
+import time
+from collections import deque
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import CheckButtons
 from matplotlib import patches
+from matplotlib.image import AxesImage
+from matplotlib.transforms import IdentityTransform
 from loguru import logger
 
+from thermocam.frame import ThermalFrame, FrameError, decode_frame
+
+
+class LutImage(AxesImage):
+    """
+    Image of a thermal frame colored with a lookup table of its colormap and
+    drawn pixel by pixel at its size on the screen
+
+    The default image normalizes, colormaps and resamples the data at every
+    draw; here the frame is upsampled to the screen size first (nearest pixel or
+    bilinear interpolation), then each screen pixel gets its color from a cached
+    256-entry table, in a uint8 RGBA buffer allocated once for the current
+    size and reused by all the frames. The data, norm and colormap of the image
+    are the usual ones, so it works with the colorbar and the other tools.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+    smooth : bool, optional
+        if True, the frame is upsampled with bilinear interpolation, otherwise
+        each screen pixel has the color of the nearest frame pixel. Default is False
+    **kwargs
+        passed to AxesImage (cmap, norm, extent...)
+    """
+
+    def __init__(self, ax, smooth=False, **kwargs):
+        super().__init__(ax, **kwargs)
+        self.smooth = smooth
+        self._lut = None
+        self._lut_cmap = None
+        self._grid = None       # position and size on the screen of the buffers
+        self._sampling = None
+        self._rgba = None
+        self._scaled = None
+        self._rows = None
+
+    def _get_lut(self):
+        """Return the RGBA lookup table of the colormap, computed when it changes
+
+        Returns
+        -------
+        np.ndarray with shape (N, 4)
+        """
+        if self._lut_cmap is not self.cmap:
+            self._lut = self.cmap(np.arange(self.cmap.N), bytes=True)
+            self._lut_cmap = self.cmap
+        return self._lut
+
+    def _set_grid(self, grid, rows, cols):
+        """Allocate the buffers and compute the sampling of the frame for a new
+        position or size of the image on the screen
+
+        Parameters
+        ----------
+        grid : tuple
+            position, size and data to screen transform
+        rows, cols : np.ndarray
+            coordinates in frame pixels of the centers of the screen pixels,
+            from the bottom row and the left column
+        """
+        n_rows, n_cols = self._A.shape[:2]
+        h, w = len(rows), len(cols)
+        self._grid = grid
+        self._rgba = np.empty((h, w, 4), dtype=np.uint8)
+        if self.smooth:
+            # bilinear interpolation as two matrix products
+            self._scaled = np.empty((h, w))
+            self._rows = np.empty((h, n_cols))
+            self._sampling = (_interpolation(rows, n_rows), _interpolation(cols, n_cols).T)
+        else:
+            nearest_rows = np.clip(np.floor(rows + 0.5), 0, n_rows - 1).astype(int)
+            nearest_cols = np.clip(np.floor(cols + 0.5), 0, n_cols - 1).astype(int)
+            self._scaled = np.empty((n_rows, n_cols))
+            self._sampling = (nearest_rows[:, None]*n_cols + nearest_cols).ravel()
+
+    def make_image(self, renderer, magnification=1.0, unsampled=False):
+        """Color the frame at the size of the image on the screen
+
+        Returns
+        -------
+        image : np.ndarray with shape (h, w, 4)
+            uint8 RGBA image, overwritten by the next draw
+        x, y : float
+            position on the screen of the lower left corner of the image
+        trans : matplotlib.transforms.Transform
+        """
+        box = self.get_window_extent(renderer)
+        clip = (self.get_clip_box() or self.axes.bbox) if self.get_clip_on() else box
+        x0, x1 = np.floor(max(box.x0, clip.x0)), np.ceil(min(box.x1, clip.x1))
+        y0, y1 = np.floor(max(box.y0, clip.y0)), np.ceil(min(box.y1, clip.y1))
+        if x1 <= x0 or y1 <= y0:
+            return None, 0, 0, None
+
+        trans = self.get_transform()
+        data = np.ma.getdata(self._A)
+        grid = (x0, x1, y0, y1, magnification, data.shape, *trans.get_matrix().ravel())
+        if grid != self._grid:
+            # centers of the screen pixels, from the bottom left corner as the
+            # renderer expects, in frame pixels
+            step = 1./magnification
+            xs = np.arange(x0 + step/2, x1, step)
+            ys = np.arange(y0 + step/2, y1, step)
+            inverse = trans.inverted()
+            x = inverse.transform(np.column_stack([xs, np.full_like(xs, y0)]))[:, 0]
+            y = inverse.transform(np.column_stack([np.full_like(ys, x0), ys]))[:, 1]
+            n_rows, n_cols = data.shape
+            left, right, bottom, top = self.get_extent()
+            self._set_grid(grid, (y - top)/(bottom - top)*n_rows - 0.5,
+                           (x - left)/(right - left)*n_cols - 0.5)
+
+        low, high = self.norm.vmin, self.norm.vmax
+        lut = self._get_lut()
+        if self.smooth:
+            np.matmul(self._sampling[0], data, out=self._rows)
+            np.matmul(self._rows, self._sampling[1], out=self._scaled)
+        else:
+            self._scaled[:] = data
+        # same color indices as the normalization and colormap of matplotlib
+        self._scaled -= low
+        self._scaled *= len(lut)/(high - low) if high > low else 0.
+        np.clip(self._scaled, 0, len(lut) - 1, out=self._scaled)
+        idx = self._scaled.astype(np.uint8 if len(lut) <= 256 else int)
+        if self.smooth:
+            np.take(lut, idx, axis=0, out=self._rgba)
+        else:
+            np.take(lut[idx].reshape(-1, 4), self._sampling, axis=0,
+                    out=self._rgba.reshape(-1, 4))
+        return self._rgba, x0, y0, IdentityTransform()
+
+
+def _interpolation(positions, n):
+    """Return the matrix of the linear interpolation of n samples at some positions
+
+    Parameters
+    ----------
+    positions : np.ndarray
+        in sample units, clipped to the first and the last sample
+    n : int
+        number of samples
+
+    Returns
+    -------
+    np.ndarray with shape (len(positions), n)
+    """
+    pos = np.clip(positions, 0, n - 1)
+    left = np.minimum(pos.astype(int), n - 2)
+    weight = pos - left
+    matrix = np.zeros((len(pos), n))
+    rows = np.arange(len(pos))
+    matrix[rows, left] = 1 - weight
+    matrix[rows, left + 1] = weight
+    return matrix
+
+
 class Display():
     """
     Graphical interface for visualizing thermal camera data
@@ -19,6 +175,25 @@ class Display():
     ----------
     figsize : (float, float)
         width, height in inches of the entire figure, default is (10, 5)
+    blit : bool, optional
+        if True, a new frame only redraws the thermal image, the markers drawn
+        on it and the timestamp over a cached background, while the rest of the
+        figure (live plots, colorbar, buttons) is redrawn every plot_interval
+        seconds. Default is False (full redraw for every frame)
+    plot_interval : float, optional
+        in blit mode, minimum time in seconds between two full redraws of the
+        figure, default is 1 s
+    lut : bool, optional
+        if True, the thermal image is a LutImage: each frame is colored with a
+        lookup table directly at its size on the screen, instead of being
+        normalized, colormapped and resampled by matplotlib. Default is False
+    smooth : bool, optional
+        with lut, upsample the frames with bilinear interpolation instead of
+        showing square pixels, default is False
+    clim_hysteresis : float, optional
+        the colorbar limits and ticks are changed only if the frame is out of
+        them or if the new limits differ by more than this from the current
+        ones, in °C. Default is 1 °C
 
     Attributes
     ----------
@@ -29,7 +204,7 @@ class Display():
     ax_area : matplotlib.axes.Axes
         axis plotting temperatures of a selected rectangular area.
     image : matplotlib.image.AxesImage
-        image object containing the thermal frame
+        image object containing the thermal frame (a LutImage with lut)
     video_button : matplotlib.widgets.CheckButtons
         Checkbox controlling video recording
     area_button : matplotlib.widgets.CheckButtons
@@ -40,11 +215,32 @@ class Display():
         status text for pixel-related information
     area_text : matplotlib.text.Text
         status text for area-related information
+    render_times : collections.deque
+        time in seconds spent rendering each of the last frames
+    layer : str
+        what is shown on the thermal image: "live" (the received frames) or one
+        of the per-pixel statistics maps (see thermocam.pixelstats.PixelStats)
     _cbar : matplotlib.colorbar.Colorbar
         Colorbar associated with the thermal image
     """
 
-    def __init__(self, figsize=(10, 5)):
+    # layers of the thermal image and their titles
+    LAYERS = {"live": "", "mean": "Mean [°C]", "std": "Standard deviation [°C]",
+              "min": "Minimum [°C]", "max": "Maximum [°C]",
+              "above": "Time above threshold [s]"}
+
+    def __init__(self, figsize=(10, 5), blit=False, plot_interval=1., lut=False, smooth=False,
+                 clim_hysteresis=1.):
+        self.blit = blit
+        self.lut = lut
+        self.smooth = smooth
+        self.clim_hysteresis = clim_hysteresis
+        self.layer = "live"
+        self._rescale = True        # update the colorbar with the next frame
+        self.plot_interval = plot_interval
+        self.render_times = deque(maxlen=100)
+        self._background = None     # cached background for blitting
+        self._last_full_draw = 0.
         self._fig = plt.figure(figsize=figsize)
         self._img_fig, self._data_fig, self.canvas = self._setup_fig()
         self.ax_img, self.ax_pixels, self.ax_area = self._create_axes()
@@ -55,6 +251,11 @@ class Display():
         self._cbar = self._add_colorbar()
         self._received = 0 # counter for how many thermal images have been received
 
+        if self.blit:
+            for a in self._animated():
+                a.set_animated(True)
+            self.canvas.mpl_connect("draw_event", self._on_draw)
+
     def _setup_fig(self):
         """Create subfigures in the main figure
 
@@ -101,10 +302,23 @@ class Display():
 
         # Initialize a list of float as per the image data
         self.image = self.ax_img.imshow(np.random.rand(32,24)*30+10, cmap='inferno')
+        if self.lut:
+            # same place, data and colors, drawn by the lookup table
+            image = LutImage(self.ax_img, smooth=self.smooth, cmap='inferno',
+                             norm=self.image.norm, extent=self.image.get_extent())
+            image.set_data(self.image.get_array())
+            self.image.remove()
+            self.image = self.ax_img.add_image(image)
         self._draw_pixel, = self.ax_img.plot([], [], marker='+', color='lime', ms=12,
                                             mew=2, linestyle='None')
         self._clicks, = self.ax_img.plot([], [], marker='+', color='blue',
                                              markersize=12, linestyle='None')
+        self._area_rect = None
+        self._named_areas = []  # rectangles and labels of the named areas
+        self._mask_labels = []
+        # mask regions, drawn as a transparent overlay
+        self._masks = self.ax_img.imshow(np.zeros((32, 24)), cmap='Greens', alpha=0.,
+                                         vmin=0, vmax=1, visible=False)
 
     def _add_text(self):
         """
@@ -159,12 +373,14 @@ class Display():
         
         return video_button, area_button
 
-    def update_cbar(self, min_temp, max_temp):
+    def update_cbar(self, min_temp, max_temp, force=False):
         """
         Update limits of the plotted colorbar
 
         Sets limits of the colorbar according to data max and min,
-        with some padding, also updates ticks on the colorbar.
+        with some padding, also updates ticks on the colorbar. Nothing is changed
+        if the data is within the current limits and the new ones are within
+        clim_hysteresis of them, to avoid the layout work of new ticks.
 
         Parameters
         ----------
@@ -172,14 +388,27 @@ class Display():
                   minumum measured temperature
         max_temp : float
                   maximum measured temperature
+        force : bool, optional
+                  if True, the limits are always changed, default is False
+
+        Returns
+        -------
+        bool
+            True if the limits were changed
         """
 
         upper = np.ceil(max_temp + (max_temp - min_temp)*0.1)
         lower = np.floor(min_temp - (max_temp - min_temp)*0.1)
 
+        old_lower, old_upper = self._cbar.mappable.get_clim()
+        if (not force and old_lower <= min_temp and max_temp <= old_upper
+                and abs(lower - old_lower) <= self.clim_hysteresis
+                and abs(upper - old_upper) <= self.clim_hysteresis):
+            return False
         self._cbar.mappable.set_clim(vmin=lower,vmax=upper)
         ticks = np.linspace(lower, upper, num=10, endpoint=True,)
         self._cbar.set_ticks(ticks)
+        return True
 
     def img_dimensions(self):
         """Return the dimensions of the thermal image region of the figure
@@ -207,45 +436,135 @@ class Display():
         """
         self._clicks.set_data(c[:,0],c[:,1])
 
-    def update_image(self, msg):
+    def _animated(self):
+        """Return the artists that are redrawn for every frame in blit mode
+
+        Returns
+        -------
+        list of matplotlib.artist.Artist
         """
-        Update the displayed thermal image from an incoming MQTT message
+        return [self.image, self._masks, self._draw_pixel, self._clicks, self.time_text,
+                *self.ax_img.patches, *self.ax_img.texts]
 
-        The message payload is expected to contain 768 float32 temperature
-        values. The frame is reshaped, transposed, and then drawn.
-        Every ten frames, the colorbar limits are automatically updated based
-        on the current minimum and maximum temperatures (with 10% padding).
+    def _on_draw(self, event):
+        """Cache the background after a full draw and draw the animated artists on it
 
         Parameters
         ----------
-        msg : received MQTT message as-is
+        event : matplotlib.backend_bases.DrawEvent
+        """
+        self._background = self.canvas.copy_from_bbox(self._fig.bbox)
+        for a in self._animated():
+            self._fig.draw_artist(a)
 
-        Raises
-        ------
-        struct.error
-            if the payload size is invalid for unpacking
-        ValueError
-            if the reshaped array does not match the expected format
+    def _render(self):
+        """Render the figure after a new frame and store the time it took
+
+        Without blitting, the whole canvas is drawn. In blit mode, the cached
+        background is restored and only the animated artists are drawn on it,
+        unless a full redraw is due (no background yet, colorbar changed or
+        plot_interval elapsed since the last one).
         """
-        try:
-            flo_arr = [struct.unpack('f', msg.payload[i:i+4])[0]
-                       for i in range(0, len(msg.payload), 4)]
-            # data must be transposed to match what is shown on AtomS3 display
-            thermal_img = np.array(flo_arr).reshape(24,32).T
-            self.image.set_data(thermal_img)
+        start = time.perf_counter()
+        if (not self.blit or self._background is None
+                or start - self._last_full_draw > self.plot_interval):
+            self.canvas.draw()
+            self._last_full_draw = start
+        else:
+            self.canvas.restore_region(self._background)
+            for a in self._animated():
+                self._fig.draw_artist(a)
+            self.canvas.blit(self._fig.bbox)
+        self.render_times.append(time.perf_counter() - start)
+
+    def render_stats(self):
+        """Return statistics of the render time of the last frames
 
-            self.time_text.set_text(datetime.now().strftime("%d/%m/%Y, %H:%M:%S"))
-            self.canvas.draw() # draw canvas
+        Returns
+        -------
+        mean, max : float
+            average and maximum render time in ms, NaN if no frame was rendered
+        """
+        if not self.render_times:
+            return float("nan"), float("nan")
+        times = np.array(self.render_times)*1e3
+        return float(times.mean()), float(times.max())
 
-            if self._received%10 == 0:
+    def update_image(self, frame):
+        """
+        Update the displayed thermal image with a new frame
+
+        The frame is drawn transposed, to match what is shown on the AtomS3 display.
+        Every ten frames, the colorbar limits are automatically updated based
+        on the current minimum and maximum temperatures (with 10% padding), if
+        they changed beyond clim_hysteresis.
+
+        Parameters
+        ----------
+        frame : thermocam.frame.ThermalFrame or MQTT message
+            decoded frame; if a received MQTT message is passed as-is, its
+            payload is decoded first (in any of the encodings of thermocam.frame)
+        """
+        try:
+            if not isinstance(frame, ThermalFrame):
+                frame = decode_frame(frame.payload)
+            if self._received%10 == 0 or self._rescale:
                 # update colorbar according to min and max of the measured temperatures
-                self.update_cbar(np.min(thermal_img), np.max(thermal_img))
+                if self.update_cbar(frame.min(), frame.max(), force=self._rescale):
+                    # the colorbar is not animated, it needs a full redraw
+                    self._background = None
+                self._rescale = False
+
+            thermal_img = frame.image
+            self.image.set_data(thermal_img)
+
+            self.time_text.set_text(frame.time.strftime("%d/%m/%Y, %H:%M:%S"))
+            self._render()
 
             self._received += 1
+            if self._received%100 == 0:
+                mean, worst = self.render_stats()
+                logger.info(f"Render time ({'blit' if self.blit else 'full draw'}): "
+                            f"mean {mean:.1f} ms, max {worst:.1f} ms")
 
-        except (struct.error, ValueError) as e:
+        except FrameError as e:
             logger.warning(f"Received invalid image: {e}")
 
+    def set_layer(self, layer):
+        """
+        Choose what is shown on the thermal image, the colorbar is rescaled with
+        the next frame
+
+        Parameters
+        ----------
+        layer : str
+            one of LAYERS
+
+        Raises
+        ------
+        ValueError
+            if the layer is unknown
+        """
+        if layer not in self.LAYERS:
+            raise ValueError(f"Unknown layer {layer}")
+        self.layer = layer
+        self.ax_img.set_title(self.LAYERS[layer], fontsize=9)
+        self._rescale = True
+        # the title is not animated
+        self._background = None
+
+    def next_layer(self):
+        """Show the next layer on the thermal image
+
+        Returns
+        -------
+        str
+            the new layer
+        """
+        layers = list(self.LAYERS)
+        self.set_layer(layers[(layers.index(self.layer) + 1) % len(layers)])
+        return self.layer
+
     def update_pixels(self, pixels):
         """Draw currently defined pixels on thermal image
 
@@ -264,11 +583,124 @@ class Display():
         ----------
         area : thermocam.roi.InterestingArea
         """
-        for p in reversed(self.ax_img.patches): # remove previously drawn patches
-            p.remove()
+        if self._area_rect is not None: # remove previously drawn area
+            self._area_rect.remove()
+            self._area_rect = None
         # if defined, draw current one
         if area.defined():
             x_left, y_low, w, h = area.a[0][:]
-            rect = patches.Rectangle((x_left-0.5, y_low-0.5), w, h,
-                                     linewidth=1, edgecolor='b', facecolor='none')
+            self._area_rect = patches.Rectangle((x_left-0.5, y_low-0.5), w, h,
+                                                linewidth=1, edgecolor='b', facecolor='none',
+                                                animated=self.blit)
+            self.ax_img.add_patch(self._area_rect)
+
+    def update_areas(self, areas):
+        """Draw the named areas on thermal image, with their names
+
+        The previously drawn named areas are removed first
+
+        Parameters
+        ----------
+        areas : thermocam.roi.AreaSet
+        """
+        for a in self._named_areas:
+            a.remove()
+        self._named_areas = []
+        for name, (x_left, y_low, w, h) in areas.areas.items():
+            rect = patches.Rectangle((x_left-0.5, y_low-0.5), w, h, linewidth=1,
+                                     edgecolor='cyan', facecolor='none', linestyle='--',
+                                     animated=self.blit)
             self.ax_img.add_patch(rect)
+            label = self.ax_img.text(x_left-0.4, y_low-0.4, name, color='cyan', fontsize=7,
+                                     va='top', animated=self.blit)
+            self._named_areas += [rect, label]
+
+    def update_masks(self, masks):
+        """Draw the mask regions on thermal image, with their names
+
+        Parameters
+        ----------
+        masks : thermocam.roi.MaskSet
+        """
+        for label in self._mask_labels:
+            label.remove()
+        self._mask_labels = []
+        union = np.zeros((24, 32))
+        for name, mask in masks.masks.items():
+            union = np.maximum(union, mask > 0)
+            x, y = np.argwhere(mask > 0).mean(axis=0)
+            self._mask_labels.append(self.ax_img.text(x, y, name, color='lime', fontsize=7,
+                                                      ha='center', va='center',
+                                                      animated=self.blit))
+        self._masks.set_data(union.T)
+        self._masks.set_alpha(0.35*union.T)
+        # a transparent overlay would still be resampled at every frame
+        self._masks.set_visible(bool(masks.masks))
+
+
+class OverviewDisplay():
+    """
+    Compact tiled view of the thermal images of several cameras
+
+    A tile is added the first time a frame of a new camera is shown; tiles are
+    arranged on a grid that grows with the number of cameras. Each tile shows
+    the camera identifier and the maximum temperature of its last frame.
+
+    Parameters
+    ----------
+    figsize : (float, float)
+        width, height in inches of the entire figure, default is (8, 6)
+
+    Attributes
+    ----------
+    canvas : matplotlib.backend_bases.FigureCanvasBase
+        canvas of the figure
+    tiles : dict
+        maps camera identifiers to their (axes, image) pair
+    """
+
+    def __init__(self, figsize=(8, 6)):
+        self._fig = plt.figure(figsize=figsize)
+        self._fig.suptitle("Waiting for data...")
+        self.canvas = self._fig.canvas
+        self.tiles = {}
+
+    def _add_tile(self, camera_id):
+        """Add the tile of a new camera and rearrange all tiles on the grid
+
+        Parameters
+        ----------
+        camera_id : str
+        """
+        n = len(self.tiles) + 1
+        ncols = int(np.ceil(np.sqrt(n)))
+        nrows = int(np.ceil(n/ncols))
+        gs = self._fig.add_gridspec(nrows, ncols, hspace=0.3)
+
+        for i, (ax, _) in enumerate(self.tiles.values()):
+            ax.set_subplotspec(gs[i])
+        ax = self._fig.add_subplot(gs[n-1])
+        ax.set_xticks([])
+        ax.set_yticks([])
+        image = ax.imshow(np.zeros((32, 24)), cmap='inferno')
+        self.tiles[camera_id] = (ax, image)
+        self._fig.suptitle(f"{n} camera(s)")
+
+    def update(self, camera_id, frame):
+        """Show a new frame of a camera
+
+        The actual drawing is left to the GUI event loop (draw_idle), so that
+        frames received in a burst are drawn only once.
+
+        Parameters
+        ----------
+        camera_id : str
+        frame : thermocam.frame.ThermalFrame
+        """
+        if camera_id not in self.tiles:
+            self._add_tile(camera_id)
+        ax, image = self.tiles[camera_id]
+        image.set_data(frame.image)
+        image.set_clim(frame.min(), frame.max())
+        ax.set_title(f"{camera_id}: max {frame.max():.1f} °C", fontsize=9)
+        self.canvas.draw_idle()